@@ -64,6 +64,8 @@ export default function HistoryPage() {
       avatar: "/placeholder.svg?height=32&width=32",
   })
   const [userVideos, setUserVideos] = useState<ProcessingData[]>([])
+  const [nextPage, setNextPage] = useState<string | null>(null)
+  const [isLoadingMore, setIsLoadingMore] = useState(false)
   const [username, setUsername] = useState("")
   const { toast } = useToast()
   const supabase = createClient()
@@ -117,12 +119,10 @@ export default function HistoryPage() {
       const response = await fetch(`http://localhost:8000/api/shorts/user/${encodeURIComponent(userEmail)}/`);
       
       if (response.ok) {
-        const videos = await response.json();
-        // Sort by creation date - newest first
-        const sortedVideos = videos.sort((a: ProcessingData, b: ProcessingData) => 
-          new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-        );
-        setUserVideos(sortedVideos);
+        // The first page, newest first
+        const page = await response.json();
+        setUserVideos(page.results);
+        setNextPage(page.next);
       } else {
         console.error("Failed to fetch user videos");
         toast({
@@ -143,6 +143,31 @@ export default function HistoryPage() {
     }
   };
 
+  // Function to append the next (older) page of videos
+  const loadMoreVideos = async () => {
+    if (!nextPage) return;
+    try {
+      setIsLoadingMore(true);
+      const response = await fetch(nextPage);
+      
+      if (response.ok) {
+        const page = await response.json();
+        setUserVideos(prevVideos => [...prevVideos, ...page.results]);
+        setNextPage(page.next);
+      } else {
+        toast({
+          title: "Failed to load more",
+          description: "Could not load older videos",
+          variant: "destructive",
+        });
+      }
+    } catch (error) {
+      console.error("Error fetching more videos:", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const getStatusBadge = (status: string) => {
     switch (status) {
       case 'COMPLETED':
@@ -501,6 +526,13 @@ export default function HistoryPage() {
                       </div>
                     ))}
                   </CardContent>
+                  {nextPage && (
+                    <CardFooter className="justify-center">
+                      <Button variant="outline" onClick={loadMoreVideos} disabled={isLoadingMore}>
+                        {isLoadingMore ? "Loading..." : "Load more"}
+                      </Button>
+                    </CardFooter>
+                  )}
                 </Card>
               </>
             )}
@@ -39,6 +39,18 @@ interface User {
   avatar: string
 } 
 
+interface ProgressEvent {
+  status: string
+  stage: string | null
+  percent: number
+  eta_seconds: number | null
+  shorts_completed: number
+  num_shorts: number
+  error_message: string | null
+}
+
+const STATUS_POLL_INTERVAL = 5000
+
 interface ApiResponse {
   message: string
   processing: ProcessingData
@@ -50,6 +62,7 @@ function DashboardContent() {
   const [apiResponse, setApiResponse] = useState<ApiResponse | null>(null)
   const [processingId, setProcessingId] = useState<string | null>(null)
   const [processingStatus, setProcessingStatus] = useState<string | null>(null)
+  const [progress, setProgress] = useState<ProgressEvent | null>(null)
   const [username, setUsername] = useState("")
   const [parsedUser, setParsedUser] = useState<User>({
     name: "John Doe",
@@ -142,7 +155,8 @@ function DashboardContent() {
       const response = await fetch(`http://localhost:8000/api/shorts/user/${encodeURIComponent(userEmail)}/`);
       
       if (response.ok) {
-        const videos = await response.json();
+        // The newest page is enough to find the latest finished one
+        const videos = (await response.json()).results;
         setUserVideos(videos);
         
         // If there are completed videos, set the latest one as the current video
@@ -173,64 +187,125 @@ function DashboardContent() {
     }
   };
 
-  // Poll for status updates if we have a processing ID and status is not completed
+  // Follow the job's progress events until it completes or fails
   useEffect(() => {
     if (!processingId || processingStatus === 'COMPLETED' || processingStatus === 'FAILED') {
       return;
     }
 
-    const interval = setInterval(async () => {
-      try {
-        const response = await fetch(`http://localhost:8000/api/shorts/status/${processingId}/`);
-        const data = await response.json();
+    const statusUrl = `http://localhost:8000/api/shorts/status/${processingId}/`;
+    const source = new EventSource(`http://localhost:8000/api/shorts/events/${processingId}/`);
+    let lastUpdate = Date.now();
+    let streaming = false;
+    let finished = false;
+
+    const showFinished = (data: ProcessingData) => {
+      finished = true;
+      source.close();
+      setProcessingStatus(data.status);
+      
+      // Update the API response with the latest data
+      if (data.status === 'COMPLETED') {
+        setApiResponse(prev => {
+          if (!prev) return null;
+          return {
+            ...prev,
+            processing: data
+          };
+        });
+        
+        // Update our list of user videos to include this new one
+        setUserVideos(prevVideos => {
+          const exists = prevVideos.some(video => video.id === data.id);
+          if (exists) {
+            return prevVideos.map(video => 
+              video.id === data.id ? data : video
+            );
+          } else {
+            return [data, ...prevVideos];
+          }
+        });
         
-        setProcessingStatus(data.status);
+        setIsLoading(false);
         
-        // Update the API response with the latest data
-        if (data.status === 'COMPLETED') {
-          setApiResponse(prev => {
-            if (!prev) return null;
-            return {
-              ...prev,
-              processing: data
-            };
-          });
-          
-          // Update our list of user videos to include this new one
-          setUserVideos(prevVideos => {
-            const exists = prevVideos.some(video => video.id === data.id);
-            if (exists) {
-              return prevVideos.map(video => 
-                video.id === data.id ? data : video
-              );
-            } else {
-              return [data, ...prevVideos];
-            }
-          });
-          
-          setIsLoading(false);
-          clearInterval(interval);
-          
-          toast({
-            title: 'Processing completed',
-            description: "We've generated shorts from your podcast",
-          });
-        } else if (data.status === 'FAILED') {
-          setIsLoading(false);
-          clearInterval(interval);
-          
-          toast({
-            title: 'Processing failed',
-            description: data.error_message || 'Please try again later',
-            variant: 'destructive',
-          });
+        toast({
+          title: 'Processing completed',
+          description: "We've generated shorts from your podcast",
+        });
+      } else if (data.status === 'FAILED') {
+        setIsLoading(false);
+        
+        toast({
+          title: 'Processing failed',
+          description: data.error_message || 'Please try again later',
+          variant: 'destructive',
+        });
+      }
+    };
+
+    source.onmessage = async (event) => {
+      lastUpdate = Date.now();
+      const update: ProgressEvent = JSON.parse(event.data);
+      setProgress(update);
+
+      if (update.status !== 'COMPLETED' && update.status !== 'FAILED') {
+        setProcessingStatus(update.status);
+        return;
+      }
+
+      source.close();
+      try {
+        // The stream only carries progress; fetch the finished job once
+        const response = await fetch(statusUrl);
+        showFinished(await response.json());
+      } catch (error) {
+        console.error('Error checking status:', error);
+      }
+    };
+
+    source.onopen = () => {
+      streaming = true;
+    };
+
+    // Fall back to polling the status while the stream isn't open, e.g. when
+    // the server can't stream
+    const poll = setInterval(async () => {
+      if (finished || streaming || Date.now() - lastUpdate < STATUS_POLL_INTERVAL) {
+        return;
+      }
+      try {
+        const response = await fetch(statusUrl);
+        const data = await response.json();
+        setProgress({
+          status: data.status,
+          stage: data.progress_stage,
+          percent: data.progress_percent,
+          eta_seconds: data.progress_eta_seconds,
+          shorts_completed: data.shorts_completed,
+          num_shorts: data.num_shorts,
+          error_message: data.error_message,
+        });
+        if (data.status === 'COMPLETED' || data.status === 'FAILED') {
+          showFinished(data);
+        } else if (data.status !== processingStatus) {
+          setProcessingStatus(data.status);
         }
       } catch (error) {
         console.error('Error checking status:', error);
       }
-    }, 5000); 
+    }, STATUS_POLL_INTERVAL);
 
-    return () => clearInterval(interval);
+    // EventSource reconnects by itself after network errors
+    source.onerror = () => {
+      streaming = false;
+      console.error('Lost the progress stream, reconnecting');
+    };
+
+    return () => {
+      finished = true;
+      source.close();
+      clearInterval(poll);
+    };
   }, [processingId, processingStatus, toast]);
 
   const handlePodcastSubmit = async (url: string, isYoutubeUrl: boolean, addCaptions: boolean, numShorts: number) => {
@@ -335,6 +410,13 @@ function DashboardContent() {
                   <div className="mt-6 text-center">
                     <p className="text-lg font-medium">Processing your podcast...</p>
                     <p className="text-sm text-muted-foreground">Status: {processingStatus}</p>
+                    {progress && progress.status === 'PROCESSING' && (
+                      <p className="text-sm text-muted-foreground">
+                        {progress.stage ? `${progress.stage}: ` : ''}{Math.round(progress.percent)}%
+                        {' '}· {progress.shorts_completed}/{progress.num_shorts} shorts ready
+                        {progress.eta_seconds !== null && ` · about ${Math.ceil(progress.eta_seconds / 60)} min left`}
+                      </p>
+                    )}
                   </div>
                 )}
                 {transformedApiResponse && (
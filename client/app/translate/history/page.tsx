@@ -70,6 +70,8 @@ export default function TranslateHistoryPage() {
     avatar: "/placeholder.svg?height=32&width=32",
   });
   const [userDubbings, setUserDubbings] = useState<DubbingData[]>([]);
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [username, setUsername] = useState("");
   const { toast } = useToast();
   const supabase = createClient();
@@ -117,13 +119,10 @@ export default function TranslateHistoryPage() {
       );
 
       if (response.ok) {
-        const dubbings = await response.json();
-        // Sort by creation date - newest first
-        const sortedDubbings = dubbings.sort(
-          (a: DubbingData, b: DubbingData) =>
-            new Date(b.created_at).getTime() - new Date(a.created_at).getTime()
-        );
-        setUserDubbings(sortedDubbings);
+        // The first page, newest first
+        const page = await response.json();
+        setUserDubbings(page.results);
+        setNextPage(page.next);
       } else {
         console.error("Failed to fetch user dubbings");
         toast({
@@ -144,6 +143,31 @@ export default function TranslateHistoryPage() {
     }
   };
 
+  // Function to append the next (older) page of dubbings
+  const loadMoreDubbings = async () => {
+    if (!nextPage) return;
+    try {
+      setIsLoadingMore(true);
+      const response = await fetch(nextPage);
+
+      if (response.ok) {
+        const page = await response.json();
+        setUserDubbings((prevDubbings) => [...prevDubbings, ...page.results]);
+        setNextPage(page.next);
+      } else {
+        toast({
+          title: "Failed to load more",
+          description: "Could not load older translations",
+          variant: "destructive",
+        });
+      }
+    } catch (error) {
+      console.error("Error fetching more dubbings:", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   const getStatusBadge = (status: string) => {
     switch (status) {
       case "COMPLETED":
@@ -326,6 +350,17 @@ export default function TranslateHistoryPage() {
                     </Card>
                   </div>
                 ))}
+                {nextPage && (
+                  <div className="flex justify-center">
+                    <Button
+                      variant="outline"
+                      onClick={loadMoreDubbings}
+                      disabled={isLoadingMore}
+                    >
+                      {isLoadingMore ? "Loading..." : "Load more"}
+                    </Button>
+                  </div>
+                )}
               </>
             )}
           </main>
@@ -41,6 +41,16 @@ interface User {
   avatar: string
 } 
 
+interface ProgressEvent {
+  status: string
+  stage: string | null
+  percent: number
+  eta_seconds: number | null
+  error_message: string | null
+}
+
+const STATUS_POLL_INTERVAL = 5000
+
 interface ApiResponse {
   message: string
   processing: DubbingData
@@ -53,6 +63,7 @@ function TranslatePageContent() {
   const [apiResponse, setApiResponse] = useState<ApiResponse | null>(null)
   const [processingId, setProcessingId] = useState<string | null>(null)
   const [processingStatus, setProcessingStatus] = useState<string | null>(null)
+  const [progress, setProgress] = useState<ProgressEvent | null>(null)
   const [username, setUsername] = useState("")
   const [parsedUser, setParsedUser] = useState<User>({
     name: "John Doe",
@@ -145,7 +156,8 @@ function TranslatePageContent() {
       const response = await fetch(`http://localhost:8000/api/dubbing/user/${encodeURIComponent(userEmail)}/`);
       
       if (response.ok) {
-        const dubbings = await response.json();
+        // The newest page is enough to find the latest finished one
+        const dubbings = (await response.json()).results;
         setUserDubbings(dubbings);
         
         // If there are completed dubbings, set the latest one as the current dubbing
@@ -176,64 +188,119 @@ function TranslatePageContent() {
     }
   };
 
-  // Poll for status updates if we have a processing ID and status is not completed
+  // Follow the job's progress events until it completes or fails
   useEffect(() => {
     if (!processingId || processingStatus === 'COMPLETED' || processingStatus === 'FAILED') {
       return;
     }
 
-    const interval = setInterval(async () => {
-      try {
-        const response = await fetch(`http://localhost:8000/api/dubbing/status/${processingId}/`);
-        const data = await response.json();
+    const statusUrl = `http://localhost:8000/api/dubbing/status/${processingId}/`;
+    const source = new EventSource(`http://localhost:8000/api/dubbing/events/${processingId}/`);
+    let lastUpdate = Date.now();
+    let streaming = false;
+    let finished = false;
+
+    const showFinished = (data: DubbingData) => {
+      finished = true;
+      source.close();
+      setProcessingStatus(data.status);
+      
+      // Update the API response with the latest data
+      if (data.status === 'COMPLETED') {
+        setApiResponse(prev => {
+          if (!prev) return null;
+          return {
+            ...prev,
+            processing: data
+          };
+        });
         
-        setProcessingStatus(data.status);
+        // Update our list of user dubbings to include this new one
+        setUserDubbings(prevDubbings => {
+          const exists = prevDubbings.some(dubbing => dubbing.id === data.id);
+          if (exists) {
+            return prevDubbings.map(dubbing => 
+              dubbing.id === data.id ? data : dubbing
+            );
+          } else {
+            return [...prevDubbings, data];
+          }
+        });
         
-        // Update the API response with the latest data
-        if (data.status === 'COMPLETED') {
-          setApiResponse(prev => {
-            if (!prev) return null;
-            return {
-              ...prev,
-              processing: data
-            };
-          });
-          
-          // Update our list of user dubbings to include this new one
-          setUserDubbings(prevDubbings => {
-            const exists = prevDubbings.some(dubbing => dubbing.id === data.id);
-            if (exists) {
-              return prevDubbings.map(dubbing => 
-                dubbing.id === data.id ? data : dubbing
-              );
-            } else {
-              return [...prevDubbings, data];
-            }
-          });
-          
-          // Clear the interval when completed
-          clearInterval(interval);
-          
-          toast({
-            title: "Translation completed!",
-            description: "Your video has been successfully translated and dubbed.",
-          });
-        } else if (data.status === 'FAILED') {
-          toast({
-            title: "Translation failed",
-            description: "There was an error processing your video.",
-            variant: "destructive",
-          });
-          
-          // Clear the interval when failed
-          clearInterval(interval);
+        toast({
+          title: "Translation completed!",
+          description: "Your video has been successfully translated and dubbed.",
+        });
+      } else if (data.status === 'FAILED') {
+        toast({
+          title: "Translation failed",
+          description: "There was an error processing your video.",
+          variant: "destructive",
+        });
+      }
+    };
+
+    source.onmessage = async (event) => {
+      lastUpdate = Date.now();
+      const update: ProgressEvent = JSON.parse(event.data);
+      setProgress(update);
+
+      if (update.status !== 'COMPLETED' && update.status !== 'FAILED') {
+        setProcessingStatus(update.status);
+        return;
+      }
+
+      source.close();
+      try {
+        // The stream only carries progress; fetch the finished job once
+        const response = await fetch(statusUrl);
+        showFinished(await response.json());
+      } catch (error) {
+        console.error("Error fetching status update:", error);
+      }
+    };
+
+    source.onopen = () => {
+      streaming = true;
+    };
+
+    // Fall back to polling the status while the stream isn't open, e.g. when
+    // the server can't stream
+    const poll = setInterval(async () => {
+      if (finished || streaming || Date.now() - lastUpdate < STATUS_POLL_INTERVAL) {
+        return;
+      }
+      try {
+        const response = await fetch(statusUrl);
+        const data = await response.json();
+        setProgress({
+          status: data.status,
+          stage: data.progress_stage,
+          percent: data.progress_percent,
+          eta_seconds: data.progress_eta_seconds,
+          error_message: data.error_message,
+        });
+        if (data.status === 'COMPLETED' || data.status === 'FAILED') {
+          showFinished(data);
+        } else if (data.status !== processingStatus) {
+          setProcessingStatus(data.status);
         }
       } catch (error) {
         console.error("Error fetching status update:", error);
       }
-    }, 5000); // Poll every 5 seconds
+    }, STATUS_POLL_INTERVAL);
+
+    // EventSource reconnects by itself after network errors
+    source.onerror = () => {
+      streaming = false;
+      console.error("Lost the progress stream, reconnecting");
+    };
     
-    return () => clearInterval(interval);
+    return () => {
+      finished = true;
+      source.close();
+      clearInterval(poll);
+    };
   }, [processingId, processingStatus]);
 
   const handleTranslationSubmit = async (
@@ -347,6 +414,12 @@ function TranslatePageContent() {
                   dubbing={apiResponse?.processing || null} 
                   isLoading={isLoadingHistory && !apiResponse}
                 />
+                {progress && progress.status === 'PROCESSING' && (
+                  <p className="mt-2 text-sm text-muted-foreground">
+                    {progress.stage ? `${progress.stage}: ` : ''}{Math.round(progress.percent)}%
+                    {progress.eta_seconds !== null && ` · about ${Math.ceil(progress.eta_seconds / 60)} min left`}
+                  </p>
+                )}
               </div>
             </div>
             <div className="grid gap-4 md:grid-cols-2 lg:grid-cols-4">
@@ -50,6 +50,21 @@ export function InstagramUploadModal({ videoPath, onSuccess }: InstagramUploadMo
         throw new Error(data.error || "Failed to upload to Instagram")
       }
 
+      // The upload runs in the background; wait for it to finish
+      let upload = data.upload
+      while (upload.status !== "COMPLETED" && upload.status !== "FAILED") {
+        await new Promise((resolve) => setTimeout(resolve, 3000))
+        const statusResponse = await fetch(data.status_url)
+        if (!statusResponse.ok) {
+          throw new Error("Failed to check the Instagram upload")
+        }
+        upload = await statusResponse.json()
+      }
+
+      if (upload.status === "FAILED") {
+        throw new Error(upload.error_message || "Failed to upload to Instagram")
+      }
+
       toast({
         title: "Success",
         description: "Video uploaded to Instagram successfully!",
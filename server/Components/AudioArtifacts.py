@@ -0,0 +1,97 @@
+import io
+import wave
+import hashlib
+import threading
+from contextlib import contextmanager
+import numpy as np
+from Components.Edit import extractAudio, WHISPER_SAMPLE_RATE
+
+class AudioArtifact:
+    """
+    Decoded 16 kHz mono audio of one source, shared by every stage of a job.
+
+    Windows are NumPy views into the single decoded buffer, so transcription,
+    voice activity detection and captions never decode the source again.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE):
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self._content_hash = None
+
+    @property
+    def duration(self) -> float:
+        return len(self.samples) / self.sample_rate
+
+    @property
+    def content_hash(self) -> str:
+        """SHA-256 of the decoded samples, computed once"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(self.samples.tobytes()).hexdigest()
+        return self._content_hash
+
+    def window(self, start: float, end: float = None) -> np.ndarray:
+        """Zero-copy view of the samples between start and end (in seconds)"""
+        first = max(0, int(start * self.sample_rate))
+        last = len(self.samples) if end is None else int(end * self.sample_rate)
+        return self.samples[first:last]
+
+def to_pcm16(samples: np.ndarray) -> bytes:
+    """Convert float32 samples to little-endian 16-bit PCM bytes"""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+
+def to_wav_bytes(samples: np.ndarray, sample_rate: int = WHISPER_SAMPLE_RATE) -> bytes:
+    """Encode float32 samples as an in-memory mono WAV file"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(to_pcm16(samples))
+    return buffer.getvalue()
+
+class _Entry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.artifact = None
+        self.references = 0
+
+_entries = {}
+_entries_lock = threading.Lock()
+
+def acquire_audio(key: str, media_path: str):
+    """
+    Return the decoded audio registered under key, decoding media_path on first use
+
+    Every call must be balanced by release_audio(key). Returns None if the
+    source has no decodable audio.
+    """
+    with _entries_lock:
+        entry = _entries.setdefault(key, _Entry())
+        entry.references += 1
+
+    # Decode outside the registry lock so other jobs are not held up
+    with entry.lock:
+        if entry.artifact is None:
+            samples = extractAudio(media_path)
+            if samples is not None:
+                entry.artifact = AudioArtifact(samples)
+        return entry.artifact
+
+def release_audio(key: str):
+    """Drop one reference to key's audio, freeing the buffer when none are left"""
+    with _entries_lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return
+        entry.references -= 1
+        if entry.references <= 0:
+            del _entries[key]
+
+@contextmanager
+def job_audio(key: str, media_path: str):
+    """Context manager form of acquire_audio/release_audio"""
+    try:
+        yield acquire_audio(key, media_path)
+    finally:
+        release_audio(key)
@@ -1,41 +1,44 @@
 from moviepy.video.io.VideoFileClip import VideoFileClip
 from moviepy.editor import VideoFileClip
+import numpy as np
 import subprocess
-import os
 
-def ensure_directory_exists(directory_path):
-    """Ensure a directory exists, creating it if necessary"""
-    if not os.path.exists(directory_path):
-        os.makedirs(directory_path)
-        print(f"Created directory: {directory_path}")
+# faster-whisper works on 16 kHz mono audio
+WHISPER_SAMPLE_RATE = 16000
 
-def extractAudio(video_path):
+def extractAudio(video_path, sample_rate=WHISPER_SAMPLE_RATE):
+    """
+    Decode the audio track of a video straight to mono float32 PCM.
+
+    ffmpeg resamples to the rate whisper works at and its output is streamed
+    into memory, so no shared WAV file is written to the working directory.
+    Returns None if the video has no decodable audio.
+    """
     try:
-        video_clip = VideoFileClip(video_path)
-        audio_path = "audio.wav"
-        video_clip.audio.write_audiofile(audio_path)
-        video_clip.close()
-        print(f"Extracted audio to: {audio_path}")
-        return audio_path
+        process = subprocess.Popen(
+            [
+                "ffmpeg", "-nostdin", "-v", "error",
+                "-i", video_path,
+                "-vn", "-ac", "1", "-ar", str(sample_rate),
+                "-f", "s16le", "-",
+            ],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+        # Reading both pipes together keeps ffmpeg from blocking on a full
+        # stderr pipe while stdout is still being read
+        pcm, error_output = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(error_output.decode(errors="replace").strip())
+        if not pcm:
+            raise RuntimeError("no audio stream found")
+
+        audio = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        print(f"Extracted {len(audio) / sample_rate:.1f}s of audio from: {video_path}")
+        return audio
     except Exception as e:
         print(f"An error occurred while extracting audio: {e}")
         return None
-    
-def extractAudioDubbed(video_path, id):
-    try:
-        # Ensure the dubbed directory exists
-        dubbed_directory = "media/dubbed"
-        ensure_directory_exists(dubbed_directory)
-        
-        video_clip = VideoFileClip(video_path)
-        audio_path = f"{dubbed_directory}/audio_{id}.wav"
-        video_clip.audio.write_audiofile(audio_path)
-        video_clip.close()
-        print(f"Extracted audio to: {audio_path}")
-        return audio_path
-    except Exception as e:
-        print(f"An error occurred while extracting audio for dubbing: {e}")
-        return None
 
 
 def crop_video(input_file, output_file, start_time, end_time):
@@ -1,12 +1,16 @@
+import os
 import cv2
 import numpy as np
 from moviepy.editor import *
-from Components.Speaker import detect_faces_and_speakers, Frames
-global Fps
+from Components.Speaker import detect_faces_and_speakers
 
-def crop_to_vertical(input_video_path, output_video_path):
+def crop_to_vertical(input_video_path, output_video_path, audio=None):
     print("Cropping to vertical")
-    detect_faces_and_speakers(input_video_path, "DecOut.mp4")
+    # Debug render of the detections, named after the output so parallel crops don't collide
+    detections_path = f"{os.path.splitext(output_video_path)[0]}_faces.mp4"
+    Frames = detect_faces_and_speakers(input_video_path, detections_path, audio=audio)
+    if os.path.exists(detections_path):
+        os.remove(detections_path)
     face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
     print("Face Cascade loaded")
     cap = cv2.VideoCapture(input_video_path, cv2.CAP_FFMPEG)
@@ -37,8 +41,6 @@ def crop_to_vertical(input_video_path, output_video_path):
 
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_video_path, fourcc, fps, (vertical_width, vertical_height))
-    global Fps
-    Fps = fps
     print(fps)
     count = 0
     for _ in range(total_frames):
@@ -122,9 +124,13 @@ def combine_videos(video_with_audio, video_without_audio, output_filename):
 
         combined_clip = clip_without_audio.set_audio(audio)
 
-        global Fps
-        combined_clip.write_videofile(output_filename, codec='libx264', audio_codec='aac', fps=Fps, preset='medium', bitrate='3000k')
+        # The cropped video was written at the source frame rate
+        combined_clip.write_videofile(output_filename, codec='libx264', audio_codec='aac', fps=clip_without_audio.fps, preset='medium', bitrate='3000k')
         print(f"Combined video saved successfully as {output_filename}")
+
+        # Render workers are long-lived, so don't leave ffmpeg readers behind
+        clip_with_audio.close()
+        clip_without_audio.close()
     
     except Exception as e:
         print(f"Error combining video and audio: {str(e)}")
@@ -135,7 +141,6 @@ if __name__ == "__main__":
     input_video_path = r'Out.mp4'
     output_video_path = 'Croped_output_video.mp4'
     final_video_path = 'final_video_with_audio.mp4'
-    detect_faces_and_speakers(input_video_path, "DecOut.mp4")
     crop_to_vertical(input_video_path, output_video_path)
     combine_videos(input_video_path, output_video_path, final_video_path)
 
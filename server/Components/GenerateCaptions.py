@@ -6,6 +6,7 @@ import os
 import sys
 import Components.segment_parser as segment_parser
 import Components.transcriber as transcriber
+from Components.AudioArtifacts import to_wav_bytes
 from Components.text_drawer import (
     get_text_size_ex,
     create_text_ex,
@@ -155,33 +156,44 @@ def add_captions(
     segments = None,
 
     use_local_whisper = "false",
+
+    audio = None,
 ):
     _start_time = time.time()
 
     font = get_font_path(font)
 
-    if print_info:
-        print("Extracting audio...")
+    if segments is None:
+        if audio is not None:
+            # Reuse already decoded audio instead of extracting it again
+            audio_file = ("audio.wav", to_wav_bytes(audio))
+        else:
+            if print_info:
+                print("Extracting audio...")
 
-    temp_audio_file = tempfile.NamedTemporaryFile(suffix=".wav").name
-    ffmpeg([
-        'ffmpeg',
-        '-y',
-        '-i', video_file,
-        temp_audio_file
-    ])
+            audio_file = tempfile.NamedTemporaryFile(suffix=".wav").name
+            ffmpeg([
+                'ffmpeg',
+                '-y',
+                '-i', video_file,
+                audio_file
+            ])
 
-    if segments is None:
         if print_info:
             print("Transcribing audio...")
 
         if use_local_whisper == "auto":
             use_local_whisper = "False"
 
-        # if use_local_whisper:
-        #     segments = transcriber.transcribe_locally(temp_audio_file, initial_prompt)
-        # else:
-        segments = transcriber.transcribe_with_api(temp_audio_file, initial_prompt)
+        try:
+            # if use_local_whisper:
+            #     segments = transcriber.transcribe_locally(audio_file, initial_prompt)
+            # else:
+            segments = transcriber.transcribe_with_api(audio_file, initial_prompt)
+        finally:
+            # Don't leave the extracted audio behind
+            if isinstance(audio_file, str) and os.path.exists(audio_file):
+                os.remove(audio_file)
 
     if print_info:
         print("Generating video elements...")
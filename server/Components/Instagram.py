@@ -6,8 +6,9 @@ import tempfile
 from urllib.parse import urlparse
 
 class InstagramUploader:
-    def __init__(self):
-        self.client = Client()
+    def __init__(self, client: Optional[Client] = None):
+        # Pass a logged-in client to reuse its session
+        self.client = client or Client()
         self.temp_dir = tempfile.mkdtemp()
         
     def login(self, username: str, password: str) -> bool:
@@ -5,14 +5,20 @@ import wave
 import contextlib
 from pydub import AudioSegment
 import os
+from Components.AudioArtifacts import to_pcm16
 
 # Update paths to the model files
 prototxt_path = "models/deploy.prototxt"
 model_path = "models/res10_300x300_ssd_iter_140000_fp16.caffemodel"
-temp_audio_path = "temp_audio.wav"
 
-# Load DNN model
-net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+# DNN model, loaded on first use so importing this module stays cheap in render workers
+net = None
+
+def get_net():
+    global net
+    if net is None:
+        net = cv2.dnn.readNetFromCaffe(prototxt_path, model_path)
+    return net
 
 # Initialize VAD
 vad = webrtcvad.Vad(2)  # Aggressiveness mode from 0 to 3
@@ -33,28 +39,38 @@ def process_audio_frame(audio_data, sample_rate=16000, frame_duration_ms=30):
         offset += n
         yield frame
 
-global Frames
-Frames = [] # [x,y,w,h]
+def detect_faces_and_speakers(input_video_path, output_video_path, audio=None):
+    """
+    Find the active speaker's face in every frame.
 
-def detect_faces_and_speakers(input_video_path, output_video_path):
+    Returns a list with one [x, y, x1, y1] box per frame. The list is built
+    per call, so several videos can be processed in the same process.
+    """
     print("Detecting faces and speakers")
     print("Input video path: ", input_video_path)
     print("Output video path: ", output_video_path)
-    # Return Frams:
-    global Frames
-    # Extract audio from the video
-    extract_audio_from_video(input_video_path, temp_audio_path)
-
-    # Read the extracted audio
-    with contextlib.closing(wave.open(temp_audio_path, 'rb')) as wf:
-        sample_rate = wf.getframerate()
-        audio_data = wf.readframes(wf.getnframes())
+    Frames = [] # [x,y,w,h]
+    if audio is not None:
+        # Reuse the job's already decoded 16 kHz mono audio
+        sample_rate = 16000
+        audio_data = to_pcm16(audio)
+    else:
+        # Extract audio from the video, next to the output so parallel runs don't collide
+        temp_audio_path = f"{os.path.splitext(output_video_path)[0]}_audio.wav"
+        extract_audio_from_video(input_video_path, temp_audio_path)
+
+        # Read the extracted audio
+        with contextlib.closing(wave.open(temp_audio_path, 'rb')) as wf:
+            sample_rate = wf.getframerate()
+            audio_data = wf.readframes(wf.getnframes())
+        os.remove(temp_audio_path)
 
     cap = cv2.VideoCapture(input_video_path)
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     out = cv2.VideoWriter(output_video_path, fourcc, 30.0, (int(cap.get(3)), int(cap.get(4))))
 
     frame_duration_ms = 30  # 30ms frames
+    net = get_net()
     audio_generator = process_audio_frame(audio_data, sample_rate, frame_duration_ms)
 
     while cap.isOpened():
@@ -116,12 +132,12 @@ def detect_faces_and_speakers(input_video_path, output_video_path):
     print("Face Detection Completed")
     cap.release()
     out.release()
-    os.remove(temp_audio_path)
+    return Frames
 
 
 
 if __name__ == "__main__":
-    detect_faces_and_speakers()
+    Frames = detect_faces_and_speakers("Out.mp4", "DecOut.mp4")
     print(Frames)
     print(len(Frames))
     print(Frames[1:5])
@@ -1,54 +1,354 @@
 import os
+import json
+import time
+import random
+import shutil
+import wave
+import hashlib
+import threading
+import subprocess
 import openai
+import httpx
 import tempfile
-from pydub import AudioSegment
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from typing import List, Tuple, Optional
 
-def text_to_speech(text: str, output_path: str, voice: str = "alloy", model: str = "tts-1") -> bool:
+# Number of TTS requests allowed in flight at once for a single transcript
+TTS_MAX_WORKERS = int(os.getenv("TTS_MAX_WORKERS", "4"))
+# How many times a rate-limited or failed request is retried before giving up
+TTS_MAX_RETRIES = int(os.getenv("TTS_MAX_RETRIES", "5"))
+# Synthesised segments are kept here so re-runs don't pay for the same speech twice
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join("media", "tts_cache"))
+# Disk budget for the cache; least recently used segments are evicted beyond it (0 disables caching)
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", "512")) * 1024 * 1024
+# Sample rate of the mixed dub track; OpenAI TTS produces 24 kHz speech
+DUB_SAMPLE_RATE = 24000
+# Upper bound on how much a segment may be sped up to fit its time slot
+MAX_FIT_TEMPO = 1.5
+
+_RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError,
+)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client() -> openai.OpenAI:
+    """
+    Return the shared OpenAI client, creating it on first use.
+
+    One client means one HTTP connection pool, so concurrent segments reuse
+    keep-alive connections instead of opening a new one per request.
+    Retries are handled by text_to_speech, so the SDK's own are disabled.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                http_client=openai.DefaultHttpxClient(
+                    limits=httpx.Limits(
+                        max_connections=TTS_MAX_WORKERS,
+                        max_keepalive_connections=TTS_MAX_WORKERS,
+                    )
+                ),
+            )
+        return _client
+
+def _retry_delay(error: Exception, attempt: int) -> float:
+    """
+    Seconds to wait before retrying a failed TTS request.
+
+    Honours the Retry-After header sent with 429 responses, otherwise
+    falls back to exponential backoff with a little jitter.
+    """
+    response = getattr(error, "response", None)
+    if response is not None:
+        try:
+            return max(0.0, float(response.headers.get("retry-after")))
+        except (TypeError, ValueError):
+            pass
+    return min(2 ** attempt, 30) + random.uniform(0, 0.5)
+
+def _cache_path(text: str, voice: str, model: str, response_format: str) -> str:
+    """Content-addressed location of a cached segment"""
+    key = hashlib.sha256(
+        json.dumps([text, voice, model, response_format]).encode("utf-8")
+    ).hexdigest()
+    return os.path.join(TTS_CACHE_DIR, key[:2], f"{key}.{response_format}")
+
+def _cache_fetch(cache_path: str, output_path: str) -> bool:
+    """Copy a cached segment to output_path, marking it as recently used"""
+    try:
+        shutil.copyfile(cache_path, output_path)
+        os.utime(cache_path)
+        return True
+    except FileNotFoundError:
+        # Not cached yet, or evicted between lookup and copy
+        return False
+
+def _cache_store(cache_path: str, source_path: str):
+    """Add a freshly synthesised segment to the cache"""
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        temp_path = f"{cache_path}.{threading.get_ident()}.tmp"
+        shutil.copyfile(source_path, temp_path)
+        # Atomic rename so concurrent readers never see a partial file
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        print(f"Could not cache synthesised segment: {e}")
+
+def prune_tts_cache(max_bytes: int = None):
+    """
+    Evict least recently used segments until the cache fits its disk budget
+    
+    Args:
+        max_bytes: Disk budget in bytes (default: TTS_CACHE_MAX_BYTES)
+    """
+    max_bytes = TTS_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total_size = 0
+    for root, _, files in os.walk(TTS_CACHE_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+            total_size += stat.st_size
+
+    # Oldest mtime first, since hits refresh the mtime
+    for _, size, path in sorted(entries):
+        if total_size <= max_bytes:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total_size -= size
+
+def text_to_speech(text: str, output_path: str, voice: str = "alloy", model: str = "tts-1",
+                   response_format: str = "mp3") -> bool:
     """
     Convert text to speech using OpenAI TTS API
     
+    Results are cached on disk by (text, voice, model, format), so asking
+    for the same speech again is served without an API call.
+    
     Args:
         text: The text to convert to speech
         output_path: Path to save the audio file
         voice: The voice to use (default: 'alloy')
         model: The TTS model to use (default: 'tts-1')
+        response_format: Audio format to request (default: 'mp3')
         
     Returns:
         True if successful, False otherwise
     """
-    try:
-        client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        
-        response = client.audio.speech.create(
-            model=model,
-            voice=voice,
-            input=text,
-        )
+    cache_path = None
+    if TTS_CACHE_MAX_BYTES > 0:
+        cache_path = _cache_path(text, voice, model, response_format)
+        if _cache_fetch(cache_path, output_path):
+            return True
+
+    client = get_client()
+    attempt = 0
+    while True:
+        try:
+            response = client.audio.speech.create(
+                model=model,
+                voice=voice,
+                input=text,
+                response_format=response_format,
+            )
+            
+            # Save the audio file
+            response.stream_to_file(output_path)
+            
+            if cache_path:
+                _cache_store(cache_path, output_path)
+            
+            return True
+            
+        except _RETRYABLE_ERRORS as e:
+            if attempt >= TTS_MAX_RETRIES:
+                print(f"Error in text-to-speech after {attempt + 1} attempts: {e}")
+                return False
+            delay = _retry_delay(e, attempt)
+            attempt += 1
+            print(f"Text-to-speech request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+        except Exception as e:
+            print(f"Error in text-to-speech: {e}")
+            return False
+
+def synthesize_segments(transcript: List[Tuple[str, float, float]],
+                        output_dir: str,
+                        voice: str = "alloy",
+                        model: str = "tts-1",
+                        max_workers: int = TTS_MAX_WORKERS) -> List[Tuple[str, float, float]]:
+    """
+    Synthesise every non-empty transcript segment concurrently
+    
+    Args:
+        transcript: List of tuples (text, start_time, end_time)
+        output_dir: Directory to write the per-segment audio files to
+        voice: Voice to use for TTS (default: 'alloy')
+        model: TTS model to use (default: 'tts-1')
+        max_workers: Maximum number of requests in flight at once
         
-        # Save the audio file
-        response.stream_to_file(output_path)
+    Returns:
+        List of tuples (segment_path, start_time, end_time) in transcript
+        order, leaving out segments that could not be synthesised
+    """
+    jobs = []
+    for i, (text, start, end) in enumerate(transcript):
+        # Skip empty text
+        if not text.strip():
+            continue
+        segment_path = os.path.join(output_dir, f"segment_{i}.mp3")
+        jobs.append((text, segment_path, start, end))
+
+    if not jobs:
+        return []
+
+    # Identical lines (e.g. "Yeah.") are only synthesised once per transcript
+    first_path_for_text = {}
+    unique_jobs = []
+    for text, segment_path, _, _ in jobs:
+        if text not in first_path_for_text:
+            first_path_for_text[text] = segment_path
+            unique_jobs.append((text, segment_path))
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(unique_jobs)))) as executor:
+        futures = {
+            text: executor.submit(text_to_speech, text, segment_path, voice, model)
+            for text, segment_path in unique_jobs
+        }
+
+        # Collect in submission order so segments stay aligned with the transcript
+        segment_files = []
+        for text, segment_path, start, end in jobs:
+            if futures[text].result():
+                if segment_path != first_path_for_text[text]:
+                    shutil.copyfile(first_path_for_text[text], segment_path)
+                segment_files.append((segment_path, start, end))
+            else:
+                print(f"Failed to generate speech for segment: {text}")
+
+    if TTS_CACHE_MAX_BYTES > 0:
+        prune_tts_cache()
+
+    return segment_files
+
+def _atempo_filter(tempo: float) -> str:
+    """Build an ffmpeg atempo chain, keeping each stage inside its 0.5-2.0 range"""
+    stages = []
+    while tempo > 2.0:
+        stages.append(2.0)
+        tempo /= 2.0
+    while tempo < 0.5:
+        stages.append(0.5)
+        tempo /= 0.5
+    stages.append(tempo)
+    return ",".join(f"atempo={stage:.6f}" for stage in stages)
+
+def decode_audio(path: str, sample_rate: int = DUB_SAMPLE_RATE, tempo: float = 1.0) -> np.ndarray:
+    """
+    Decode an audio file to mono float32 PCM with ffmpeg
+    
+    Args:
+        path: Path to the audio file
+        sample_rate: Sample rate to resample to (default: DUB_SAMPLE_RATE)
+        tempo: Playback speed factor applied without changing pitch (default: 1.0)
         
-        return True
+    Returns:
+        1-D float32 array of samples in [-1, 1]
+    """
+    command = ["ffmpeg", "-nostdin", "-v", "error", "-i", path]
+    if tempo != 1.0:
+        command += ["-filter:a", _atempo_filter(tempo)]
+    command += ["-f", "f32le", "-ac", "1", "-ar", str(sample_rate), "-"]
+    result = subprocess.run(command, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.float32)
+
+def mix_into(buffer: np.ndarray, samples: np.ndarray, offset: int) -> None:
+    """Add samples into buffer in place starting at offset, clipping at the buffer end"""
+    if offset >= len(buffer):
+        return
+    count = min(len(samples), len(buffer) - offset)
+    buffer[offset:offset + count] += samples[:count]
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = DUB_SAMPLE_RATE) -> None:
+    """Write mono float32 samples to a 16-bit PCM WAV file"""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(path, "wb") as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(sample_rate)
+        wf.writeframes(pcm.tobytes())
+
+def mix_segments(segment_files: List[Tuple[str, float, float]],
+                 output_path: str,
+                 fit_to_slot: bool = False) -> str:
+    """
+    Mix synthesized segments into one WAV track, each at its start time
+    
+    Segments are decoded and summed into a single preallocated PCM buffer,
+    which is written once as WAV, so merging with the video only encodes
+    the audio a single time.
+    
+    Args:
+        segment_files: List of (path, start_time, end_time) from synthesize_segments
+        output_path: Path to save the final WAV file
+        fit_to_slot: Speed up segments that run past their end time,
+            by at most MAX_FIT_TEMPO (default: False)
         
-    except Exception as e:
-        print(f"Error in text-to-speech: {e}")
-        return False
+    Returns:
+        output_path
+    """
+    # Calculate the maximum end time to determine the total duration
+    max_end_time = max([end for _, _, end in segment_files]) if segment_files else 0
+    total_samples = int((max_end_time + 1) * DUB_SAMPLE_RATE)  # Add 1 second buffer
+    
+    # Silent mixing buffer for the whole track
+    buffer = np.zeros(total_samples, dtype=np.float32)
+    
+    # Add each segment into the buffer at the correct position
+    for segment_path, start, end in segment_files:
+        samples = decode_audio(segment_path)
+        slot_samples = int((end - start) * DUB_SAMPLE_RATE)
+        if fit_to_slot and slot_samples > 0 and len(samples) > slot_samples:
+            tempo = min(len(samples) / slot_samples, MAX_FIT_TEMPO)
+            samples = decode_audio(segment_path, tempo=tempo)
+        mix_into(buffer, samples, int(start * DUB_SAMPLE_RATE))
+    
+    # Write the final audio
+    write_wav(output_path, buffer)
+    return output_path
 
 def transcript_to_speech(transcript: List[Tuple[str, float, float]], 
                         output_path: str, 
                         voice: str = "alloy",
-                        model: str = "tts-1") -> Optional[str]:
+                        model: str = "tts-1",
+                        fit_to_slot: bool = False) -> Optional[str]:
     """
     Convert a transcript (list of text with timestamps) to speech,
     preserving the original timing to match the video
     
     Args:
         transcript: List of tuples (text, start_time, end_time)
-        output_path: Path to save the final audio file
+        output_path: Path to save the final WAV file
         voice: Voice to use for TTS (default: 'alloy')
         model: TTS model to use (default: 'tts-1')
+        fit_to_slot: Speed up segments that run past their end time,
+            by at most MAX_FIT_TEMPO (default: False)
         
     Returns:
         Path to the final audio file if successful, None otherwise
@@ -56,51 +356,9 @@ def transcript_to_speech(transcript: List[Tuple[str, float, float]],
     try:
         # Create a temporary directory for individual audio segments
         with tempfile.TemporaryDirectory() as temp_dir:
-            # Process each segment
-            segment_files = []
-            
-            # Create a silent audio segment for padding
-            silence = AudioSegment.silent(duration=1000)  # 1 second of silence
-            
-            # Starting position (in milliseconds)
-            current_position = 0
-            
             # First, create all the individual audio segments
-            for i, (text, start, end) in enumerate(transcript):
-                segment_path = os.path.join(temp_dir, f"segment_{i}.mp3")
-                
-                # Skip empty text
-                if not text.strip():
-                    continue
-                
-                # Generate speech for this segment
-                success = text_to_speech(text, segment_path, voice, model)
-                
-                if success:
-                    segment_files.append((segment_path, start, end))
-                else:
-                    print(f"Failed to generate speech for segment: {text}")
-            
-            # Now create the final audio file with proper timing
-            final_audio = AudioSegment.silent(duration=0)  # Start with empty audio
-            
-            # Calculate the maximum end time to determine the total duration
-            max_end_time = max([end for _, _, end in segment_files]) if segment_files else 0
-            total_duration_ms = int(max_end_time * 1000) + 1000  # Add 1 second buffer
-            
-            # Create a base silent audio of the total duration
-            base_audio = AudioSegment.silent(duration=total_duration_ms)
-            
-            # Overlay each segment at the correct position
-            for segment_path, start, end in segment_files:
-                segment_audio = AudioSegment.from_file(segment_path)
-                position_ms = int(start * 1000)
-                base_audio = base_audio.overlay(segment_audio, position=position_ms)
-            
-            # Export the final audio
-            base_audio.export(output_path, format="mp3")
-            
-            return output_path
+            segment_files = synthesize_segments(transcript, temp_dir, voice, model)
+            return mix_segments(segment_files, output_path, fit_to_slot)
             
     except Exception as e:
         print(f"Error in transcript-to-speech: {e}")
@@ -1,23 +1,49 @@
 from faster_whisper import WhisperModel
 import torch
 
-def transcribeAudio(audio_path):
+WHISPER_MODEL = "base.en"
+WHISPER_LANGUAGE = "en"
+# Decode settings; part of the transcript cache key, so changing them invalidates stored transcripts
+TRANSCRIBE_OPTIONS = {
+    "beam_size": 5,
+    "max_new_tokens": 128,
+    "condition_on_previous_text": False,
+    "word_timestamps": True,
+}
+
+def transcribeSegments(audio):
+    """
+    Transcribe audio (a path or 16 kHz mono samples) into segments with word timings:
+    [{"text", "start", "end", "words": [{"word", "start", "end"}]}]
+    """
     try:
         print("Transcribing audio...")
         Device = "cuda" if torch.cuda.is_available() else "cpu"
         print(Device)
-        model = WhisperModel("base.en", device="cuda" if torch.cuda.is_available() else "cpu")
+        model = WhisperModel(WHISPER_MODEL, device="cuda" if torch.cuda.is_available() else "cpu")
         print("Model loaded")
-        segments, info = model.transcribe(audio=audio_path, beam_size=5, language="en", max_new_tokens=128, condition_on_previous_text=False)
+        segments, info = model.transcribe(audio=audio, language=WHISPER_LANGUAGE, **TRANSCRIBE_OPTIONS)
         print("Segments calculated")
         segments = list(segments)
         print(segments)
-        extracted_texts = [[segment.text, segment.start, segment.end] for segment in segments]
-        return extracted_texts
+        return [{
+            "text": segment.text,
+            "start": segment.start,
+            "end": segment.end,
+            "words": [
+                {"word": word.word, "start": word.start, "end": word.end}
+                for word in (segment.words or [])
+            ],
+        } for segment in segments]
     except Exception as e:
         print("Transcription Error:", e)
         return []
 
+def transcribeAudio(audio):
+    segments = transcribeSegments(audio)
+    extracted_texts = [[segment["text"], segment["start"], segment["end"]] for segment in segments]
+    return extracted_texts
+
 if __name__ == "__main__":
     audio_path = "audio.wav"
     transcriptions = transcribeAudio(audio_path)
@@ -26,4 +52,4 @@ if __name__ == "__main__":
 
     for text, start, end in transcriptions:
         TransText += (f"{start} - {end}: {text}")
-    print(TransText)
\ No newline at end of file
+    print(TransText)
@@ -2,56 +2,105 @@ import os
 from pytubefix import YouTube
 import ffmpeg
 
+# Shorts are a 9:16 crop of the full source height, so anything taller than
+# this only costs download time and decode work
+TARGET_HEIGHT = int(os.getenv("YOUTUBE_TARGET_HEIGHT", "1080"))
+MAX_VIDEO_SIZE_MB = 500
+# Extra seconds fetched either side of a highlight so the cut can start on a keyframe
+KEYFRAME_PADDING = float(os.getenv("YOUTUBE_KEYFRAME_PADDING", "2"))
+
 def get_video_size(stream):
 
     return stream.filesize / (1024 * 1024)
 
-def download_youtube_video(url):
+def get_stream_height(stream):
+    """Vertical resolution of a stream from its itag resolution, e.g. '1080p' -> 1080"""
+    if not stream.resolution:
+        return 0
+    return int(stream.resolution.rstrip("p"))
+
+def select_video_stream(streams, target_height=TARGET_HEIGHT, max_size_mb=MAX_VIDEO_SIZE_MB):
+    """
+    Pick the smallest stream that still reaches target_height.
+
+    If no stream is tall enough, the tallest one is used instead. Streams
+    over max_size_mb are only considered when nothing smaller exists. At
+    equal height, mp4 (H.264) streams win because they can be remuxed
+    without re-encoding, then the smaller file.
+    """
+    streams = [stream for stream in streams if get_stream_height(stream) > 0]
+    within_size = [stream for stream in streams if get_video_size(stream) < max_size_mb]
+    candidates = within_size or streams
+    if not candidates:
+        return None
+
+    def preference(stream):
+        return (stream.subtype != "mp4", get_video_size(stream))
+
+    tall_enough = [stream for stream in candidates if get_stream_height(stream) >= target_height]
+    if tall_enough:
+        return min(tall_enough, key=lambda stream: (get_stream_height(stream), *preference(stream)))
+    return min(candidates, key=lambda stream: (-get_stream_height(stream), *preference(stream)))
+
+def select_audio_stream(streams, container):
+    """Highest bitrate audio stream, preferring one that shares the video's container"""
+    def bitrate(stream):
+        return int(stream.abr.rstrip("kbps")) if stream.abr else 0
+
+    return max(streams, key=lambda stream: (stream.subtype == container, bitrate(stream)), default=None)
+
+def merge_streams(video_file, audio_file, output_file):
+    """
+    Mux separate video and audio files into output_file.
+
+    Streams are copied as-is when the output container accepts their
+    codecs, and only re-encoded when ffmpeg refuses the copy.
+    """
+    video = ffmpeg.input(video_file)
+    audio = ffmpeg.input(audio_file)
+    try:
+        stream = ffmpeg.output(video.video, audio.audio, output_file, c='copy', movflags='+faststart')
+        ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        print("Merged video and audio without re-encoding")
+    except ffmpeg.Error as e:
+        reason = e.stderr.decode(errors="replace").strip().splitlines()
+        print(f"Stream copy not possible ({reason[-1] if reason else 'unknown error'}), re-encoding")
+        stream = ffmpeg.output(video.video, audio.audio, output_file, vcodec='libx264', acodec='aac', strict='experimental')
+        ffmpeg.run(stream, overwrite_output=True)
+    return output_file
+
+def download_youtube_video(url, target_height=TARGET_HEIGHT, output_path='videos'):
     try:
         yt = YouTube(url)
 
-        video_streams = yt.streams.filter(type="video").order_by('resolution').desc()
-        audio_stream = yt.streams.filter(only_audio=True).first()
-
-        # Automatically select the highest quality stream with reasonable size
-        selected_stream = None
-        for stream in video_streams:
-            size = get_video_size(stream)
-            if size < 500:  # Less than 500 MB
-                selected_stream = stream
-                break
-        
-        # If no stream found with reasonable size, use the first one
-        if not selected_stream and len(video_streams) > 0:
-            selected_stream = video_streams[0]
-        
+        video_streams = yt.streams.filter(type="video")
+        selected_stream = select_video_stream(video_streams, target_height)
+
         if not selected_stream:
             raise Exception("No suitable video stream found")
 
-        if not os.path.exists('videos'):
-            os.makedirs('videos')
+        if not os.path.exists(output_path):
+            os.makedirs(output_path)
 
-        print(f"Downloading video: {yt.title}")
-        video_file = selected_stream.download(output_path='videos', filename_prefix="video_")
+        print(f"Downloading video: {yt.title} ({selected_stream.resolution}, {selected_stream.subtype})")
+        video_file = selected_stream.download(output_path=output_path, filename_prefix="video_")
 
         if not selected_stream.is_progressive:
+            audio_stream = select_audio_stream(yt.streams.filter(only_audio=True), selected_stream.subtype)
             print("Downloading audio...")
-            audio_file = audio_stream.download(output_path='videos', filename_prefix="audio_")
+            audio_file = audio_stream.download(output_path=output_path, filename_prefix="audio_")
 
             print("Merging video and audio...")
-            output_file = os.path.join('videos', f"{yt.title}.mp4")
-            stream = ffmpeg.input(video_file)
-            audio = ffmpeg.input(audio_file)
-            stream = ffmpeg.output(stream, audio, output_file, vcodec='libx264', acodec='aac', strict='experimental')
-            ffmpeg.run(stream, overwrite_output=True)
+            output_file = os.path.join(output_path, f"{yt.title}.mp4")
+            merge_streams(video_file, audio_file, output_file)
 
             os.remove(video_file)
             os.remove(audio_file)
         else:
             output_file = video_file
 
-        
-        print(f"Downloaded: {yt.title} to 'videos' folder")
+
+        print(f"Downloaded: {yt.title} to '{output_path}' folder")
         print(f"File path: {output_file}")
         return output_file
 
@@ -59,6 +108,92 @@ def download_youtube_video(url):
         print(f"An error occurred: {str(e)}")
         return None
 
+def _audio_first_streams(yt, target_height):
+    """The video stream shorts are cut from and the audio stream that goes with it"""
+    video_stream = select_video_stream(yt.streams.filter(type="video"), target_height)
+    if not video_stream:
+        raise Exception("No suitable video stream found")
+    audio_stream = select_audio_stream(yt.streams.filter(only_audio=True), video_stream.subtype)
+    if not audio_stream:
+        raise Exception("No audio stream found")
+    source = {
+        "video_url": video_stream.url,
+        # Progressive streams already carry their own audio track
+        "audio_url": None if video_stream.is_progressive else audio_stream.url,
+    }
+    return audio_stream, source
+
+def youtube_stream_urls(url, target_height=TARGET_HEIGHT):
+    """
+    The source download_youtube_audio would return, without downloading the
+    audio: for an audio track that is already cached. The URLs are signed
+    and expire, so they can't be cached with it. Returns None on failure.
+    """
+    try:
+        return _audio_first_streams(YouTube(url), target_height)[1]
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        return None
+
+def download_youtube_audio(url, target_height=TARGET_HEIGHT, output_path='videos'):
+    """
+    Download only the audio of a YouTube video, for audio-first ingest.
+
+    Returns (audio_file, source) where source holds the signed URLs of the
+    video (and matching audio) streams, so that download_video_range can
+    later fetch just the parts that become shorts. Returns (None, None) on
+    failure.
+    """
+    try:
+        yt = YouTube(url)
+        audio_stream, source = _audio_first_streams(yt, target_height)
+
+        if not os.path.exists(output_path):
+            os.makedirs(output_path)
+
+        print(f"Downloading audio only: {yt.title}")
+        audio_file = audio_stream.download(output_path=output_path, filename_prefix="audio_")
+
+        print(f"Downloaded audio to: {audio_file}")
+        return audio_file, source
+
+    except Exception as e:
+        print(f"An error occurred: {str(e)}")
+        return None, None
+
+def download_video_range(video_url, output_file, start, end, audio_url=None, padding=KEYFRAME_PADDING):
+    """
+    Fetch only the part of a remote video that covers start..end.
+
+    ffmpeg seeks over HTTP using the container index, so only the byte
+    ranges for the window (plus padding on either side) are requested, and
+    the streams are copied without re-encoding.
+
+    Returns (output_file, offset) where offset is the source time that
+    the fetched clip starts at, or (None, None) on failure.
+    """
+    try:
+        range_start = max(0.0, start - padding)
+        duration = end + padding - range_start
+
+        video_input = ffmpeg.input(video_url, ss=range_start, t=duration)
+        audio_input = ffmpeg.input(audio_url, ss=range_start, t=duration) if audio_url else video_input
+        stream = ffmpeg.output(
+            video_input.video,
+            audio_input.audio,
+            output_file,
+            c='copy',
+            movflags='+faststart',
+        )
+        ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+
+        print(f"Fetched {range_start:.1f}s - {range_start + duration:.1f}s to {output_file}")
+        return output_file, range_start
+
+    except ffmpeg.Error as e:
+        print(f"An error occurred while fetching video range: {e.stderr.decode(errors='replace')}")
+        return None, None
+
 if __name__ == "__main__":
     youtube_url = input("Enter YouTube video URL: ")
     download_youtube_video(youtube_url)
@@ -1,6 +1,7 @@
 from moviepy.editor import TextClip, ImageClip, VideoClip, CompositeVideoClip
 from PIL import Image, ImageFilter, ImageFont
 import numpy
+import os
 import tempfile
 
 text_cache = {}
@@ -35,7 +36,12 @@ class TextClipEx(TextClip):
 def moviepy_to_pillow(clip) -> Image:
     temp_file = tempfile.NamedTemporaryFile(suffix=".png").name
     clip.save_frame(temp_file)
-    image = Image.open(temp_file)
+    try:
+        image = Image.open(temp_file)
+        # Read the pixels now so the file can go
+        image.load()
+    finally:
+        os.remove(temp_file)
     return image
 
 def get_text_size(text, fontsize, font, stroke_width):
@@ -11,10 +11,14 @@ def transcribe_with_api(
 ):
     """
     Transcribe an audio file using the OpenAI Whisper API
+    (a path, or anything the SDK accepts such as a (filename, bytes) tuple)
     """
+    if isinstance(audio_file, str):
+        audio_file = open(audio_file, "rb")
+
     transcript = openai.audio.transcriptions.create(
         model="whisper-1",
-        file=open(audio_file, "rb"),
+        file=audio_file,
         response_format="verbose_json",
         timestamp_granularities=["segment", "word"],
         prompt=prompt,
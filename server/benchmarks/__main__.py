@@ -0,0 +1,75 @@
+"""
+Offline micro-benchmarks of the Components hot paths.
+
+    python -m benchmarks --output results.json
+    python -m benchmarks --sizes small --only crop_video segment_parser
+    python -m benchmarks --output new.json --compare baseline.json
+    python -m benchmarks compare baseline.json new.json --threshold 0.1
+
+Run from the server directory. Fixtures (synthetic videos with faces,
+speech-like audio, long transcripts) are generated on first use and
+cached in --fixtures. Nothing is downloaded: Hugging Face models must
+already be in the local cache, and benchmarks whose dependencies are
+missing are reported as skipped. Compare exits with status 1 if any
+benchmark's median time grew by more than --threshold.
+"""
+import os
+import sys
+import shutil
+import argparse
+import tempfile
+from types import SimpleNamespace
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("command", nargs="?", choices=["run", "compare"], default="run")
+    parser.add_argument("files", nargs="*", help="compare: baseline.json current.json")
+    parser.add_argument("--output", help="Write the results here as JSON")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare this run against a stored baseline")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown of the median that counts as a regression (default 0.2 = 20%%)")
+    parser.add_argument("--only", nargs="*", help="Only benchmarks whose name contains one of these")
+    parser.add_argument("--sizes", nargs="*", choices=["small", "medium", "large"])
+    parser.add_argument("--repeat", type=int, help="Timed runs per benchmark and size")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "momentai-benchmark-fixtures"),
+                        help="Where generated fixtures are cached")
+    args = parser.parse_args(argv)
+
+    # Components load models and fonts relative to the server directory
+    os.chdir(SERVER_DIR)
+    sys.path.insert(0, SERVER_DIR)
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    from benchmarks.runner import run_benchmarks, compare, print_comparison, load, save
+    import benchmarks.suite  # noqa: F401 registers the benchmarks
+
+    if args.command == "compare":
+        if len(args.files) != 2:
+            parser.error("compare takes a baseline and a current results file")
+        baseline, current = load(args.files[0]), load(args.files[1])
+    else:
+        os.makedirs(args.fixtures, exist_ok=True)
+        work_dir = tempfile.mkdtemp(prefix="momentai-benchmark-")
+        try:
+            context = SimpleNamespace(fixture_dir=args.fixtures, work_dir=work_dir)
+            current = run_benchmarks(context, names=args.only, sizes=args.sizes, repeat=args.repeat)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        if args.output:
+            save(current, args.output)
+            print(f"Results written to {args.output}")
+        if not args.compare:
+            return 0
+        baseline = load(args.compare)
+
+    rows = compare(baseline, current, args.threshold)
+    print_comparison(rows)
+    regressions = [row for row in rows if row["regressed"]]
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
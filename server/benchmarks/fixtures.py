@@ -0,0 +1,113 @@
+"""
+Synthetic inputs for the benchmarks, generated offline with ffmpeg and
+OpenCV. Every fixture is deterministic, so it is built once per set of
+parameters and reused from the fixture directory on later runs.
+"""
+import os
+import random
+import subprocess
+import cv2
+
+WORDS = (
+    "the quick brown fox jumps over a lazy dog while we talk about machine learning "
+    "neural networks video editing captions highlights and the future of short form content"
+).split()
+
+# Roughly syllable-rate bursts of a voiced tone, enough to trigger voice activity detection
+SPEECH_LIKE = "0.4*sin(2*PI*180*t)*(0.5+0.5*sin(2*PI*3*t))*gt(sin(2*PI*0.4*t)+0.3,0)"
+
+def _run(command):
+    subprocess.run(command, check=True, capture_output=True)
+
+def _draw_face(frame, center_x, center_y, radius, talking):
+    # A skin-toned oval with eyes and a mouth that opens while "talking"
+    cv2.ellipse(frame, (center_x, center_y), (radius, int(radius * 1.3)), 0, 0, 360, (140, 170, 220), -1)
+    for side in (-1, 1):
+        cv2.circle(frame, (center_x + side * radius // 3, center_y - radius // 4), max(2, radius // 8), (40, 30, 30), -1)
+    mouth_height = radius // 4 if talking else radius // 16
+    cv2.ellipse(frame, (center_x, center_y + radius // 2), (radius // 3, max(1, mouth_height)), 0, 0, 360,
+                (40, 40, 120), -1)
+
+def face_video(directory, seconds, width, height, fps=30, faces=2):
+    """
+    ffmpeg testsrc2 video with moving synthetic faces and speech-like audio.
+
+    Returns the path of the mp4.
+    """
+    path = os.path.join(directory, f"faces_{width}x{height}_{seconds}s_{faces}.mp4")
+    if os.path.exists(path):
+        return path
+
+    base = path + ".base.mp4"
+    drawn = path + ".faces.mp4"
+    _run([
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", f"testsrc2=size={width}x{height}:rate={fps}:duration={seconds}",
+        "-f", "lavfi", "-i", f"aevalsrc='{SPEECH_LIKE}':s=44100:d={seconds}",
+        "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "aac", "-shortest", base,
+    ])
+
+    capture = cv2.VideoCapture(base)
+    writer = cv2.VideoWriter(drawn, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    radius = height // 8
+    frame_index = 0
+    while True:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        for face in range(faces):
+            # Faces drift across their own slice of the frame; one talks at a time
+            slot = width // faces
+            center_x = slot * face + slot // 2 + int(radius * 0.5 * ((frame_index // 15 + face) % 3 - 1))
+            talking = (frame_index // (fps * 2)) % faces == face and frame_index % 8 < 4
+            _draw_face(frame, center_x, height // 2, radius, talking)
+        writer.write(frame)
+        frame_index += 1
+    capture.release()
+    writer.release()
+
+    # Put the audio back and encode like a downloaded source
+    _run([
+        "ffmpeg", "-y", "-v", "error", "-i", drawn, "-i", base,
+        "-map", "0:v", "-map", "1:a", "-c:v", "libx264", "-preset", "ultrafast", "-pix_fmt", "yuv420p",
+        "-c:a", "copy", path,
+    ])
+    os.remove(base)
+    os.remove(drawn)
+    return path
+
+def transcript_segments(count, seed=0, words_per_segment=12):
+    """
+    Whisper-style segments with word timings, as add_captions and
+    segment_parser.parse take them.
+    """
+    rng = random.Random(seed)
+    segments = []
+    clock = 0.0
+    for _ in range(count):
+        words = []
+        start = clock
+        for _ in range(words_per_segment):
+            duration = rng.uniform(0.15, 0.45)
+            words.append({"word": " " + rng.choice(WORDS), "start": round(clock, 2),
+                          "end": round(clock + duration, 2)})
+            clock += duration + rng.uniform(0.0, 0.1)
+        # End sentences so captions can break on them
+        words[-1]["word"] += "."
+        segments.append({
+            "text": "".join(word["word"] for word in words),
+            "start": round(start, 2),
+            "end": round(clock, 2),
+            "words": words,
+        })
+        clock += rng.uniform(0.2, 0.8)
+    return segments
+
+def timestamped_transcript(segments):
+    """The "[mm:ss.xx] text" form the BERT highlighter parses"""
+    lines = []
+    for segment in segments:
+        minutes, seconds = divmod(segment["start"], 60)
+        lines.append(f"[{int(minutes):02d}:{seconds:05.2f}] {segment['text'].strip()}")
+    return "\n".join(lines)
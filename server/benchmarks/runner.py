@@ -0,0 +1,153 @@
+"""
+Timing harness and baseline comparison for the benchmark suite.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+class Case:
+    """
+    One measurement: run() is timed, before() (if given) runs untimed
+    ahead of every repeat, e.g. to copy an input run() mutates.
+    """
+
+    def __init__(self, run, before=None):
+        self.run = run
+        self.before = before
+
+class Benchmark:
+    def __init__(self, name, setup, sizes, repeat):
+        self.name = name
+        self.setup = setup
+        self.sizes = sizes
+        self.repeat = repeat
+
+BENCHMARKS = []
+
+def benchmark(name, sizes, repeat=3):
+    """
+    Register a benchmark.
+
+    Args:
+        name: Name of the code path, e.g. 'FaceCrop.crop_to_vertical'
+        sizes: {size name: params} passed to the decorated setup
+        repeat: Timed runs per size
+
+    The decorated function is called as setup(context, **params) and
+    returns a Case. context has fixture_dir and work_dir.
+    """
+    def register(setup):
+        BENCHMARKS.append(Benchmark(name, setup, sizes, repeat))
+        return setup
+    return register
+
+class SkipBenchmark(Exception):
+    """Raised by a setup when something the code path needs is not installed"""
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(context, names=None, sizes=None, repeat=None, log=print):
+    """
+    Run the registered benchmarks.
+
+    Args:
+        context: Passed to every setup
+        names: Only run benchmarks whose name contains one of these
+        sizes: Only run these sizes
+        repeat: Override every benchmark's repeat count
+
+    Returns:
+        The results document, ready to be written as JSON
+    """
+    results = []
+    for bench in BENCHMARKS:
+        if names and not any(name in bench.name for name in names):
+            continue
+        for size, params in bench.sizes.items():
+            if sizes and size not in sizes:
+                continue
+            result = {"name": bench.name, "size": size, "params": params}
+            try:
+                case = bench.setup(context, **params)
+                timings = []
+                for _ in range(repeat or bench.repeat):
+                    if case.before:
+                        case.before()
+                    started = time.perf_counter()
+                    case.run()
+                    timings.append(time.perf_counter() - started)
+            except SkipBenchmark as e:
+                result.update(status="skipped", reason=str(e))
+            except Exception as e:
+                result.update(status="error", reason=f"{type(e).__name__}: {e}")
+            else:
+                result.update(status="ok", seconds=timings, min=min(timings), median=statistics.median(timings))
+            results.append(result)
+            log(_describe(result))
+
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+def _describe(result):
+    label = f"{result['name']} [{result['size']}]"
+    if result["status"] != "ok":
+        return f"{label:<48} {result['status']}: {result['reason']}"
+    return f"{label:<48} median {result['median']:.4f}s  min {result['min']:.4f}s"
+
+def compare(baseline, current, threshold=0.2):
+    """
+    Compare the median times of two results documents.
+
+    A benchmark regressed if its median grew by more than threshold (0.2 =
+    20%) over the baseline. Benchmarks that did not run in both are left out.
+
+    Returns:
+        List of dicts with name, size, baseline, current, change and regressed
+    """
+    previous = {(result["name"], result["size"]): result
+                for result in baseline["results"] if result["status"] == "ok"}
+    rows = []
+    for result in current["results"]:
+        before = previous.get((result["name"], result["size"]))
+        if result["status"] != "ok" or before is None:
+            continue
+        change = result["median"] / before["median"] - 1 if before["median"] else 0.0
+        rows.append({
+            "name": result["name"],
+            "size": result["size"],
+            "baseline": before["median"],
+            "current": result["median"],
+            "change": change,
+            "regressed": change > threshold,
+        })
+    return rows
+
+def print_comparison(rows, out=sys.stdout):
+    for row in rows:
+        flag = "REGRESSION" if row["regressed"] else ""
+        label = f"{row['name']} [{row['size']}]"
+        out.write(f"{label:<48} {row['baseline']:.4f}s -> {row['current']:.4f}s  {row['change']:+.1%}  {flag}\n")
+
+def load(path):
+    with open(path) as f:
+        return json.load(f)
+
+def save(document, path):
+    with open(path, "w") as f:
+        json.dump(document, f, indent=2)
@@ -0,0 +1,141 @@
+"""
+The Components hot paths, each timed at a few input sizes.
+"""
+import copy
+import os
+from .runner import benchmark, Case, SkipBenchmark
+from . import fixtures
+
+FONT = os.path.join("Components", "assets", "fonts", "PoetsenOne-Regular.ttf")
+
+VIDEO_SIZES = {
+    "small": {"width": 640, "height": 360, "seconds": 5},
+    "medium": {"width": 1280, "height": 720, "seconds": 10},
+    "large": {"width": 1920, "height": 1080, "seconds": 20},
+}
+
+TRANSCRIPT_SIZES = {
+    "small": {"segments": 50},
+    "medium": {"segments": 500},
+    "large": {"segments": 5000},
+}
+
+def _output(context, name):
+    return os.path.join(context.work_dir, name)
+
+def _require_face_model():
+    from Components import Speaker
+
+    if not os.path.exists(Speaker.model_path):
+        raise SkipBenchmark(f"face detection model {Speaker.model_path} is not installed")
+
+def _require_text_rendering():
+    from Components.text_drawer import get_text_size_ex
+
+    try:
+        get_text_size_ex("probe", FONT, 50, 2)
+    except Exception as e:
+        # moviepy draws text with ImageMagick
+        raise SkipBenchmark(f"text rendering is unavailable ({str(e).splitlines()[0]})")
+
+@benchmark("Edit.crop_video", {
+    "small": {"width": 640, "height": 360, "seconds": 10, "start": 2, "end": 8},
+    "medium": {"width": 1280, "height": 720, "seconds": 30, "start": 5, "end": 25},
+    "large": {"width": 1920, "height": 1080, "seconds": 60, "start": 10, "end": 50},
+})
+def crop_video(context, width, height, seconds, start, end):
+    from Components.Edit import crop_video
+
+    source = fixtures.face_video(context.fixture_dir, seconds, width, height)
+    output = _output(context, "crop.mp4")
+    return Case(lambda: crop_video(source, output, start, end))
+
+@benchmark("FaceCrop.crop_to_vertical", VIDEO_SIZES, repeat=2)
+def crop_to_vertical(context, width, height, seconds):
+    _require_face_model()
+    from Components.Edit import extractAudio
+    from Components.FaceCrop import crop_to_vertical
+
+    source = fixtures.face_video(context.fixture_dir, seconds, width, height)
+    audio = extractAudio(source)
+    output = _output(context, "vertical.mp4")
+    return Case(lambda: crop_to_vertical(source, output, audio=audio))
+
+@benchmark("Speaker.detect_faces_and_speakers", VIDEO_SIZES, repeat=2)
+def detect_faces_and_speakers(context, width, height, seconds):
+    _require_face_model()
+    from Components.Edit import extractAudio
+    from Components.Speaker import detect_faces_and_speakers
+
+    source = fixtures.face_video(context.fixture_dir, seconds, width, height)
+    audio = extractAudio(source)
+    output = _output(context, "detections.mp4")
+    return Case(lambda: detect_faces_and_speakers(source, output, audio=audio))
+
+@benchmark("GenerateCaptions.calculate_lines", {
+    "small": {"captions": 50},
+    "medium": {"captions": 200},
+    "large": {"captions": 1000},
+})
+def calculate_lines(context, captions):
+    _require_text_rendering()
+    from Components import GenerateCaptions, text_drawer
+
+    texts = [segment["text"] for segment in fixtures.transcript_segments(captions)]
+
+    def clear_caches():
+        # Both caches would turn every repeat after the first into lookups
+        GenerateCaptions.lines_cache.clear()
+        text_drawer.text_cache.clear()
+
+    def run():
+        for text in texts:
+            GenerateCaptions.calculate_lines(text, FONT, 100, 2, 1000)
+    return Case(run, before=clear_caches)
+
+@benchmark("segment_parser.parse", TRANSCRIPT_SIZES)
+def parse(context, segments):
+    from Components import segment_parser
+
+    source = fixtures.transcript_segments(segments)
+    state = {}
+
+    def copy_segments():
+        # parse merges words in place
+        state["segments"] = copy.deepcopy(source)
+
+    # Character budget instead of measured text, so only the parser is timed
+    fit_function = lambda text: len(text) <= 80
+    return Case(lambda: segment_parser.parse(state["segments"], fit_function), before=copy_segments)
+
+@benchmark("GenerateCaptions.add_captions", VIDEO_SIZES, repeat=1)
+def add_captions(context, width, height, seconds):
+    _require_text_rendering()
+    from Components.GenerateCaptions import add_captions
+
+    source = fixtures.face_video(context.fixture_dir, seconds, width, height)
+    segments = [segment for segment in fixtures.transcript_segments(seconds // 4 + 1)
+                if segment["start"] < seconds]
+    output = _output(context, "captioned.mp4")
+    state = {}
+
+    def copy_segments():
+        state["segments"] = copy.deepcopy(segments)
+
+    return Case(lambda: add_captions(source, output, font=FONT, font_size=max(30, height // 12),
+                                     segments=state["segments"], use_local_whisper=False, print_info=False),
+                before=copy_segments)
+
+@benchmark("LanguageTask.extract_highlights_bert", {
+    "small": {"segments": 50},
+    "medium": {"segments": 200},
+    "large": {"segments": 1000},
+}, repeat=2)
+def extract_highlights_bert(context, segments):
+    try:
+        from Components.LanguageTask import extract_highlights_bert
+    except ImportError as e:
+        raise SkipBenchmark(f"{e.name} is not installed")
+
+    transcript = fixtures.timestamped_transcript(fixtures.transcript_segments(segments))
+    return Case(lambda: extract_highlights_bert(transcript))
@@ -0,0 +1,70 @@
+import os
+import json
+import logging
+from .models import JobStage, VideoProcessing
+from .jobstate import update_job
+
+logger = logging.getLogger(__name__)
+
+def _owner(job):
+    if isinstance(job, VideoProcessing):
+        return {'video_processing': job}
+    return {'dubbing': job}
+
+def touch(job):
+    """
+    Bump job's updated_at without saving the rest of it, so the ETag of its
+    status (which lists the stages) changes when only a stage row did
+    """
+    update_job(job)
+
+def completed_artifact(job, name, index=0, valid=None):
+    """
+    The artifact of a completed stage, or None if the stage still has to run.
+
+    Args:
+        job: A VideoProcessing or LanguageDubbing
+        name: The stage name
+        index: Short index for per-short stages
+        valid: Optional check of the artifact; a completed stage whose
+            artifact is no longer valid (e.g. its file was removed) is
+            reset so it runs again
+
+    Returns:
+        The artifact dict, or None
+    """
+    stage = JobStage.objects.filter(name=name, index=index, status='COMPLETED', **_owner(job)).first()
+    if stage is None:
+        return None
+    artifact = stage.artifact
+    if valid is not None and not valid(artifact):
+        logger.info(f"Artifact of {stage} is gone, running it again")
+        stage.status = 'PENDING'
+        stage.save(update_fields=['status', 'updated_at'])
+        touch(job)
+        return None
+    return artifact
+
+def complete_stage(job, name, artifact=None, index=0):
+    """Record that a stage finished and what it produced"""
+    JobStage.objects.update_or_create(
+        name=name,
+        index=index,
+        **_owner(job),
+        defaults={'status': 'COMPLETED', 'artifact_json': json.dumps(artifact or {}), 'error_message': None}
+    )
+    touch(job)
+
+def fail_stage(job, name, error, index=0):
+    """Record that a stage failed, keeping whatever artifact it had before"""
+    JobStage.objects.update_or_create(
+        name=name,
+        index=index,
+        **_owner(job),
+        defaults={'status': 'FAILED', 'error_message': str(error)}
+    )
+    touch(job)
+
+def file_exists(key='path'):
+    """Validator for artifacts that point at a file which must still exist"""
+    return lambda artifact: bool(artifact.get(key)) and os.path.exists(artifact[key])
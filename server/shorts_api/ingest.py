@@ -0,0 +1,238 @@
+import os
+import logging
+import threading
+from .source_cache import acquire_source, release_source, youtube_video_id
+from .transcripts import get_or_transcribe, transcript_rows
+from .checkpoints import complete_stage
+from .metrics import measure, record_stage_metric
+from .utils import is_cloudinary_url, download_from_cloudinary
+from Components.YoutubeDownloader import download_youtube_video, download_youtube_audio, youtube_stream_urls
+from Components.AudioArtifacts import acquire_audio, release_audio
+from Components.LanguageTasks import GetHighlight
+
+logger = logging.getLogger(__name__)
+
+class IngestError(Exception):
+    """Raised to every job attached to an ingest whose shared work failed"""
+
+    def __init__(self, message, stage=None, ingest=None):
+        super().__init__(message)
+        # The stage ('download', 'audio' or 'transcript') that failed
+        self.stage = stage
+        # The failed SourceIngest, for its stage metrics
+        self.ingest = ingest
+
+class SourceIngest:
+    """
+    Download, audio and transcript of one source, shared by every job that
+    asks for the same URL while it is in flight.
+
+    The first job to attach runs the shared stages; later jobs wait for
+    them and only add their own rendering and upload work.
+    """
+
+    def __init__(self, url, mode, key):
+        self.url = url
+        self.mode = mode
+        self.key = key
+        self.ready = threading.Event()
+        self.error = None
+        self.stage = None
+        self.references = 0
+        self.source_media = None
+        self.vid = None
+        # Signed stream URLs for audio-first ingest, None for full downloads
+        self.source = None
+        self.audio = None
+        self.transcript = None
+        self.transcriptions = None
+        self.trans_text = ""
+        self._highlights = {}
+        self._highlight_locks = {}
+        self._highlights_lock = threading.Lock()
+        # StageUsage of each shared stage that ran, saved once by record_metrics
+        self.usage = {}
+        self._metrics_recorded = False
+        self._metrics_lock = threading.Lock()
+
+    @property
+    def audio_key(self):
+        return f"ingest-{self.mode}-{self.key}"
+
+    def _download(self):
+        if self.mode == 'audio_first':
+            # Download only the audio now, or reuse a cached copy; the video
+            # is fetched per highlight
+            def download(directory):
+                audio_file, self.source = download_youtube_audio(self.url, output_path=directory)
+                return audio_file
+
+            self.source_media = acquire_source(self.url, download, variant='audio')
+            if not self.source_media:
+                raise IngestError("Unable to download the video")
+            self.vid = self.source_media.file_path
+            if self.source is None:
+                # Cached audio; the stream URLs are signed per request
+                self.source = youtube_stream_urls(self.url)
+                if self.source is None:
+                    raise IngestError("Unable to find the video streams")
+        elif is_cloudinary_url(self.url):
+            print(f"Detected Cloudinary URL: {self.url}")
+            self.source_media = acquire_source(
+                self.url,
+                lambda directory: download_from_cloudinary(self.url, os.path.join(directory, "source.mp4"))
+            )
+            if not self.source_media:
+                raise IngestError("Unable to download the video from Cloudinary")
+            self.vid = self.source_media.file_path
+        else:
+            # Download the video, or reuse a cached copy of the same source
+            self.source_media = acquire_source(
+                self.url,
+                lambda directory: download_youtube_video(self.url, output_path=directory)
+            )
+            if not self.source_media:
+                raise IngestError("Unable to download the video")
+            self.vid = self.source_media.file_path
+
+    def run(self):
+        """Run the shared stages, recording the first failure for every attached job"""
+        try:
+            self.stage = 'download'
+            with measure() as self.usage['download']:
+                self._download()
+
+            # Extract audio once; every later stage works on views of it
+            self.stage = 'audio'
+            with measure() as self.usage['audio']:
+                self.audio = acquire_audio(self.audio_key, self.vid)
+            if self.audio is None:
+                raise IngestError("No audio file found")
+
+            # Transcribe audio, unless this audio was transcribed before
+            self.stage = 'transcript'
+            with measure() as self.usage['transcript']:
+                self.transcript = get_or_transcribe(self.audio)
+            if self.transcript is None:
+                raise IngestError("No transcriptions found")
+            self.transcriptions = transcript_rows(self.transcript)
+
+            for text, start, end in self.transcriptions:
+                self.trans_text += (f"{start} - {end}: {text}")
+            self.stage = None
+        except IngestError as e:
+            self.error = str(e)
+        except Exception as e:
+            logger.exception(f"Ingest of {self.url} failed")
+            self.error = str(e)
+        finally:
+            self.ready.set()
+
+    def wait(self):
+        """Block until the shared stages are done, raising their error if they failed"""
+        self.ready.wait()
+        if self.error:
+            raise IngestError(self.error, self.stage, ingest=self)
+        return self
+
+    def highlight(self, i):
+        """
+        Start and end of the i-th highlight. Each index is asked for once,
+        so jobs for the same source share their highlight analysis.
+        """
+        with self._highlights_lock:
+            lock = self._highlight_locks.setdefault(i, threading.Lock())
+        # Different indexes are picked concurrently
+        with lock:
+            if i not in self._highlights:
+                # We add a different prompt for each short to get variety
+                self._highlights[i] = GetHighlight(
+                    self.trans_text + f" (Generate highlight {i+1}, different from previous ones)"
+                )
+            return self._highlights[i]
+
+    def checkpoint(self, job):
+        """Record the shared stages as completed for job"""
+        complete_stage(job, 'download', {'path': self.vid, 'source': self.source})
+        complete_stage(job, 'audio', {'hash': self.audio.content_hash, 'duration': self.audio.duration})
+        complete_stage(job, 'transcript', {'transcript_id': self.transcript.id})
+
+    def record_metrics(self, job):
+        """
+        Save the usage of the shared stages (download, audio, transcript)
+        for job. Jobs attached to the same ingest share one run of them, so
+        only the first job to ask gets them.
+        """
+        with self._metrics_lock:
+            if self._metrics_recorded:
+                return
+            self._metrics_recorded = True
+        for name, usage in self.usage.items():
+            status = 'FAILED' if self.error and name == self.stage else 'COMPLETED'
+            record_stage_metric(job, name, 0, status, usage)
+
+    def close(self):
+        release_audio(self.audio_key)
+        release_source(self.source_media)
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _ingest_key(url):
+    video_id = youtube_video_id(url)
+    return f"youtube:{video_id}" if video_id else f"url:{url}"
+
+def attach_ingest(url, mode='full'):
+    """
+    Join the in-flight ingest of url, starting it if there is none.
+
+    The first caller runs the shared stages on its own thread; others wait
+    for it. Every call must be balanced by detach_ingest.
+
+    Args:
+        url: The source URL
+        mode: 'full' to download the whole video, or 'audio_first'
+
+    Returns:
+        The ready SourceIngest
+
+    Raises:
+        IngestError: If the shared stages failed
+    """
+    key = (mode, _ingest_key(url))
+    with _inflight_lock:
+        ingest = _inflight.get(key)
+        leader = ingest is None
+        if leader:
+            ingest = SourceIngest(url, mode, key[1])
+            _inflight[key] = ingest
+        ingest.references += 1
+
+    if leader:
+        ingest.run()
+        if ingest.error:
+            # Let later requests retry instead of inheriting this failure
+            with _inflight_lock:
+                if _inflight.get(key) is ingest:
+                    del _inflight[key]
+    else:
+        logger.info(f"Attaching to in-flight ingest of {url}")
+
+    try:
+        return ingest.wait()
+    except IngestError:
+        detach_ingest(ingest)
+        raise
+
+def detach_ingest(ingest):
+    """Drop a job's hold on an ingest, releasing its audio and source after the last one"""
+    if ingest is None:
+        return
+    key = (ingest.mode, ingest.key)
+    with _inflight_lock:
+        ingest.references -= 1
+        if ingest.references > 0:
+            return
+        if _inflight.get(key) is ingest:
+            del _inflight[key]
+    ingest.close()
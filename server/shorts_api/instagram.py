@@ -0,0 +1,187 @@
+"""
+Instagram reel uploads through reusable sessions.
+
+Logging in to Instagram is slow and, repeated for every upload, trips its
+rate limits and challenges. The session pool keeps one logged-in client
+per account in memory and saves the client's instagrapi settings,
+encrypted, in InstagramSession, so later uploads reuse the session, also
+after a restart. Uploads run on a small background pool; the request that
+asks for one only queues it.
+"""
+import hmac
+import json
+import base64
+import hashlib
+import logging
+import secrets
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet, InvalidToken
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+from django.db import close_old_connections
+from django.utils import timezone
+from instagrapi import Client
+from Components.Instagram import InstagramUploader
+from .models import InstagramSession, InstagramUpload
+from .jobstate import update_job
+
+logger = logging.getLogger(__name__)
+
+class InstagramLoginError(Exception):
+    """Raised when an Instagram account can't be logged in to"""
+
+class InstagramUploadError(Exception):
+    """Raised when a reel could not be uploaded"""
+
+def _fernet():
+    key = settings.INSTAGRAM_SESSION_KEY
+    if not key:
+        digest = hashlib.sha256(f"instagram-session:{settings.SECRET_KEY}".encode()).digest()
+        key = base64.urlsafe_b64encode(digest)
+    return Fernet(key)
+
+def encrypt_settings(client_settings):
+    return _fernet().encrypt(json.dumps(client_settings).encode()).decode()
+
+def decrypt_settings(token):
+    return json.loads(_fernet().decrypt(token.encode()))
+
+class _Account:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.client = None
+        self.password_digest = None
+
+class InstagramSessionPool:
+    """
+    Logged-in instagrapi clients, one per account, reused across uploads.
+
+    A client is not thread-safe, so session() lends an account's client to
+    one caller at a time. A session, in memory or saved, is only used for a
+    caller who gives the account's password: instagrapi would reuse it
+    without checking one.
+    """
+
+    def __init__(self, client_factory=Client):
+        self.client_factory = client_factory
+        self._lock = threading.Lock()
+        self._accounts = {}
+        # Only compares passwords within this process, so it never needs to outlive it
+        self._digest_key = secrets.token_bytes(32)
+
+    def _digest(self, password):
+        return hmac.new(self._digest_key, password.encode(), hashlib.sha256).digest()
+
+    @contextmanager
+    def session(self, username, password):
+        """
+        A logged-in client of username, logging in only if there is no
+        usable session. If the body raises, the client is dropped, and the
+        next caller validates the saved session again.
+
+        Raises:
+            InstagramLoginError: The login failed
+        """
+        with self._lock:
+            account = self._accounts.setdefault(username, _Account())
+        with account.lock:
+            digest = self._digest(password)
+            if account.client is None or not hmac.compare_digest(account.password_digest, digest):
+                account.client = None
+                account.client = self._login(username, password)
+                account.password_digest = digest
+            try:
+                yield account.client
+            except BaseException:
+                account.client = None
+                raise
+            # Cookies and tokens change as the client is used
+            InstagramSession.objects.filter(username=username).update(
+                settings_encrypted=encrypt_settings(account.client.get_settings()), updated_at=timezone.now())
+
+    def _login(self, username, password):
+        client = self.client_factory()
+        saved = InstagramSession.objects.filter(username=username).first()
+        verified = saved is not None and check_password(password, saved.password_hash)
+        if verified:
+            try:
+                client.set_settings(decrypt_settings(saved.settings_encrypted))
+            except (InvalidToken, ValueError):
+                logger.warning(f"Saved Instagram session of {username} can't be read, logging in again")
+
+        try:
+            # With saved settings, instagrapi checks the session and only
+            # logs in again if Instagram rejects it
+            if not client.login(username, password):
+                raise InstagramLoginError(f"Instagram login of {username} failed")
+        except InstagramLoginError:
+            raise
+        except Exception as e:
+            raise InstagramLoginError(f"Instagram login of {username} failed: {e}") from e
+
+        values = {'settings_encrypted': encrypt_settings(client.get_settings())}
+        if not verified:
+            values['password_hash'] = make_password(password)
+        InstagramSession.objects.update_or_create(username=username, defaults=values)
+        return client
+
+_session_pool = None
+_executor = None
+_pool_lock = threading.Lock()
+
+def get_session_pool():
+    global _session_pool
+    with _pool_lock:
+        if _session_pool is None:
+            _session_pool = InstagramSessionPool()
+        return _session_pool
+
+def get_instagram_pool():
+    """The pool uploads run on, sized by settings.INSTAGRAM_UPLOAD_MAX_WORKERS"""
+    global _executor
+    with _pool_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.INSTAGRAM_UPLOAD_MAX_WORKERS,
+                                           thread_name_prefix='instagram')
+        return _executor
+
+def shutdown_instagram_pool():
+    global _executor
+    with _pool_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+def start_instagram_upload(upload, password):
+    """
+    Queue an InstagramUpload to run in the background.
+
+    Args:
+        upload: The InstagramUpload, still PENDING
+        password: The account's password; only kept in memory until the upload runs
+    """
+    return get_instagram_pool().submit(run_instagram_upload, upload.id, password)
+
+def run_instagram_upload(upload_id, password, session_pool=None):
+    """Upload the reel of an InstagramUpload and record how it went"""
+    close_old_connections()
+    try:
+        upload = InstagramUpload.objects.get(id=upload_id)
+        update_job(upload, status='PROCESSING')
+        try:
+            with (session_pool or get_session_pool()).session(upload.username, password) as client:
+                media = InstagramUploader(client).upload_reel(upload.video_url, upload.caption)
+                if media is None:
+                    raise InstagramUploadError("Failed to upload reel")
+        except InstagramLoginError as e:
+            logger.warning(str(e))
+            update_job(upload, status='FAILED', error_message='Instagram login failed')
+        except Exception as e:
+            logger.exception(f"Instagram upload {upload_id} failed")
+            update_job(upload, status='FAILED', error_message=str(e))
+        else:
+            update_job(upload, status='COMPLETED', media_code=media.get('code'), error_message=None)
+    finally:
+        close_old_connections()
@@ -0,0 +1,15 @@
+from django.utils import timezone
+
+def update_job(job, **changes):
+    """
+    Set changes on a job (VideoProcessing, LanguageDubbing, InstagramUpload)
+    and write only those columns (and updated_at) in one UPDATE.
+
+    Job threads write a job's row many times; a full save() would rewrite
+    every column, and could put back a value another writer (e.g. the
+    progress reporter) changed in the meantime.
+    """
+    for name, value in changes.items():
+        setattr(job, name, value)
+    job.updated_at = timezone.now()
+    type(job).objects.filter(pk=job.pk).update(updated_at=job.updated_at, **changes)
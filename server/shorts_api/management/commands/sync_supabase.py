@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from shorts_api.supabase_sync import SupabaseSyncWorker, sync_enabled
+
+class Command(BaseCommand):
+    help = "Send the rows queued in the Supabase outbox, e.g. from a separate process or cron"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help="Send what is due now and exit, instead of running until interrupted")
+
+    def handle(self, *args, **options):
+        if not sync_enabled():
+            raise CommandError("SUPABASE_URL and SUPABASE_KEY are not set")
+
+        worker = SupabaseSyncWorker()
+        if options['once']:
+            total = 0
+            while True:
+                due = worker.flush()
+                if not due:
+                    break
+                total += due
+            self.stdout.write(f"Processed {total} queued rows")
+            return
+
+        worker.start()
+        try:
+            while worker.is_alive():
+                worker.join(1)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            worker.stop()
@@ -0,0 +1,255 @@
+import os
+import time
+import bisect
+import threading
+from contextlib import contextmanager
+from django.utils import timezone
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# How often the resident memory of open measure() blocks is sampled
+RSS_SAMPLE_INTERVAL = 0.1
+
+class StageUsage:
+    """Wall time, CPU time, peak memory and I/O of one stage run"""
+
+    def __init__(self, wall_seconds=0.0, cpu_seconds=0.0, peak_rss_bytes=0, bytes_in=0, bytes_out=0):
+        self.started_at = timezone.now()
+        self.wall_seconds = wall_seconds
+        self.cpu_seconds = cpu_seconds
+        self.peak_rss_bytes = peak_rss_bytes
+        self.bytes_in = bytes_in
+        self.bytes_out = bytes_out
+
+    def add(self, other):
+        """Fold in work done elsewhere on the stage's behalf (e.g. a render worker)"""
+        self.cpu_seconds += other.cpu_seconds
+        self.peak_rss_bytes = max(self.peak_rss_bytes, other.peak_rss_bytes)
+        self.bytes_in += other.bytes_in
+        self.bytes_out += other.bytes_out
+
+def _io_counters():
+    """(bytes read, bytes written) by the calling thread, including pipes and sockets"""
+    try:
+        with open('/proc/thread-self/io') as f:
+            counters = dict(line.split(': ') for line in f.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        # Not Linux; I/O is not measured
+        return 0, 0
+
+_PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+def _current_rss():
+    """Resident memory of this process right now, in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, IndexError, ValueError):
+        # Not Linux; memory is not measured
+        return 0
+
+class _RssSampler:
+    """
+    Samples the process's resident memory into the peak of every open
+    measure() block. getrusage's ru_maxrss can't be used: it is the
+    process's high-water mark since it started, not the stage's.
+    """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._usages = set()
+        self._thread = None
+
+    def add(self, usage):
+        _sample(usage)
+        with self._lock:
+            self._usages.add(usage)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='rss-sampler', daemon=True)
+                self._thread.start()
+
+    def remove(self, usage):
+        with self._lock:
+            self._usages.discard(usage)
+        _sample(usage)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            rss = _current_rss()
+            with self._lock:
+                if not self._usages:
+                    # Started again by the next add()
+                    self._thread = None
+                    return
+                for usage in self._usages:
+                    usage.peak_rss_bytes = max(usage.peak_rss_bytes, rss)
+
+def _sample(usage):
+    usage.peak_rss_bytes = max(usage.peak_rss_bytes, _current_rss())
+
+_sampler = _RssSampler(RSS_SAMPLE_INTERVAL)
+
+_current = threading.local()
+
+@contextmanager
+def measure():
+    """
+    Measure the work done on the calling thread until the block exits.
+
+    Yields the StageUsage, which is filled in when the block exits, even if
+    it raises. Work handed to other threads or processes is only counted if
+    it is reported back with add_child_usage. The peak memory is the most
+    the whole process held while the block ran, sampled every
+    RSS_SAMPLE_INTERVAL seconds, so stages running at the same time in one
+    process see each other's memory.
+    """
+    usage = StageUsage()
+    outer = getattr(_current, 'usage', None)
+    _current.usage = usage
+    _sampler.add(usage)
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    read_start, written_start = _io_counters()
+    try:
+        yield usage
+    finally:
+        read, written = _io_counters()
+        usage.wall_seconds = time.perf_counter() - wall_start
+        usage.cpu_seconds += time.thread_time() - cpu_start
+        usage.bytes_in += read - read_start
+        usage.bytes_out += written - written_start
+        _sampler.remove(usage)
+        _current.usage = outer
+
+def add_child_usage(usage):
+    """Count usage measured in another thread or process towards the current measure() block"""
+    current = getattr(_current, 'usage', None)
+    if current is not None:
+        current.add(usage)
+
+class Histogram:
+    def __init__(self, name, documentation, buckets, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.labelnames = tuple(labelnames)
+        # Label values -> ([count per bucket], sum, count)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            counts, total, count = self._series.get(key, ([0] * len(self.buckets), 0.0, 0))
+            position = bisect.bisect_left(self.buckets, value)
+            if position < len(counts):
+                counts[position] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, (counts, total, count) in series:
+            labels = _labels(self.labelnames, key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + (f'{bound:g}',))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames + ('le',), key + ('+Inf',))} {count}")
+            lines.append(f"{self.name}_sum{labels} {total:g}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+class Counter:
+    def __init__(self, name, documentation, labelnames):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def collect(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        for key, value in values:
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+def _labels(names, values):
+    """{name="value",...} with values escaped for the text format"""
+    pairs = []
+    for name, value in zip(names, values):
+        value = value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+_SECONDS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+_LABELS = ('kind', 'stage', 'status')
+
+STAGE_WALL_SECONDS = Histogram('momentai_stage_duration_seconds', 'Wall time of pipeline stages',
+                               _SECONDS, _LABELS)
+STAGE_CPU_SECONDS = Histogram('momentai_stage_cpu_seconds', 'CPU time of pipeline stages',
+                              _SECONDS, _LABELS)
+STAGE_PEAK_RSS_BYTES = Histogram('momentai_stage_peak_rss_bytes',
+                                 'Peak resident memory of the process while a stage ran',
+                                 [2 ** power * 1024 * 1024 for power in range(6, 15)], _LABELS)
+STAGE_IO_BYTES = Counter('momentai_stage_io_bytes_total', 'Bytes read (in) and written (out) by pipeline stages',
+                         ('kind', 'stage', 'direction'))
+
+REGISTRY = [STAGE_WALL_SECONDS, STAGE_CPU_SECONDS, STAGE_PEAK_RSS_BYTES, STAGE_IO_BYTES]
+
+def render_metrics():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.collect())
+    return '\n'.join(lines) + '\n'
+
+def record_stage_metric(job, name, index, status, usage):
+    """
+    Save a stage's usage for job and add it to the process's histograms.
+
+    Args:
+        job: A VideoProcessing or LanguageDubbing
+        name: Stage name without the short index ('render', not 'render_2')
+        index: Short or chunk index
+        status: 'COMPLETED' or 'FAILED'
+        usage: The StageUsage from measure()
+    """
+    # Imported here: render workers import this module before Django is set up
+    from .models import JobStageMetric, VideoProcessing
+    from .checkpoints import _owner, touch
+
+    if usage is None:
+        return
+    JobStageMetric.objects.create(
+        name=name,
+        index=index,
+        status=status,
+        wall_seconds=usage.wall_seconds,
+        cpu_seconds=usage.cpu_seconds,
+        peak_rss_bytes=usage.peak_rss_bytes,
+        bytes_in=usage.bytes_in,
+        bytes_out=usage.bytes_out,
+        started_at=usage.started_at,
+        **_owner(job)
+    )
+    touch(job)
+
+    kind = 'shorts' if isinstance(job, VideoProcessing) else 'dubbing'
+    labels = {'kind': kind, 'stage': name, 'status': status.lower()}
+    STAGE_WALL_SECONDS.observe(usage.wall_seconds, **labels)
+    STAGE_CPU_SECONDS.observe(usage.cpu_seconds, **labels)
+    STAGE_PEAK_RSS_BYTES.observe(usage.peak_rss_bytes, **labels)
+    STAGE_IO_BYTES.inc(usage.bytes_in, kind=kind, stage=name, direction='in')
+    STAGE_IO_BYTES.inc(usage.bytes_out, kind=kind, stage=name, direction='out')
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0005_languagedubbing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SourceMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source_key', models.CharField(help_text="'youtube:<video id>' or 'sha256:<content hash>'", max_length=100, unique=True)),
+                ('source_url', models.URLField(db_index=True, max_length=1024)),
+                ('file_path', models.CharField(max_length=512)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('resolution', models.CharField(blank=True, max_length=20, null=True)),
+                ('format', models.CharField(blank=True, max_length=20, null=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('last_used_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['last_used_at'],
+            },
+        ),
+    ]
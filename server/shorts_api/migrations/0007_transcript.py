@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-19 05:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0006_sourcemedia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Transcript',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('audio_hash', models.CharField(max_length=64)),
+                ('model_name', models.CharField(max_length=50)),
+                ('language', models.CharField(max_length=20)),
+                ('params_hash', models.CharField(max_length=64)),
+                ('duration', models.FloatField(default=0)),
+                ('data', models.BinaryField(help_text='zlib-compressed JSON list of segments')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('audio_hash', 'model_name', 'language', 'params_hash'), name='unique_transcript_key')],
+            },
+        ),
+        migrations.AddField(
+            model_name='languagedubbing',
+            name='transcript',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='dubbings', to='shorts_api.transcript'),
+        ),
+        migrations.AddField(
+            model_name='videoprocessing',
+            name='transcript',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='video_processings', to='shorts_api.transcript'),
+        ),
+    ]
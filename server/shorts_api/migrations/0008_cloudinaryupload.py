@@ -0,0 +1,25 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0007_transcript'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CloudinaryUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('public_id', models.CharField(help_text='The public_id the upload was requested under', max_length=255, unique=True)),
+                ('content_hash', models.CharField(max_length=64)),
+                ('url', models.URLField(max_length=1024)),
+                ('asset_public_id', models.CharField(help_text='The public_id Cloudinary assigned, including folder', max_length=255)),
+                ('size_bytes', models.BigIntegerField(default=0)),
+                ('uploaded_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
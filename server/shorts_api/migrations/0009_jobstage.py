@@ -0,0 +1,33 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0008_cloudinaryupload'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobStage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('index', models.PositiveIntegerField(default=0, help_text='Short index for per-short stages')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], default='PENDING', max_length=20)),
+                ('artifact_json', models.TextField(blank=True, null=True)),
+                ('error_message', models.TextField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('dubbing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='shorts_api.languagedubbing')),
+                ('video_processing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stages', to='shorts_api.videoprocessing')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+                'constraints': [models.UniqueConstraint(fields=('video_processing', 'name', 'index'), name='unique_video_processing_stage'), models.UniqueConstraint(fields=('dubbing', 'name', 'index'), name='unique_dubbing_stage')],
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0009_jobstage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='JobStageMetric',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('index', models.PositiveIntegerField(default=0, help_text='Short index for per-short stages')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], max_length=20)),
+                ('wall_seconds', models.FloatField(default=0)),
+                ('cpu_seconds', models.FloatField(default=0, help_text="CPU time of the stage's thread and render worker")),
+                ('peak_rss_bytes', models.BigIntegerField(default=0, help_text='Peak resident memory of the process it ran in')),
+                ('bytes_in', models.BigIntegerField(default=0, help_text='Bytes read from files, pipes and sockets')),
+                ('bytes_out', models.BigIntegerField(default=0, help_text='Bytes written to files, pipes and sockets')),
+                ('started_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('dubbing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stage_metrics', to='shorts_api.languagedubbing')),
+                ('video_processing', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='stage_metrics', to='shorts_api.videoprocessing')),
+            ],
+            options={
+                'ordering': ['started_at', 'id'],
+            },
+        ),
+    ]
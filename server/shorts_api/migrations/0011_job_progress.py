@@ -0,0 +1,48 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0010_jobstagemetric'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='languagedubbing',
+            name='progress_eta_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='languagedubbing',
+            name='progress_percent',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='languagedubbing',
+            name='progress_stage',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='videoprocessing',
+            name='progress_eta_seconds',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videoprocessing',
+            name='progress_percent',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='videoprocessing',
+            name='progress_stage',
+            field=models.CharField(blank=True, max_length=50, null=True),
+        ),
+        migrations.AddField(
+            model_name='videoprocessing',
+            name='shorts_completed',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
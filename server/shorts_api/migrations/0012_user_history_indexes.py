@@ -0,0 +1,21 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0011_job_progress'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='languagedubbing',
+            index=models.Index(fields=['username', '-created_at'], name='dubbing_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='videoprocessing',
+            index=models.Index(fields=['username', '-created_at'], name='videoproc_user_created_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:38
+
+import json
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_urls_to_outputs(apps, schema_editor):
+    VideoProcessing = apps.get_model('shorts_api', 'VideoProcessing')
+    ShortOutput = apps.get_model('shorts_api', 'ShortOutput')
+    jobs = VideoProcessing.objects.exclude(cloudinary_urls_json__isnull=True).exclude(cloudinary_urls_json='')
+    for job in jobs.iterator():
+        urls = json.loads(job.cloudinary_urls_json)
+        ShortOutput.objects.bulk_create([
+            ShortOutput(video_processing=job, index=index, url=item['url'], public_id=item['public_id'])
+            for index, item in enumerate(urls)
+        ])
+        VideoProcessing.objects.filter(pk=job.pk).update(shorts_completed=len(urls))
+
+
+def copy_outputs_to_urls(apps, schema_editor):
+    VideoProcessing = apps.get_model('shorts_api', 'VideoProcessing')
+    ShortOutput = apps.get_model('shorts_api', 'ShortOutput')
+    urls = {}
+    for output in ShortOutput.objects.order_by('video_processing', 'index', 'id'):
+        urls.setdefault(output.video_processing_id, []).append({'url': output.url, 'public_id': output.public_id})
+    for job_id, job_urls in urls.items():
+        VideoProcessing.objects.filter(pk=job_id).update(cloudinary_urls_json=json.dumps(job_urls))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0012_user_history_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortOutput',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(help_text="Which of the job's shorts this is")),
+                ('url', models.URLField(max_length=500)),
+                ('public_id', models.CharField(max_length=255)),
+                ('duration', models.FloatField(blank=True, help_text='Seconds', null=True)),
+                ('size_bytes', models.BigIntegerField(blank=True, null=True)),
+                ('highlight_start', models.FloatField(blank=True, help_text='Where the short starts in the source, in seconds', null=True)),
+                ('highlight_end', models.FloatField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('video_processing', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outputs', to='shorts_api.videoprocessing')),
+            ],
+            options={
+                'ordering': ['index', 'id'],
+            },
+        ),
+        migrations.RunPython(copy_urls_to_outputs, copy_outputs_to_urls),
+    ]
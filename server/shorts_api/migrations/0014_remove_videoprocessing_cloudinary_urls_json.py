@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-19 06:38
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # Separate from 0013, whose inserts must be committed before the table is altered
+
+    dependencies = [
+        ('shorts_api', '0013_shortoutput'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='videoprocessing',
+            name='cloudinary_urls_json',
+        ),
+    ]
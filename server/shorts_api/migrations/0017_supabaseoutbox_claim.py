@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:03
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0016_instagram_sessions_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supabaseoutbox',
+            name='claim_token',
+            field=models.CharField(blank=True, help_text='The flush that claimed the row', max_length=32, null=True),
+        ),
+        migrations.AlterField(
+            model_name='supabaseoutbox',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text="When a PENDING row is due, or a SENDING row's lease runs out"),
+        ),
+        migrations.AlterField(
+            model_name='supabaseoutbox',
+            name='status',
+            field=models.CharField(choices=[('PENDING', 'Pending'), ('SENDING', 'Sending'), ('SENT', 'Sent'), ('FAILED', 'Failed')], default='PENDING', max_length=20),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-19 07:32
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def drop_duplicate_outputs(apps, schema_editor):
+    """Keep the latest row of a short recorded more than once, and recount its job"""
+    VideoProcessing = apps.get_model('shorts_api', 'VideoProcessing')
+    ShortOutput = apps.get_model('shorts_api', 'ShortOutput')
+    duplicates = (ShortOutput.objects.values('video_processing', 'index')
+                  .annotate(rows=Count('id'), latest=Max('id')).filter(rows__gt=1))
+    for duplicate in duplicates:
+        ShortOutput.objects.filter(video_processing=duplicate['video_processing'], index=duplicate['index']) \
+            .exclude(id=duplicate['latest']).delete()
+        VideoProcessing.objects.filter(pk=duplicate['video_processing']).update(
+            shorts_completed=ShortOutput.objects.filter(video_processing=duplicate['video_processing']).count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shorts_api', '0017_supabaseoutbox_claim'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_outputs, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='shortoutput',
+            constraint=models.UniqueConstraint(fields=('video_processing', 'index'), name='unique_short_output'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
+from django.utils import timezone
 import json
+import zlib
 
 # Create your models here.
 
@@ -18,12 +20,18 @@ class VideoProcessing(models.Model):
     cloudinary_url = models.URLField(blank=True, null=True)
     cloudinary_public_id = models.CharField(max_length=255, blank=True, null=True)
     num_shorts = models.PositiveIntegerField(default=1)
-    cloudinary_urls_json = models.TextField(blank=True, null=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
     error_message = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     add_captions = models.BooleanField(default=True)
+    transcript = models.ForeignKey('Transcript', on_delete=models.SET_NULL, blank=True, null=True,
+                                   related_name='video_processings')
+    # Live progress, written at most every settings.PROGRESS_DB_INTERVAL seconds
+    progress_stage = models.CharField(max_length=50, blank=True, null=True)
+    progress_percent = models.FloatField(default=0)
+    progress_eta_seconds = models.FloatField(blank=True, null=True)
+    shorts_completed = models.PositiveIntegerField(default=0)
     
     def __str__(self):
         return f"Video Processing: {self.username} - {self.youtube_url} - {self.status}"
@@ -31,26 +39,48 @@ class VideoProcessing(models.Model):
     @property
     def cloudinary_urls(self):
         """Get list of all cloudinary URLs for this processing task"""
-        if not self.cloudinary_urls_json:
-            return []
-        return json.loads(self.cloudinary_urls_json)
+        # outputs.all() uses the prefetched rows when the queryset prefetched them
+        return [{'url': output.url, 'public_id': output.public_id} for output in self.outputs.all()]
     
-    def add_cloudinary_url(self, url, public_id):
-        """Add a cloudinary URL to the list"""
-        urls = self.cloudinary_urls if self.cloudinary_urls_json else []
-        urls.append({
-            'url': url,
-            'public_id': public_id
-        })
-        self.cloudinary_urls_json = json.dumps(urls)
-        # Also update the main cloudinary_url with the first URL for backward compatibility
-        if not self.cloudinary_url and url:
+    def add_output(self, index, url, public_id, duration=None, size_bytes=None, highlight=None):
+        """
+        Record an uploaded short: its row, plus the counter (and the first
+        short's URL, kept for backward compatibility) on this row.
+
+        A short that is recorded again, e.g. by an upload stage that ran
+        again after a crash before its checkpoint, replaces its row and is
+        not counted twice.
+        """
+        highlight = highlight or {}
+        output, created = self.outputs.update_or_create(
+            index=index,
+            defaults={
+                'url': url,
+                'public_id': public_id,
+                'duration': duration,
+                'size_bytes': size_bytes,
+                'highlight_start': highlight.get('start'),
+                'highlight_end': highlight.get('stop'),
+            },
+        )
+        update_fields = ['updated_at']
+        if created:
+            self.shorts_completed += 1
+            update_fields.append('shorts_completed')
+        # Shorts upload concurrently; short 0 wins over whichever finished first
+        if url and (not self.cloudinary_url or index == 0):
             self.cloudinary_url = url
             self.cloudinary_public_id = public_id
-        self.save()
+            update_fields += ['cloudinary_url', 'cloudinary_public_id']
+        self.save(update_fields=update_fields)
+        return output
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A user's history, newest first
+            models.Index(fields=['username', '-created_at'], name='videoproc_user_created_idx'),
+        ]
 
 class LanguageDubbing(models.Model):
     STATUS_CHOICES = (
@@ -84,6 +114,12 @@ class LanguageDubbing(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     add_captions = models.BooleanField(default=True)
+    transcript = models.ForeignKey('Transcript', on_delete=models.SET_NULL, blank=True, null=True,
+                                   related_name='dubbings')
+    # Live progress, written at most every settings.PROGRESS_DB_INTERVAL seconds
+    progress_stage = models.CharField(max_length=50, blank=True, null=True)
+    progress_percent = models.FloatField(default=0)
+    progress_eta_seconds = models.FloatField(blank=True, null=True)
     
     def __str__(self):
         return f"Language Dubbing: {self.username} - {self.source_language} to {self.target_language} - {self.status}"
@@ -107,7 +143,249 @@ class LanguageDubbing(models.Model):
         if not self.cloudinary_url and url:
             self.cloudinary_url = url
             self.cloudinary_public_id = public_id
-        self.save()
+        self.save(update_fields=['cloudinary_urls_json', 'cloudinary_url', 'cloudinary_public_id', 'updated_at'])
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['username', '-created_at'], name='dubbing_user_created_idx'),
+        ]
+
+class JobStage(models.Model):
+    """
+    Completion record of one pipeline stage of a job, with the artifact it
+    produced, so a retried job can resume where it stopped
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    )
+
+    video_processing = models.ForeignKey(VideoProcessing, on_delete=models.CASCADE, blank=True, null=True,
+                                         related_name='stages')
+    dubbing = models.ForeignKey(LanguageDubbing, on_delete=models.CASCADE, blank=True, null=True,
+                                related_name='stages')
+    name = models.CharField(max_length=50)
+    index = models.PositiveIntegerField(default=0, help_text="Short index for per-short stages")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    artifact_json = models.TextField(blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Job Stage: {self.name}[{self.index}] - {self.status}"
+
+    @property
+    def artifact(self):
+        """What the stage produced (paths, IDs, timings), as a dict"""
+        if not self.artifact_json:
+            return {}
+        return json.loads(self.artifact_json)
+
+    @artifact.setter
+    def artifact(self, artifact):
+        self.artifact_json = json.dumps(artifact)
+
+    class Meta:
+        ordering = ['created_at', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['video_processing', 'name', 'index'], name='unique_video_processing_stage'),
+            models.UniqueConstraint(fields=['dubbing', 'name', 'index'], name='unique_dubbing_stage'),
+        ]
+
+class ShortOutput(models.Model):
+    """
+    One uploaded short of a shorts job
+    """
+    video_processing = models.ForeignKey(VideoProcessing, on_delete=models.CASCADE, related_name='outputs')
+    index = models.PositiveIntegerField(help_text="Which of the job's shorts this is")
+    url = models.URLField(max_length=500)
+    public_id = models.CharField(max_length=255)
+    duration = models.FloatField(blank=True, null=True, help_text="Seconds")
+    size_bytes = models.BigIntegerField(blank=True, null=True)
+    highlight_start = models.FloatField(blank=True, null=True, help_text="Where the short starts in the source, in seconds")
+    highlight_end = models.FloatField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Short Output: {self.video_processing_id}[{self.index}] - {self.url}"
+
+    class Meta:
+        ordering = ['index', 'id']
+        constraints = [
+            models.UniqueConstraint(fields=['video_processing', 'index'], name='unique_short_output'),
+        ]
+
+class JobStageMetric(models.Model):
+    """
+    Resource usage of one run of a pipeline stage. A retried stage gets a
+    row per attempt.
+    """
+    video_processing = models.ForeignKey(VideoProcessing, on_delete=models.CASCADE, blank=True, null=True,
+                                         related_name='stage_metrics')
+    dubbing = models.ForeignKey(LanguageDubbing, on_delete=models.CASCADE, blank=True, null=True,
+                                related_name='stage_metrics')
+    name = models.CharField(max_length=50)
+    index = models.PositiveIntegerField(default=0, help_text="Short index for per-short stages")
+    status = models.CharField(max_length=20, choices=JobStage.STATUS_CHOICES)
+    wall_seconds = models.FloatField(default=0)
+    cpu_seconds = models.FloatField(default=0, help_text="CPU time of the stage's thread and render worker")
+    peak_rss_bytes = models.BigIntegerField(default=0, help_text="Peak resident memory of the process it ran in")
+    bytes_in = models.BigIntegerField(default=0, help_text="Bytes read from files, pipes and sockets")
+    bytes_out = models.BigIntegerField(default=0, help_text="Bytes written to files, pipes and sockets")
+    started_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Job Stage Metric: {self.name}[{self.index}] - {self.wall_seconds:.1f}s"
+
+    class Meta:
+        ordering = ['started_at', 'id']
+
+class SourceMedia(models.Model):
+    """
+    A downloaded source video, shared read-only by every job that uses it
+    """
+    source_key = models.CharField(max_length=100, unique=True,
+                                  help_text="'youtube:<video id>' or 'sha256:<content hash>'")
+    source_url = models.URLField(max_length=1024, db_index=True)
+    file_path = models.CharField(max_length=512)
+    size_bytes = models.BigIntegerField(default=0)
+    resolution = models.CharField(max_length=20, blank=True, null=True)
+    format = models.CharField(max_length=20, blank=True, null=True)
+    ref_count = models.PositiveIntegerField(default=0)
+    last_used_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Source Media: {self.source_key} - {self.file_path}"
+
+    class Meta:
+        ordering = ['last_used_at']
+
+class CloudinaryUpload(models.Model):
+    """
+    The content last uploaded under a public_id, so identical files are not sent twice
+    """
+    public_id = models.CharField(max_length=255, unique=True, help_text="The public_id the upload was requested under")
+    content_hash = models.CharField(max_length=64)
+    url = models.URLField(max_length=1024)
+    asset_public_id = models.CharField(max_length=255, help_text="The public_id Cloudinary assigned, including folder")
+    size_bytes = models.BigIntegerField(default=0)
+    uploaded_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Cloudinary Upload: {self.public_id} - {self.content_hash[:12]}"
+
+class Transcript(models.Model):
+    """
+    A whisper transcript with word timings, stored once per
+    (audio content, model, language, decode settings)
+    """
+    audio_hash = models.CharField(max_length=64)
+    model_name = models.CharField(max_length=50)
+    language = models.CharField(max_length=20)
+    params_hash = models.CharField(max_length=64)
+    duration = models.FloatField(default=0)
+    data = models.BinaryField(help_text="zlib-compressed JSON list of segments")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Transcript: {self.audio_hash[:12]} - {self.model_name} - {self.language}"
+
+    @property
+    def segments(self):
+        """Segments as [{"text", "start", "end", "words": [{"word", "start", "end"}]}]"""
+        return json.loads(zlib.decompress(bytes(self.data)))
+
+    @segments.setter
+    def segments(self, segments):
+        self.data = zlib.compress(json.dumps(segments, separators=(',', ':')).encode('utf-8'))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['audio_hash', 'model_name', 'language', 'params_hash'],
+                name='unique_transcript_key',
+            ),
+        ]
+
+class SupabaseOutbox(models.Model):
+    """
+    A row waiting to be inserted into a Supabase table. Written in the
+    transaction that completes a job, sent by the Supabase sync worker
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('SENDING', 'Sending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed'),
+    )
+
+    table = models.CharField(max_length=100)
+    dedupe_key = models.CharField(max_length=255, unique=True,
+                                  help_text="Identifies what the row is about, so it is only queued once")
+    payload_json = models.TextField()
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now,
+                                           help_text="When a PENDING row is due, or a SENDING row's lease runs out")
+    claim_token = models.CharField(max_length=32, blank=True, null=True,
+                                   help_text="The flush that claimed the row")
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    @property
+    def payload(self):
+        return json.loads(self.payload_json)
+
+    def __str__(self):
+        return f"Supabase Outbox: {self.table} {self.dedupe_key} - {self.status}"
+
+    class Meta:
+        ordering = ['id']
+        indexes = [
+            # The worker's "what is due" query
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+
+class InstagramSession(models.Model):
+    """
+    The saved instagrapi session of an Instagram account, so uploads reuse
+    it instead of logging in again. The settings are stored encrypted
+    """
+    username = models.CharField(max_length=255, unique=True)
+    password_hash = models.CharField(max_length=255,
+                                     help_text="Checked before the session is used on someone's behalf")
+    settings_encrypted = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Instagram Session: {self.username}"
+
+class InstagramUpload(models.Model):
+    """
+    A reel upload to Instagram, run in the background
+    """
+    STATUS_CHOICES = (
+        ('PENDING', 'Pending'),
+        ('PROCESSING', 'Processing'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed'),
+    )
+
+    username = models.CharField(max_length=255)
+    video_url = models.URLField(max_length=500)
+    caption = models.TextField(blank=True, default='')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='PENDING')
+    media_code = models.CharField(max_length=100, blank=True, null=True)
+    error_message = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Instagram Upload: {self.username} - {self.status}"
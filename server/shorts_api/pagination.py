@@ -0,0 +1,12 @@
+from rest_framework.pagination import CursorPagination
+
+class UserJobsPagination(CursorPagination):
+    """
+    A user's jobs, newest first, a page at a time. The cursor keeps pages
+    stable while new jobs are created and walks the (username, -created_at)
+    index instead of counting and offsetting.
+    """
+    ordering = '-created_at'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -0,0 +1,219 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from django.conf import settings
+from .metrics import measure
+
+logger = logging.getLogger(__name__)
+
+# Resource classes a stage can declare; each has its own concurrency limit
+CPU = 'cpu'
+IO = 'io'
+API = 'api'
+
+def stage_key(stage_name):
+    """The (name, index) of a per-short or per-chunk stage: 'render_2' -> ('render', 2), 'ingest' -> ('ingest', 0)"""
+    name, _, index = stage_name.rpartition('_')
+    if name and index.isdigit():
+        return name, int(index)
+    return stage_name, 0
+
+class Stage:
+    """
+    One step of a pipeline.
+
+    Args:
+        name: Unique name within the pipeline
+        func: Called with the stage's inputs as positional arguments,
+            in the order they are listed
+        inputs: Names of the values the stage needs, produced by other
+            stages or passed to Pipeline.run
+        outputs: Names of the values the stage produces. With one output
+            func returns the value itself, with several a dict by name
+        resource: CPU, IO or API, the class whose limit the stage counts against
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), resource=CPU):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.resource = resource
+        # StageUsage of the last run, set by Pipeline.run
+        self.usage = None
+
+    def __repr__(self):
+        return f"Stage({self.name!r})"
+
+    def run(self, values):
+        with measure() as self.usage:
+            result = self.func(*(values[name] for name in self.inputs))
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        return {name: result[name] for name in self.outputs}
+
+class PipelineResult:
+    def __init__(self, values, failed, skipped):
+        # Every value passed in or produced
+        self.values = values
+        # Stage name -> the exception it raised
+        self.failed = failed
+        # Names of stages that never ran because something they need failed
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return not self.failed and not self.skipped
+
+class Pipeline:
+    """
+    A graph of stages, wired together by the values they consume and produce.
+
+    Stages whose inputs are all available run concurrently, within a
+    per-resource-class limit. A failing stage only takes down the stages
+    that depend on it; independent branches keep running.
+    """
+
+    def __init__(self, stages, limits=None):
+        self.stages = list(stages)
+        self.limits = dict(settings.PIPELINE_LIMITS, **(limits or {}))
+        if any(limit < 1 for limit in self.limits.values()):
+            raise ValueError(f"Every resource class needs a limit of at least 1, got {self.limits}")
+
+        self.producers = {}
+        names = set()
+        for stage in self.stages:
+            if stage.name in names:
+                raise ValueError(f"Duplicate stage name {stage.name!r}")
+            names.add(stage.name)
+            if stage.resource not in self.limits:
+                raise ValueError(f"Stage {stage.name!r} has unknown resource class {stage.resource!r}")
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"{output!r} is produced by both {self.producers[output].name!r} and {stage.name!r}")
+                self.producers[output] = stage
+
+    def dependencies(self, stage):
+        """The stages that produce stage's inputs"""
+        return {self.producers[name] for name in stage.inputs if name in self.producers}
+
+    def _check(self, initial):
+        for stage in self.stages:
+            for name in stage.inputs:
+                if name not in self.producers and name not in initial:
+                    raise ValueError(f"Stage {stage.name!r} needs {name!r}, which nothing provides")
+
+        # Depth-first search for cycles
+        visiting, done = set(), set()
+
+        def visit(stage):
+            if stage in done:
+                return
+            if stage in visiting:
+                raise ValueError(f"Pipeline has a cycle through {stage.name!r}")
+            visiting.add(stage)
+            for dependency in self.dependencies(stage):
+                visit(dependency)
+            visiting.discard(stage)
+            done.add(stage)
+
+        for stage in self.stages:
+            visit(stage)
+
+    def run(self, initial=None, on_complete=None, on_start=None):
+        """
+        Run every stage and return a PipelineResult.
+
+        Args:
+            initial: Values available before any stage runs
+            on_complete: Optional callback(stage, outputs, error) invoked on
+                the calling thread as each stage finishes, so callers can
+                record progress without touching the database from
+                worker threads. stage.usage holds what the run cost
+            on_start: Optional callback(stage) invoked on the calling
+                thread as each stage is started
+
+        Raises:
+            ValueError: If an input is never provided or the graph has a cycle
+        """
+        values = dict(initial or {})
+        self._check(values)
+
+        waiting = list(self.stages)
+        running = {}
+        busy = {resource: 0 for resource in self.limits}
+        failed = {}
+        skipped = set()
+
+        def ready(stage):
+            return all(name in values for name in stage.inputs)
+
+        def blocked(stage):
+            return any(dependency.name in failed or dependency.name in skipped
+                       for dependency in self.dependencies(stage))
+
+        with ThreadPoolExecutor(max_workers=max(1, sum(self.limits.values())),
+                                thread_name_prefix='stage') as executor:
+            while waiting or running:
+                # Drop stages that can never run, then start what is ready
+                for stage in list(waiting):
+                    if blocked(stage):
+                        waiting.remove(stage)
+                        skipped.add(stage.name)
+                        logger.info(f"Skipping stage {stage.name}: an input failed")
+                    elif ready(stage) and busy[stage.resource] < self.limits[stage.resource]:
+                        waiting.remove(stage)
+                        busy[stage.resource] += 1
+                        running[executor.submit(stage.run, values)] = stage
+                        if on_start:
+                            on_start(stage)
+
+                if not running:
+                    # Everything left is skipped; the loop ends on the next pass
+                    continue
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage = running.pop(future)
+                    busy[stage.resource] -= 1
+                    try:
+                        outputs = future.result()
+                    except Exception as e:
+                        logger.exception(f"Stage {stage.name} failed")
+                        failed[stage.name] = e
+                        if on_complete:
+                            on_complete(stage, None, e)
+                        continue
+                    values.update(outputs)
+                    if on_complete:
+                        on_complete(stage, outputs, None)
+
+        return PipelineResult(values, failed, skipped)
+
+def prune(stages, initial, targets):
+    """
+    The stages needed to produce targets, given the values already in initial.
+
+    Lets a pipeline builder declare every stage and then leave out the ones
+    whose outputs an earlier attempt already produced.
+    """
+    producers = {output: stage for stage in stages for output in stage.outputs}
+    needed = []
+    seen = set()
+
+    def require(name):
+        if name in initial or name not in producers:
+            return
+        stage = producers[name]
+        if stage.name in seen:
+            return
+        seen.add(stage.name)
+        for dependency in stage.inputs:
+            require(dependency)
+        needed.append(stage)
+
+    for target in targets:
+        require(target)
+    # Keep declaration order so scheduling stays predictable
+    return [stage for stage in stages if stage in needed]
@@ -0,0 +1,156 @@
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .models import VideoProcessing
+from .jobstate import update_job
+from .pipeline import stage_key
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ('COMPLETED', 'FAILED')
+
+# Rough share of a job's time each kind of stage takes, for the percentage
+STAGE_WEIGHTS = {
+    'ingest': 3,
+    'highlight': 1,
+    'render': 6,
+    'upload': 1,
+    'translate': 1,
+    'tts': 2,
+    'speech': 1,
+    'merge': 2,
+    'captions': 3,
+}
+
+def job_kind(job):
+    return 'shorts' if isinstance(job, VideoProcessing) else 'dubbing'
+
+def snapshot_from_job(job):
+    """The progress snapshot of a job as last saved"""
+    snapshot = {
+        'id': job.id,
+        'status': job.status,
+        'stage': job.progress_stage,
+        'percent': job.progress_percent,
+        'eta_seconds': job.progress_eta_seconds,
+        'error_message': job.error_message,
+        'version': 0,
+    }
+    if isinstance(job, VideoProcessing):
+        snapshot['shorts_completed'] = job.shorts_completed
+        snapshot['num_shorts'] = job.num_shorts
+    return snapshot
+
+class ProgressBroker:
+    """
+    Latest progress of every job this process ran recently, pushed to
+    subscribed event streams as it changes. Jobs publish from their own
+    threads; subscribers are asyncio queues on the server's event loop.
+    """
+
+    def __init__(self, max_jobs=10000):
+        self.max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._latest = OrderedDict()
+        self._subscribers = {}
+
+    def publish(self, key, snapshot):
+        with self._lock:
+            self._latest[key] = snapshot
+            self._latest.move_to_end(key)
+            while len(self._latest) > self.max_jobs:
+                self._latest.popitem(last=False)
+            subscribers = list(self._subscribers.get(key, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, snapshot)
+            except RuntimeError:
+                # The subscriber's loop has closed
+                self.unsubscribe(key, queue)
+
+    def latest(self, key):
+        with self._lock:
+            return self._latest.get(key)
+
+    def subscribe(self, key):
+        """An asyncio.Queue receiving key's snapshots; call from the event loop"""
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, key, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(key, set())
+            subscribers.difference_update({entry for entry in subscribers if entry[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(key, None)
+
+broker = ProgressBroker()
+
+class ProgressReporter:
+    """
+    Progress of one job run, computed from the stages of its pipeline.
+
+    Every change is published to the broker right away; the job's row is
+    only written every settings.PROGRESS_DB_INTERVAL seconds, and when the
+    run finishes, together with its final status. Use from the job's own
+    thread.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.key = (job_kind(job), job.id)
+        self.started = time.monotonic()
+        self.total = 0
+        self.done = 0
+        self.version = 0
+        self._last_write = None
+
+    def expect(self, stages):
+        """Add stages (Stage objects or names) this run still has to do"""
+        self.total += sum(_weight(stage) for stage in stages)
+        self._publish(self.job.progress_stage)
+
+    def stage_started(self, stage):
+        self._publish(stage_key(getattr(stage, 'name', stage))[0])
+
+    def stage_finished(self, stage):
+        # Failed stages count as done too: nothing more will happen to them
+        self.done += _weight(stage)
+        self._publish(self.job.progress_stage)
+
+    def finish(self):
+        """Publish the job's final state and save it with its status and error, in one write"""
+        if self.job.status == 'COMPLETED':
+            self.done = self.total
+        self._publish(None, force=True, status=self.job.status, error_message=self.job.error_message)
+
+    def _publish(self, stage, force=False, **fields):
+        job = self.job
+        if self.total:
+            fraction = min(1.0, self.done / self.total)
+        else:
+            fraction = 1.0 if job.status == 'COMPLETED' else 0.0
+        elapsed = time.monotonic() - self.started
+        job.progress_stage = stage
+        job.progress_percent = round(fraction * 100, 1)
+        job.progress_eta_seconds = round(elapsed * (1 - fraction) / fraction, 1) if 0 < fraction < 1 else None
+
+        self.version += 1
+        snapshot = snapshot_from_job(job)
+        snapshot['version'] = self.version
+        broker.publish(self.key, snapshot)
+
+        now = time.monotonic()
+        if force or self._last_write is None or now - self._last_write >= settings.PROGRESS_DB_INTERVAL:
+            self._last_write = now
+            # Only the progress columns, so the write never clobbers the job's other fields
+            update_job(job, progress_stage=job.progress_stage, progress_percent=job.progress_percent,
+                       progress_eta_seconds=job.progress_eta_seconds, **fields)
+
+def _weight(stage):
+    return STAGE_WEIGHTS.get(stage_key(getattr(stage, 'name', stage))[0], 1)
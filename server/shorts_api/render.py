@@ -0,0 +1,164 @@
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import cv2
+from django.conf import settings
+from .metrics import measure, add_child_usage
+from Components.YoutubeDownloader import download_video_range
+from Components.Edit import crop_video
+from Components.FaceCrop import crop_to_vertical, combine_videos
+from Components.GenerateCaptions import add_captions
+
+logger = logging.getLogger(__name__)
+
+def render_short(job_id, index, vid, start, stop, audio, add_captions_enabled, workdir, source=None):
+    """
+    Render one highlight into a finished short: crop, reframe to vertical,
+    combine with the original audio and (optionally) burn in captions.
+
+    Runs in a render worker process, so it must not touch the database.
+
+    Args:
+        job_id: ID of the VideoProcessing job, used to name output files
+        index: Index of the short within the job
+        vid: Path of the source video (unused for audio-first sources)
+        start, stop: Highlight bounds in source time (seconds)
+        audio: 16 kHz mono samples of just this highlight
+        add_captions_enabled: Whether to burn in captions
+        workdir: The job's scratch directory; every file is written there
+        source: Signed stream URLs for audio-first ingest, or None
+
+    Returns:
+        Path of the finished short inside workdir, or None if it could not
+        be rendered
+    """
+    output = os.path.join(workdir, f"Out_{index}.mp4")
+
+    # Crop video to highlight section
+    if source:
+        # Fetch just the video around this highlight
+        clip, offset = download_video_range(
+            source['video_url'],
+            os.path.join(workdir, f"range_{index}.mp4"),
+            start,
+            stop,
+            audio_url=source['audio_url']
+        )
+        if not clip:
+            print(f"Error fetching video for highlight {index+1}, skipping")
+            return None
+        crop_video(clip, output, start - offset, stop - offset)
+    else:
+        crop_video(vid, output, start, stop)
+
+    # Crop to vertical
+    cropped = os.path.join(workdir, f"cropped_{index}.mp4")
+    crop_to_vertical(output, cropped, audio=audio)
+
+    # Combine videos
+    final_path = os.path.join(workdir, f"final_{job_id}_{index}.mp4")
+    combine_videos(output, cropped, final_path)
+    if not os.path.exists(final_path):
+        return None
+
+    # Add captions to the video if enabled
+    if add_captions_enabled:
+        try:
+            captioned_path = os.path.join(workdir, f"final_{job_id}_{index}_captioned.mp4")
+
+            # Generate captions using the local Whisper model for better accuracy
+            add_captions(
+                final_path,
+                captioned_path,
+                font="PoetsenOne-Regular.ttf",
+                font_size=100,
+                font_color="white",
+                stroke_width=2,
+                stroke_color="black",
+                highlight_current_word=True,
+                word_highlight_color="#29BFFF",
+                line_count=2,
+                padding=40,
+                shadow_strength=1.0,
+                shadow_blur=0.1,
+                use_local_whisper=True,
+                audio=audio,
+                print_info=True
+            )
+
+            # Use the captioned video if it was created successfully
+            if os.path.exists(captioned_path):
+                final_path = captioned_path
+                print(f"Successfully added captions to short {index+1}")
+            else:
+                print(f"Failed to add captions to short {index+1}, using original video")
+        except Exception as e:
+            print(f"Error adding captions to short {index+1}: {str(e)}, using original video")
+    else:
+        print(f"Captions disabled for this processing task, skipping caption generation")
+
+    return final_path
+
+def _init_worker(threads):
+    # Each worker gets a slice of the CPU budget; don't let OpenCV grab every core
+    cv2.setNumThreads(threads)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_render_pool():
+    """The machine-wide render pool, sized by settings.RENDER_MAX_WORKERS"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.RENDER_MAX_WORKERS,
+                mp_context=multiprocessing.get_context(settings.RENDER_START_METHOD),
+                initializer=_init_worker,
+                initargs=(settings.RENDER_THREADS_PER_WORKER,),
+            )
+        return _pool
+
+def _reset_render_pool(broken):
+    """Replace the pool after a worker died, unless another job already did"""
+    global _pool
+    with _pool_lock:
+        if _pool is broken:
+            _pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_render_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+def _measured(render, kwargs):
+    # Runs in the worker, so the CPU time and memory are the worker's
+    with measure() as usage:
+        result = render(**kwargs)
+    return result, usage
+
+def render_in_pool(kwargs, render=render_short):
+    """
+    Run render(**kwargs) in the shared process pool and return its result.
+
+    The worker's usage is added to the caller's measure() block. If the
+    worker dies (e.g. out of memory) it takes the pool with it; the pool is
+    replaced and the render gets one more try.
+    """
+    for attempt in range(2):
+        pool = get_render_pool()
+        try:
+            result, usage = pool.submit(_measured, render, kwargs).result()
+            add_child_usage(usage)
+            return result
+        except BrokenProcessPool:
+            _reset_render_pool(pool)
+            if attempt:
+                raise
+            logger.warning(f"Render worker died during short {kwargs.get('index', 0) + 1}, retrying")
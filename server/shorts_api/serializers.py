@@ -1,20 +1,58 @@
 from rest_framework import serializers
-from .models import VideoProcessing, LanguageDubbing
+from .models import VideoProcessing, LanguageDubbing, Transcript, JobStage, JobStageMetric, ShortOutput, InstagramUpload
+
+class JobStageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JobStage
+        fields = ['name', 'index', 'status', 'error_message', 'updated_at']
+        read_only_fields = fields
+
+class JobStageMetricSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JobStageMetric
+        fields = ['name', 'index', 'status', 'wall_seconds', 'cpu_seconds', 'peak_rss_bytes',
+                  'bytes_in', 'bytes_out', 'started_at']
+        read_only_fields = fields
+
+class ShortOutputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShortOutput
+        fields = ['index', 'url', 'public_id', 'duration', 'size_bytes', 'highlight_start', 'highlight_end',
+                  'created_at']
+        read_only_fields = fields
 
 class VideoProcessingSerializer(serializers.ModelSerializer):
     cloudinary_urls = serializers.SerializerMethodField()
+    outputs = ShortOutputSerializer(many=True, read_only=True)
+    stages = JobStageSerializer(many=True, read_only=True)
+    stage_metrics = JobStageMetricSerializer(many=True, read_only=True)
     
     class Meta:
         model = VideoProcessing
-        fields = ['id', 'username', 'youtube_url', 'status', 'cloudinary_url', 
-                  'cloudinary_urls', 'num_shorts', 'created_at', 'updated_at']
-        read_only_fields = ['id', 'status', 'cloudinary_url', 'cloudinary_urls', 
-                            'created_at', 'updated_at']
+        fields = ['id', 'username', 'youtube_url', 'status', 'error_message', 'cloudinary_url', 
+                  'cloudinary_urls', 'outputs', 'num_shorts', 'progress_stage', 'progress_percent',
+                  'progress_eta_seconds', 'shorts_completed', 'stages', 'stage_metrics', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'status', 'error_message', 'cloudinary_url', 'cloudinary_urls', 'outputs',
+                            'progress_stage', 'progress_percent', 'progress_eta_seconds', 'shorts_completed',
+                            'stages', 'stage_metrics', 'created_at', 'updated_at']
     
     def get_cloudinary_urls(self, obj):
         """Return all cloudinary URLs for this processing task"""
         return obj.cloudinary_urls
 
+class VideoProcessingListSerializer(serializers.ModelSerializer):
+    """A row of a user's history: only what the history lists show"""
+    cloudinary_urls = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = VideoProcessing
+        fields = ['id', 'username', 'youtube_url', 'status', 'error_message', 'cloudinary_url',
+                  'cloudinary_urls', 'num_shorts', 'created_at', 'updated_at']
+        read_only_fields = fields
+    
+    def get_cloudinary_urls(self, obj):
+        return obj.cloudinary_urls
+
 class VideoRequestSerializer(serializers.Serializer):
     url = serializers.URLField(required=True)
     username = serializers.CharField(required=True, max_length=100)
@@ -23,19 +61,36 @@ class VideoRequestSerializer(serializers.Serializer):
 
 class LanguageDubbingSerializer(serializers.ModelSerializer):
     cloudinary_urls = serializers.SerializerMethodField()
+    stages = JobStageSerializer(many=True, read_only=True)
+    stage_metrics = JobStageMetricSerializer(many=True, read_only=True)
     
     class Meta:
         model = LanguageDubbing
         fields = ['id', 'username', 'video_url', 'source_language', 'target_language',
-                 'voice', 'status', 'cloudinary_url', 'cloudinary_urls', 
-                 'created_at', 'updated_at']
-        read_only_fields = ['id', 'status', 'cloudinary_url', 'cloudinary_urls', 
-                           'created_at', 'updated_at']
+                 'voice', 'status', 'error_message', 'cloudinary_url', 'cloudinary_urls', 
+                 'progress_stage', 'progress_percent', 'progress_eta_seconds',
+                 'stages', 'stage_metrics', 'created_at', 'updated_at']
+        read_only_fields = ['id', 'status', 'error_message', 'cloudinary_url', 'cloudinary_urls', 
+                           'progress_stage', 'progress_percent', 'progress_eta_seconds',
+                           'stages', 'stage_metrics', 'created_at', 'updated_at']
     
     def get_cloudinary_urls(self, obj):
         """Return all cloudinary URLs for this dubbing task"""
         return obj.cloudinary_urls
 
+class LanguageDubbingListSerializer(serializers.ModelSerializer):
+    """A row of a user's history: only what the history lists show"""
+    cloudinary_urls = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = LanguageDubbing
+        fields = ['id', 'username', 'video_url', 'source_language', 'target_language', 'voice',
+                  'status', 'error_message', 'cloudinary_url', 'cloudinary_urls', 'created_at', 'updated_at']
+        read_only_fields = fields
+    
+    def get_cloudinary_urls(self, obj):
+        return obj.cloudinary_urls
+
 class DubbingRequestSerializer(serializers.Serializer):
     url = serializers.URLField(required=True)
     username = serializers.CharField(required=True, max_length=100)
@@ -46,4 +101,23 @@ class DubbingRequestSerializer(serializers.Serializer):
         default='alloy',
         choices=[choice[0] for choice in LanguageDubbing.VOICE_CHOICES]
     )
-    add_captions = serializers.BooleanField(required=False, default=True) 
\ No newline at end of file
+    add_captions = serializers.BooleanField(required=False, default=True) 
+
+class TranscriptSerializer(serializers.ModelSerializer):
+    segments = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Transcript
+        fields = ['id', 'model_name', 'language', 'duration', 'segments', 'created_at']
+        read_only_fields = fields
+    
+    def get_segments(self, obj):
+        """Return the segments with their word timings"""
+        return obj.segments
+
+class InstagramUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = InstagramUpload
+        fields = ['id', 'username', 'video_url', 'caption', 'status', 'media_code', 'error_message',
+                  'created_at', 'updated_at']
+        read_only_fields = fields
@@ -0,0 +1,202 @@
+import os
+import stat
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+from urllib.parse import urlparse, parse_qs
+import cv2
+from django.conf import settings
+from django.db.models import F, Sum
+from django.utils import timezone
+from .models import SourceMedia
+
+logger = logging.getLogger(__name__)
+
+# One lock per source key so concurrent jobs for the same source download it once
+_key_locks = {}
+_key_locks_lock = threading.Lock()
+
+def _lock_for(key):
+    with _key_locks_lock:
+        return _key_locks.setdefault(key, threading.Lock())
+
+def youtube_video_id(url):
+    """
+    Extract the canonical video ID from the common YouTube URL shapes
+    (watch?v=, youtu.be/, /shorts/, /embed/, /live/), or None
+    """
+    parsed = urlparse(url)
+    host = parsed.netloc.lower().split(':')[0]
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+
+    if host == 'youtu.be':
+        video_id = parsed.path.lstrip('/').split('/')[0]
+    elif host in ('youtube.com', 'music.youtube.com', 'youtube-nocookie.com'):
+        parts = parsed.path.strip('/').split('/')
+        if parts[0] == 'watch':
+            video_id = parse_qs(parsed.query).get('v', [''])[0]
+        elif len(parts) > 1 and parts[0] in ('shorts', 'embed', 'live', 'v'):
+            video_id = parts[1]
+        else:
+            video_id = ''
+    else:
+        return None
+
+    return video_id or None
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _probe_resolution(path):
+    cap = cv2.VideoCapture(path)
+    try:
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    finally:
+        cap.release()
+    return f"{height}p" if height else None
+
+def _touch(media):
+    """
+    Take a reference on a cached source and mark it as recently used.
+    Returns None if the source was evicted in the meantime.
+    """
+    updated = SourceMedia.objects.filter(pk=media.pk).update(
+        ref_count=F('ref_count') + 1,
+        last_used_at=timezone.now()
+    )
+    if not updated:
+        return None
+    media.refresh_from_db()
+    return media
+
+def _namespace(name, variant):
+    return f"{name}-{variant}" if variant else name
+
+def _lookup(source_key=None, source_url=None, variant=None):
+    queryset = SourceMedia.objects.all()
+    if source_key:
+        queryset = queryset.filter(source_key=source_key)
+    else:
+        queryset = queryset.filter(source_url=source_url,
+                                   source_key__startswith=f"{_namespace('sha256', variant)}:")
+    for media in queryset:
+        if os.path.exists(media.file_path):
+            return media
+        # The file was removed behind our back; forget about it
+        media.delete()
+    return None
+
+def acquire_source(url, download, variant=None):
+    """
+    Return the cached SourceMedia for url, downloading it on a miss.
+
+    YouTube sources are keyed by their video ID, anything else by the
+    SHA-256 of the downloaded content (with the URL remembered, so repeat
+    URLs are not downloaded again).
+
+    Args:
+        url: The source URL
+        download: Callable taking a directory and returning the path of the
+            file it downloaded there, or None on failure
+        variant: Name of another rendition of the source than the full
+            video, e.g. 'audio'; it is cached under its own keys
+
+    Returns:
+        The SourceMedia with a reference taken (pair with release_source),
+        or None if the download failed
+    """
+    video_id = youtube_video_id(url)
+    if video_id:
+        lock_key = f"{_namespace('youtube', variant)}:{video_id}"
+    else:
+        lock_key = f"{_namespace('url', variant)}:{url}"
+
+    with _lock_for(lock_key):
+        media = _lookup(source_key=lock_key) if video_id else _lookup(source_url=url, variant=variant)
+        if media and _touch(media):
+            logger.info(f"Source cache hit for {url}: {media.file_path}")
+            return media
+
+        cache_dir = settings.SOURCE_CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        download_dir = tempfile.mkdtemp(dir=cache_dir, prefix='.download-')
+        try:
+            downloaded = download(download_dir)
+            if not downloaded or not os.path.exists(downloaded):
+                return None
+
+            source_key = lock_key if video_id else f"{_namespace('sha256', variant)}:{_file_sha256(downloaded)}"
+            media = _lookup(source_key=source_key)
+            if media and _touch(media):
+                # Same content already cached under another URL
+                return media
+
+            extension = os.path.splitext(downloaded)[1].lstrip('.') or 'mp4'
+            file_path = os.path.join(cache_dir, f"{source_key.replace(':', '_')}.{extension}")
+            os.replace(downloaded, file_path)
+            # Jobs share the file, so nobody may modify it in place
+            os.chmod(file_path, stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+
+            media = SourceMedia.objects.create(
+                source_key=source_key,
+                source_url=url,
+                file_path=file_path,
+                size_bytes=os.path.getsize(file_path),
+                resolution=_probe_resolution(file_path),
+                format=extension,
+                ref_count=1,
+            )
+        finally:
+            shutil.rmtree(download_dir, ignore_errors=True)
+
+    evict_sources()
+    return media
+
+def release_source(media):
+    """Drop a reference taken by acquire_source"""
+    if media is None:
+        return
+    SourceMedia.objects.filter(pk=media.pk, ref_count__gt=0).update(ref_count=F('ref_count') - 1)
+
+def reset_source_refs():
+    """
+    Drop every reference on cached sources. Only for server startup: the
+    references belong to job threads, so those of an earlier process that
+    crashed or restarted mid-job are never released otherwise, and the
+    sources they pin would never be evicted.
+
+    Returns:
+        How many sources were still referenced
+    """
+    released = SourceMedia.objects.filter(ref_count__gt=0).update(ref_count=0)
+    if released:
+        logger.info(f"Released {released} cached sources still referenced by an earlier process")
+        evict_sources()
+    return released
+
+def evict_sources(max_bytes=None):
+    """
+    Delete least recently used sources until the cache fits its disk budget.
+    Sources referenced by running jobs are never evicted.
+    """
+    max_bytes = settings.SOURCE_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    total = SourceMedia.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+
+    for media in SourceMedia.objects.filter(ref_count=0).order_by('last_used_at'):
+        if total <= max_bytes:
+            break
+        # Only delete the row if it is still unreferenced at this point
+        if SourceMedia.objects.filter(pk=media.pk, ref_count=0).delete()[0]:
+            try:
+                os.remove(media.file_path)
+            except FileNotFoundError:
+                pass
+            total -= media.size_bytes
+            logger.info(f"Evicted cached source {media.source_key}")
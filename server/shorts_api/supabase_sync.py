@@ -0,0 +1,232 @@
+"""
+Supabase sync through an outbox.
+
+A completed job queues its rows in the SupabaseOutbox table, in the same
+transaction that marks it completed, so jobs never wait on Supabase and a
+crash between the two loses nothing. A background worker claims due rows,
+sends them in bulk inserts through one long-lived client and retries
+failed batches with exponential backoff. A batch Supabase rejects is split
+up, so only the rows it refuses are retried.
+"""
+import json
+import uuid
+import random
+import logging
+import threading
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Min, Q
+from django.utils import timezone
+from .models import SupabaseOutbox
+
+logger = logging.getLogger(__name__)
+
+def sync_enabled():
+    return bool(settings.SUPABASE_URL and settings.SUPABASE_KEY)
+
+def enqueue_shorts(video_processing):
+    """
+    Queue a Supabase row for every uploaded short of video_processing.
+
+    Call inside the transaction that marks the job completed; the worker is
+    woken once it commits. Shorts queued by an earlier run are skipped.
+
+    Returns:
+        How many rows were queued
+    """
+    if not sync_enabled():
+        return 0
+    rows = [
+        SupabaseOutbox(
+            table=settings.SUPABASE_TABLE,
+            dedupe_key=f"short:{output.id}",
+            payload_json=json.dumps({
+                'username': video_processing.username,
+                'youtube_url': video_processing.youtube_url,
+                'short_url': output.url,
+                'created_at': output.created_at.isoformat(),
+            }),
+        )
+        for output in video_processing.outputs.all()
+    ]
+    SupabaseOutbox.objects.bulk_create(rows, ignore_conflicts=True)
+    transaction.on_commit(wake_sync_worker)
+    return len(rows)
+
+def _backoff(attempts):
+    delay = min(settings.SUPABASE_SYNC_BACKOFF * 2 ** (attempts - 1), settings.SUPABASE_SYNC_MAX_BACKOFF)
+    # Jitter, so batches that failed together don't all retry together
+    return delay * random.uniform(1.0, 1.25)
+
+def _due(now):
+    # PENDING rows whose retry is due, and SENDING rows whose worker's lease ran out
+    return Q(status__in=('PENDING', 'SENDING'), next_attempt_at__lte=now)
+
+def _rejected_rows(error):
+    """
+    Whether Supabase refused the rows themselves (a data, constraint or
+    column error), rather than being unreachable or unavailable
+    """
+    code = str(getattr(error, 'code', None) or '')
+    return code[:2] in ('22', '23', '42') or code.startswith(('PGRST1', 'PGRST2'))
+
+class SupabaseSyncWorker:
+    """
+    Sends due outbox rows to Supabase on a background thread. wake() makes
+    it look for rows right away; otherwise it sleeps until the next retry
+    is due, or settings.SUPABASE_SYNC_POLL seconds.
+    """
+
+    def __init__(self, client=None):
+        self._client = client
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def client(self):
+        # One client, and its HTTP connections, for the life of the worker
+        if self._client is None:
+            from supabase import create_client
+            self._client = create_client(settings.SUPABASE_URL, settings.SUPABASE_KEY)
+        return self._client
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='supabase-sync', daemon=True)
+        self._thread.start()
+
+    def wake(self):
+        self._wake.set()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def join(self, timeout=None):
+        self._thread.join(timeout)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def flush(self):
+        """
+        Claim one batch of due rows and send them, one bulk insert per table.
+
+        Returns:
+            How many rows were claimed (sent or rescheduled)
+        """
+        claimed = self._claim()
+        by_table = {}
+        for row in claimed:
+            by_table.setdefault(row.table, []).append(row)
+
+        for table, rows in by_table.items():
+            self._send(table, rows)
+        return len(claimed)
+
+    def _claim(self):
+        """
+        Take up to a batch of due rows: they are SENDING, and other workers
+        leave them alone, until settings.SUPABASE_SYNC_LEASE seconds from now
+        """
+        now = timezone.now()
+        ids = list(SupabaseOutbox.objects.filter(_due(now)).order_by('id')
+                   .values_list('id', flat=True)[:settings.SUPABASE_SYNC_BATCH_SIZE])
+        if not ids:
+            return []
+        token = uuid.uuid4().hex
+        # Rows another worker claimed since they were read no longer match
+        SupabaseOutbox.objects.filter(_due(now), id__in=ids).update(
+            status='SENDING', claim_token=token,
+            next_attempt_at=now + timedelta(seconds=settings.SUPABASE_SYNC_LEASE))
+        return list(SupabaseOutbox.objects.filter(claim_token=token).order_by('id'))
+
+    def _send(self, table, rows):
+        from postgrest import ReturnMethod
+
+        try:
+            self.client.table(table).insert([row.payload for row in rows],
+                                            returning=ReturnMethod.minimal).execute()
+        except Exception as e:
+            if len(rows) > 1 and _rejected_rows(e):
+                # Find the rows Supabase refuses, so the rest still go out
+                middle = len(rows) // 2
+                self._send(table, rows[:middle])
+                self._send(table, rows[middle:])
+                return
+            logger.warning(f"Supabase insert of {len(rows)} rows into {table} failed: {e}")
+            self._retry_later(rows, e)
+        else:
+            # Only while the claim is still ours; a worker that outlived its lease changes nothing
+            SupabaseOutbox.objects.filter(id__in=[row.id for row in rows], claim_token=rows[0].claim_token).update(
+                status='SENT', sent_at=timezone.now(), last_error=None)
+
+    def _retry_later(self, rows, error):
+        now = timezone.now()
+        with transaction.atomic():
+            for row in rows:
+                attempts = row.attempts + 1
+                changes = {'attempts': attempts, 'last_error': str(error), 'status': 'PENDING'}
+                if attempts >= settings.SUPABASE_SYNC_MAX_ATTEMPTS:
+                    logger.error(f"Giving up on {row} after {attempts} attempts")
+                    changes['status'] = 'FAILED'
+                else:
+                    changes['next_attempt_at'] = now + timedelta(seconds=_backoff(attempts))
+                SupabaseOutbox.objects.filter(id=row.id, claim_token=row.claim_token).update(**changes)
+
+    def _seconds_until_due(self):
+        next_due = SupabaseOutbox.objects.filter(status__in=('PENDING', 'SENDING')).aggregate(
+            at=Min('next_attempt_at'))['at']
+        if next_due is None:
+            return settings.SUPABASE_SYNC_POLL
+        return min(max((next_due - timezone.now()).total_seconds(), 0), settings.SUPABASE_SYNC_POLL)
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                # Cleared first, so a wake() during the flush is not lost
+                self._wake.clear()
+                try:
+                    if self.flush():
+                        continue
+                    timeout = self._seconds_until_due()
+                except Exception:
+                    logger.exception("Supabase sync failed")
+                    timeout = settings.SUPABASE_SYNC_POLL
+                self._wake.wait(timeout)
+        finally:
+            close_old_connections()
+
+_worker = None
+_worker_lock = threading.Lock()
+
+def get_sync_worker():
+    """The process's sync worker, started on first use"""
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = SupabaseSyncWorker()
+            _worker.start()
+        return _worker
+
+def wake_sync_worker():
+    get_sync_worker().wake()
+
+def start_sync_worker():
+    """
+    Start the sync worker if Supabase is configured. Server entry points
+    call this on startup, so rows left queued by a crash or restart go out
+    without waiting for the next job to complete.
+    """
+    if sync_enabled():
+        get_sync_worker()
+
+def shutdown_sync_worker(timeout=None):
+    global _worker
+    with _worker_lock:
+        worker, _worker = _worker, None
+    if worker is not None:
+        worker.stop(timeout)
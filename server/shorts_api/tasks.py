@@ -1,18 +1,27 @@
 import os
+import shutil
 import threading
 import re
-import requests
-from urllib.parse import urlparse
+from functools import partial
+from django.conf import settings
+from django.db import DatabaseError, transaction
 from .models import VideoProcessing, LanguageDubbing
-from .utils import upload_to_cloudinary, update_supabase
-from Components.YoutubeDownloader import download_youtube_video
-from Components.Edit import extractAudio, crop_video, extractAudioDubbed
-from Components.Transcription import transcribeAudio
-from Components.LanguageTasks import GetHighlight
-from Components.FaceCrop import crop_to_vertical, combine_videos
+from .utils import upload_to_cloudinary
+from .ingest import attach_ingest, detach_ingest, IngestError
+from .checkpoints import completed_artifact, complete_stage, fail_stage, file_exists
+from .pipeline import Stage, Pipeline, prune, stage_key, CPU, IO, API
+from .render import render_in_pool
+from .transcripts import transcript_rows
+from .uploads import upload_short
+from .source_cache import reset_source_refs
+from .workspace import JobWorkspace, sweep_workspaces
+from .metrics import measure, record_stage_metric
+from .progress import ProgressReporter
+from .jobstate import update_job
+from .supabase_sync import enqueue_shorts
 from Components.GenerateCaptions import add_captions
 from Components.Translation import translate_transcript_with_timestamps
-from Components.TextToSpeech import transcript_to_speech, merge_audio_with_video
+from Components.TextToSpeech import synthesize_segments, mix_segments, merge_audio_with_video
 
 def ensure_directories():
     """Ensure all necessary directories exist"""
@@ -21,15 +30,98 @@ def ensure_directories():
         if not os.path.exists(directory):
             os.makedirs(directory)
 
+def _pick_highlight(i, ingest):
+    # Shared with other jobs for this source
+    start, stop = ingest.highlight(i)
+    if start == 0 or stop == 0:
+        raise ValueError(f"No highlight found for short {i+1}")
+    return {'start': start, 'stop': stop}
+
+def _render_highlight(workspace, job_id, add_captions_enabled, i, ingest, highlight):
+    start, stop = highlight['start'], highlight['stop']
+    final_path = render_in_pool({
+        'job_id': job_id,
+        'index': i,
+        'vid': ingest.vid,
+        'start': start,
+        'stop': stop,
+        # Audio of just this highlight, shared by speaker detection and captions
+        'audio': ingest.audio.window(start, stop),
+        'add_captions_enabled': add_captions_enabled,
+        # Each short gets its own directory, so a retry starts clean
+        'workdir': workspace.dir(f"short_{i}"),
+        'source': ingest.source,
+    })
+    if not final_path:
+        raise RuntimeError(f"Failed to render short {i+1}")
+    # Kept for upload and for resuming after a failed upload
+    return workspace.promote(final_path, os.path.join('media', os.path.basename(final_path)))
+
+def _upload_short(username, i, path):
+    size = os.path.getsize(path)
+    upload_result = upload_short(path, f"user_{username}_{i}")
+    if not upload_result:
+        raise RuntimeError(f"Failed to upload short {i+1} to Cloudinary")
+    return {**upload_result, 'bytes': size}
+
+def build_shorts_pipeline(video_processing, workspace):
+    """
+    The shorts pipeline as a stage graph:
+
+        ingest -> highlight_i -> render_i -> upload_i    (for every short i)
+
+    so highlights are picked while earlier shorts render and upload.
+    Stages an earlier attempt completed are left out and their results
+    passed in as initial values instead.
+
+    Args:
+        video_processing: The VideoProcessing job
+        workspace: The run's JobWorkspace for intermediate files
+
+    Returns:
+        (Pipeline, initial values)
+    """
+    stages, initial = [], {}
+    for i in range(video_processing.num_shorts):
+        # Shorts finished by an earlier attempt are kept; only the rest run again
+        if completed_artifact(video_processing, 'upload', i) is not None:
+            continue
+        rendered = completed_artifact(video_processing, 'render', i, valid=file_exists('path'))
+        if rendered:
+            initial[f'render_{i}'] = rendered['path']
+        else:
+            highlight = completed_artifact(video_processing, 'highlight', i)
+            if highlight:
+                initial[f'highlight_{i}'] = highlight
+            else:
+                stages.append(Stage(f'highlight_{i}', partial(_pick_highlight, i),
+                                    inputs=['ingest'], outputs=[f'highlight_{i}'], resource=API))
+            stages.append(Stage(f'render_{i}',
+                                partial(_render_highlight, workspace, video_processing.id,
+                                        video_processing.add_captions, i),
+                                inputs=['ingest', f'highlight_{i}'], outputs=[f'render_{i}'], resource=CPU))
+        stages.append(Stage(f'upload_{i}', partial(_upload_short, video_processing.username, i),
+                            inputs=[f'render_{i}'], outputs=[f'upload_{i}'], resource=API))
+
+    if any('ingest' in stage.inputs for stage in stages):
+        # Download, extract audio and transcribe - or join another job
+        # that is already doing so for the same source
+        url, mode = video_processing.youtube_url, settings.SHORTS_INGEST_MODE
+        stages.insert(0, Stage('ingest', lambda: attach_ingest(url, mode), outputs=['ingest'], resource=API))
+    return Pipeline(stages), initial
+
 def process_video_task(video_processing_id):
     """
     Process a video in a background thread
     """
     video_processing = VideoProcessing.objects.get(id=video_processing_id)
+    ingest = None
+    workspace = None
+    # Also writes the final status, error and progress in one go at the end
+    progress = ProgressReporter(video_processing)
     
     try:
-        video_processing.status = 'PROCESSING'
-        video_processing.save()
+        update_job(video_processing, status='PROCESSING')
         
         # Ensure directories exist
         ensure_directories()
@@ -52,30 +144,27 @@ def process_video_task(video_processing_id):
                     
                     # If any videos exist, copy the first one
                     if existing_videos:
-                        import shutil
                         shutil.copy(existing_videos[0], final_path)
                         print(f"Copied {existing_videos[0]} to {final_path} for testing")
                     else:
                         video_processing.error_message = f"Test file not found and no existing videos to copy."
                         video_processing.status = 'FAILED'
-                        video_processing.save()
                         return
                 
                 # Upload to Cloudinary
                 upload_result = upload_to_cloudinary(final_path, f"user_{video_processing.username}_{i}")
                 if upload_result:
                     # Add this URL to the list
-                    video_processing.add_cloudinary_url(upload_result['url'], upload_result['public_id'])
+                    video_processing.add_output(i, upload_result['url'], upload_result['public_id'],
+                                                size_bytes=os.path.getsize(final_path))
                     print(f"Uploaded short {i+1}/{video_processing.num_shorts} to Cloudinary: {upload_result['url']}")
                 else:
                     video_processing.error_message = f"Failed to upload short {i+1} to Cloudinary"
                     video_processing.status = 'FAILED'
-                    video_processing.save()
             
             # If we get here, all uploads were successful
             video_processing.status = 'COMPLETED'
-            video_processing.add_captions = "True"
-            video_processing.save()
+            update_job(video_processing, add_captions=True)
              # Add captions to the video if enabled
             if video_processing.add_captions:
                 try:
@@ -110,174 +199,285 @@ def process_video_task(video_processing_id):
                     print(f"Error adding captions to short {i+1}: {str(e)}, using original video")
             else:
                 print(f"Captions disabled for this processing task, skipping caption generation")
-            
-            # Update Supabase with all URLs
-            if video_processing.cloudinary_urls:
-                urls = [item['url'] for item in video_processing.cloudinary_urls]
-                update_supabase(
-                    video_processing.username,
-                    video_processing.youtube_url,
-                    urls
-                )
             return
         
         else:
-            # Download the video
-            vid = download_youtube_video(video_processing.youtube_url)
-            if not vid:
-                video_processing.error_message = "Unable to download the video"
-                video_processing.status = 'FAILED'
-                video_processing.save()
-                return
-                
-            vid = vid.replace(".webm", ".mp4")
-            video_processing.original_video_path = vid
-            video_processing.save()
+            def on_complete(stage, outputs, error):
+                # Runs on this thread, so only this thread writes the job's rows
+                nonlocal ingest
+                workspace.check_quota()
+                name, i = stage_key(stage.name)
+                record_stage_metric(video_processing, name, i, 'FAILED' if error else 'COMPLETED', stage.usage)
+                if error:
+                    print(f"Stage {stage.name} failed: {error}, continuing with others")
+                    if isinstance(error, IngestError):
+                        name = error.stage or 'download'
+                        if error.ingest:
+                            error.ingest.record_metrics(video_processing)
+                    fail_stage(video_processing, name, error, i)
+                elif name == 'ingest':
+                    ingest = outputs['ingest']
+                    ingest.checkpoint(video_processing)
+                    ingest.record_metrics(video_processing)
+                    update_job(video_processing, original_video_path=ingest.vid, transcript=ingest.transcript)
+                elif name == 'highlight':
+                    complete_stage(video_processing, 'highlight', outputs[stage.name], i)
+                elif name == 'render':
+                    complete_stage(video_processing, 'render', {'path': outputs[stage.name]}, i)
+                elif name == 'upload':
+                    upload_result = outputs[stage.name]
+                    # The window is checkpointed even when this run did not pick it
+                    highlight = completed_artifact(video_processing, 'highlight', i) or {}
+                    duration = highlight['stop'] - highlight['start'] if highlight else None
+                    # A crash in between would have the upload run again
+                    with transaction.atomic():
+                        video_processing.add_output(i, upload_result['url'], upload_result['public_id'],
+                                                    duration=duration, size_bytes=upload_result['bytes'],
+                                                    highlight=highlight)
+                        complete_stage(video_processing, 'upload', upload_result, i)
+                    print(f"Uploaded short {i+1}/{video_processing.num_shorts} to Cloudinary: {upload_result['url']}")
+                progress.stage_finished(stage)
             
-            # Extract audio
-            audio = extractAudio(vid)
-            if not audio:
-                video_processing.error_message = "No audio file found"
-                video_processing.status = 'FAILED'
-                video_processing.save()
-                return
-                
-            # Transcribe audio
-            transcriptions = transcribeAudio(audio)
-            if len(transcriptions) == 0:
-                video_processing.error_message = "No transcriptions found"
+            # Intermediates of this run never touch another job's files
+            workspace = JobWorkspace('shorts', video_processing_id)
+            
+            # Highlights, renders and uploads of different shorts overlap
+            pipeline, initial = build_shorts_pipeline(video_processing, workspace)
+            progress.expect(pipeline.stages)
+            result = pipeline.run(initial, on_complete, on_start=progress.stage_started)
+            
+            if 'ingest' in result.failed:
+                video_processing.error_message = str(result.failed['ingest'])
                 video_processing.status = 'FAILED'
-                video_processing.save()
                 return
-                
-            trans_text = ""
-            for text, start, end in transcriptions:
-                trans_text += (f"{start} - {end}: {text}")
-            
-            # Generate multiple highlights
-            for i in range(video_processing.num_shorts):
-                print(f"Generating short {i+1}/{video_processing.num_shorts}")
-                
-                # Get highlight timestamps - we add a different prompt for each short to get variety
-                start, stop = GetHighlight(trans_text + f" (Generate highlight {i+1}, different from previous ones)")
-                if start == 0 or stop == 0:
-                    # Skip this highlight but continue with others
-                    print(f"Error in getting highlight {i+1}, skipping")
-                    continue
-                    
-                # Create output paths
-                output = f"media/Out_{i}.mp4"
-                
-                # Crop video to highlight section
-                crop_video(vid, output, start, stop)
-                
-                # Crop to vertical
-                cropped = f"media/cropped_{i}.mp4"
-                crop_to_vertical(output, cropped)
-                
-                # Combine videos
-                final_path = f"media/final_{video_processing_id}_{i}.mp4"
-                combine_videos(output, cropped, final_path)
-                
-                # Add captions to the video if enabled
-                if video_processing.add_captions:
-                    try:
-                        captioned_path = f"media/captioned/final_{video_processing_id}_{i}_captioned.mp4"
-                        
-                        # Generate captions using the local Whisper model for better accuracy
-                        add_captions(
-                            final_path,
-                            captioned_path,
-                            font="PoetsenOne-Regular.ttf",
-                            font_size=100,
-                            font_color="white",
-                            stroke_width=2,
-                            stroke_color="black",
-                            highlight_current_word=True,
-                            word_highlight_color="#29BFFF",
-                            line_count=2,
-                            padding=40,
-                            shadow_strength=1.0,
-                            shadow_blur=0.1,
-                            use_local_whisper=True,
-                            print_info=True
-                        )
-                        
-                        # Use the captioned video if it was created successfully
-                        if os.path.exists(captioned_path):
-                            final_path = captioned_path
-                            print(f"Successfully added captions to short {i+1}")
-                        else:
-                            print(f"Failed to add captions to short {i+1}, using original video")
-                    except Exception as e:
-                        print(f"Error adding captions to short {i+1}: {str(e)}, using original video")
-                else:
-                    print(f"Captions disabled for this processing task, skipping caption generation")
-                
-                # Upload to Cloudinary
-                upload_result = upload_to_cloudinary(final_path, f"user_{video_processing.username}_{i}")
-                if upload_result:
-                    # Add this URL to the list
-                    video_processing.add_cloudinary_url(upload_result['url'], upload_result['public_id'])
-                    print(f"Uploaded short {i+1}/{video_processing.num_shorts} to Cloudinary: {upload_result['url']}")
-                else:
-                    print(f"Failed to upload short {i+1} to Cloudinary, continuing with others")
             
             # If we have at least one successful upload, mark as completed
-            if video_processing.cloudinary_urls:
+            if video_processing.shorts_completed:
                 video_processing.status = 'COMPLETED'
-                video_processing.save()
-                
-                # # Update Supabase with all URLs
-                # urls = [item['url'] for item in video_processing.cloudinary_urls]
-                # update_supabase(
-                #     video_processing.username,
-                #     video_processing.youtube_url,
-                #     urls
-                # )
+                video_processing.error_message = None
                 return
             else:
                 video_processing.error_message = "Failed to create any shorts"
                 video_processing.status = 'FAILED'
-                video_processing.save()
     
     except Exception as e:
         video_processing.status = 'FAILED'
         video_processing.error_message = str(e)
-        video_processing.save()
+    finally:
+        # Free the shared audio and source once no attached job needs them
+        detach_ingest(ingest)
+        if workspace:
+            workspace.cleanup()
+        with transaction.atomic():
+            # Saves the status set above, and queues the shorts for Supabase with it
+            progress.finish()
+            if video_processing.status == 'COMPLETED':
+                enqueue_shorts(video_processing)
 
-def start_processing_video(video_processing_id):
-    """
-    Start a background thread to process the video
-    """
-    thread = threading.Thread(target=process_video_task, args=(video_processing_id,))
+# Jobs with a live thread in this process, as (kind, id)
+_running_jobs = set()
+_running_jobs_lock = threading.Lock()
+
+def is_job_running(kind, job_id):
+    """Whether a 'shorts' or 'dubbing' job is being processed right now"""
+    with _running_jobs_lock:
+        return (kind, job_id) in _running_jobs
+
+def _start_job(kind, job_id, target):
+    """Run target(job_id) on a background thread, unless that job is already running"""
+    with _running_jobs_lock:
+        if (kind, job_id) in _running_jobs:
+            return None
+        _running_jobs.add((kind, job_id))
+
+    def run():
+        try:
+            target(job_id)
+        finally:
+            with _running_jobs_lock:
+                _running_jobs.discard((kind, job_id))
+
+    thread = threading.Thread(target=run)
     thread.daemon = True
     thread.start()
-    return thread 
+    return thread
 
-def is_cloudinary_url(url):
+def recover_after_restart():
     """
-    Check if a URL is a Cloudinary URL
+    Release what jobs of an earlier server process still held. Jobs run on
+    this process's threads, so none of them outlived that process; call
+    once at startup, before any job starts.
     """
-    parsed_url = urlparse(url)
-    return 'cloudinary.com' in parsed_url.netloc or 'res.cloudinary.com' in parsed_url.netloc
+    sweep_workspaces(is_job_running)
+    try:
+        reset_source_refs()
+    except DatabaseError as e:
+        # E.g. migrations that have not run yet; the server can still start
+        print(f"Could not release cached sources: {e}")
 
-def download_from_cloudinary(url, output_path):
+def start_processing_video(video_processing_id):
     """
-    Download a video file from Cloudinary
+    Start a background thread to process the video
     """
+    return _start_job('shorts', video_processing_id, process_video_task)
+
+def _translate_chunk(dubbing, rows):
+    translated = translate_transcript_with_timestamps(
+        rows,
+        source_language=dubbing.source_language,
+        target_language=dubbing.target_language
+    )
+    if not translated:
+        raise RuntimeError("Failed to translate transcript")
+    return translated
+
+def dubbing_parts_dir(dubbing_id):
+    """
+    Where a dubbing job keeps its speech segments and speech track until it
+    completes, so a retry reuses them after the run's workspace is gone
+    """
+    return os.path.join('media', 'dubbed', f"parts_{dubbing_id}")
+
+def _synthesize_chunk(dubbing, workspace, k, translated):
+    output_dir = workspace.dir('segments', f"chunk_{k}")
+    segment_files = synthesize_segments(translated, output_dir, voice=dubbing.voice)
+    if translated and not segment_files:
+        raise RuntimeError("Failed to generate speech from translated transcript")
+    destination = os.path.join(dubbing_parts_dir(dubbing.id), f"chunk_{k}")
+    # Whatever an earlier attempt left of this chunk is replaced
+    shutil.rmtree(destination, ignore_errors=True)
+    workspace.promote(output_dir, destination)
+    return [(os.path.join(destination, os.path.relpath(path, output_dir)), start, end)
+            for path, start, end in segment_files]
+
+def _mix_speech(workspace, destination, *chunks):
+    # Chunks arrive in transcript order, whatever order they finished in
+    segment_files = [tuple(segment) for chunk in chunks for segment in chunk]
     try:
-        response = requests.get(url, stream=True)
-        response.raise_for_status()
-        
-        with open(output_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                f.write(chunk)
-        
-        return output_path
+        speech = mix_segments(segment_files, workspace.file('speech.wav'))
+    except Exception as e:
+        raise RuntimeError("Failed to generate speech from translated transcript") from e
+    return workspace.promote(speech, destination)
+
+def _merge_speech(workspace, vid, destination, speech):
+    print("Merging translated audio with original video")
+    output_path = workspace.file('dubbed.mp4')
+    if not merge_audio_with_video(vid, speech, output_path):
+        raise RuntimeError("Failed to merge audio with video")
+    # Kept for captioning and upload, including on retry
+    return workspace.promote(output_path, destination)
+
+def _caption_dubbed(workspace, destination, merge, *translated):
+    output_path = workspace.file('dubbed_captioned.mp4')
+    # Extract text from translated transcript for captions
+    translated_text = []
+    for chunk in translated:
+        for text, start, end in chunk:
+            translated_text.append({
+                "start": start,
+                "end": end,
+                "text": text
+            })
+    try:
+        # Generate captions
+        add_captions(
+            merge,
+            output_path,
+            font="PoetsenOne-Regular.ttf",
+            font_size=100,
+            font_color="white",
+            stroke_width=2,
+            stroke_color="black",
+            highlight_current_word=True,
+            word_highlight_color="#29BFFF",
+            line_count=2,
+            padding=40,
+            shadow_strength=1.0,
+            shadow_blur=0.1,
+            use_local_whisper=False,  # Use provided segments instead
+            segments=translated_text,
+            print_info=True
+        )
     except Exception as e:
-        print(f"Error downloading from Cloudinary: {e}")
-        return None
+        print(f"Error adding captions to dubbed video: {str(e)}, using non-captioned version")
+        return merge
+    
+    # Use the captioned video if it was created successfully
+    if os.path.exists(output_path):
+        print("Successfully added captions to dubbed video")
+        return workspace.promote(output_path, destination)
+    print("Failed to add captions to dubbed video, using non-captioned version")
+    return merge
+
+def _upload_dubbed(dubbing, final):
+    upload_result = upload_to_cloudinary(final, f"dubbed_{dubbing.username}_{dubbing.target_language}")
+    if not upload_result:
+        raise RuntimeError("Failed to upload dubbed video to Cloudinary")
+    return upload_result
+
+def build_dubbing_pipeline(dubbing, transcriptions, vid, workspace):
+    """
+    The dubbing pipeline as a stage graph:
+
+        translate_k -> tts_k ─┐
+        ...                   ├─> speech -> merge -> captions -> upload
+        translate_n -> tts_n ─┘
+
+    The transcript is translated in chunks of settings.DUBBING_TRANSLATE_CHUNK
+    segments, so speech for early chunks is generated while later ones are
+    still being translated. Stages an earlier attempt completed are left out.
+
+    Args:
+        dubbing: The LanguageDubbing job
+        transcriptions: The transcript as [text, start, end] rows
+        vid: Path of the source video, or None if the merge is checkpointed
+        workspace: The run's JobWorkspace; segments and the speech track are
+            promoted to dubbing_parts_dir when done
+
+    Returns:
+        (Pipeline, initial values)
+    """
+    size = max(1, settings.DUBBING_TRANSLATE_CHUNK)
+    chunks = [transcriptions[k:k + size] for k in range(0, len(transcriptions), size)]
+    stages, initial = [], {}
+
+    for k, rows in enumerate(chunks):
+        stages.append(Stage(f'translate_{k}', partial(_translate_chunk, dubbing, rows),
+                            outputs=[f'translate_{k}'], resource=API))
+        stages.append(Stage(f'tts_{k}', partial(_synthesize_chunk, dubbing, workspace, k),
+                            inputs=[f'translate_{k}'], outputs=[f'tts_{k}'], resource=API))
+        translated = completed_artifact(dubbing, 'translate', k)
+        if translated:
+            initial[f'translate_{k}'] = translated['segments']
+        segments = completed_artifact(
+            dubbing, 'tts', k,
+            valid=lambda artifact: all(os.path.exists(path) for path, _, _ in artifact.get('segments', []))
+        )
+        if segments:
+            initial[f'tts_{k}'] = segments['segments']
+
+    tts = [f'tts_{k}' for k in range(len(chunks))]
+    translate = [f'translate_{k}' for k in range(len(chunks))]
+    speech = os.path.join(dubbing_parts_dir(dubbing.id), 'speech.wav')
+    stages.append(Stage('speech', partial(_mix_speech, workspace, speech),
+                        inputs=tts, outputs=['speech'], resource=CPU))
+    stages.append(Stage('merge', partial(_merge_speech, workspace, vid, f"media/dubbed/video_{dubbing.id}.mp4"),
+                        inputs=['speech'], outputs=['merge'], resource=IO))
+    if dubbing.add_captions:
+        stages.append(Stage('captions',
+                            partial(_caption_dubbed, workspace, f"media/captioned/dubbed_{dubbing.id}_captioned.mp4"),
+                            inputs=['merge'] + translate, outputs=['captions'], resource=CPU))
+    else:
+        print("Captions disabled for this dubbing task, skipping caption generation")
+        stages.append(Stage('captions', lambda merge: merge, inputs=['merge'], outputs=['captions'], resource=IO))
+    stages.append(Stage('upload', partial(_upload_dubbed, dubbing),
+                        inputs=['captions'], outputs=['upload'], resource=API))
+
+    for name in ('speech', 'merge', 'captions'):
+        done = completed_artifact(dubbing, name, valid=file_exists('path'))
+        if done:
+            initial[name] = done['path']
+    return Pipeline(prune(stages, initial, ['upload'])), initial
 
 def process_dubbing_task(dubbing_id):
     """
@@ -287,17 +487,22 @@ def process_dubbing_task(dubbing_id):
     1. Download the video (from YouTube or Cloudinary)
     2. Extract audio
     3. Transcribe audio
-    4. Translate transcript
-    5. Generate speech from translated transcript
-    6. Merge speech with original video
+    4. Translate transcript, in chunks
+    5. Generate speech for each translated chunk
+    6. Mix the speech into one track and merge it with the original video
     7. Add captions (optional)
     8. Upload to Cloudinary
+    
+    Steps 4 and 5 overlap across chunks; see build_dubbing_pipeline.
     """
     dubbing = LanguageDubbing.objects.get(id=dubbing_id)
+    ingest = None
+    workspace = None
+    # Also writes the final status, error and progress in one go at the end
+    progress = ProgressReporter(dubbing)
     
     try:
-        dubbing.status = 'PROCESSING'
-        dubbing.save()
+        update_job(dubbing, status='PROCESSING')
         
         # Ensure directories exist
         ensure_directories()
@@ -306,166 +511,101 @@ def process_dubbing_task(dubbing_id):
         if not os.path.exists('media/dubbed'):
             os.makedirs('media/dubbed')
         
-        # Check if the URL is from Cloudinary or YouTube
-        if is_cloudinary_url(dubbing.video_url):
-            print(f"Detected Cloudinary URL: {dubbing.video_url}")
-            vid_output_path = f"videos/cloudinary_video_{dubbing_id}.mp4"
-            vid = download_from_cloudinary(dubbing.video_url, vid_output_path)
-            if not vid:
-                dubbing.error_message = "Unable to download the video from Cloudinary"
-                dubbing.status = 'FAILED'
-                dubbing.save()
-                return
-        else:
-            print(f"Detected YouTube or other URL: {dubbing.video_url}")
-            # Download the video from YouTube
-            vid = download_youtube_video(dubbing.video_url)
-            if not vid:
-                dubbing.error_message = "Unable to download the video"
-                dubbing.status = 'FAILED'
-                dubbing.save()
-                return
-            
-            vid = vid.replace(".webm", ".mp4")
-        
-        dubbing.original_video_path = vid
-        dubbing.save()
-        
-        # Extract audio
-        audio = extractAudioDubbed(vid, dubbing_id)
-        if not audio:
-            dubbing.error_message = "No audio file found"
-            dubbing.status = 'FAILED'
-            dubbing.save()
-            return
-            
-        # Transcribe audio
-        transcriptions = transcribeAudio(audio)
-        if len(transcriptions) == 0:
-            dubbing.error_message = "No transcriptions found"
-            dubbing.status = 'FAILED'
-            dubbing.save()
+        # A retried job that already uploaded its video has nothing left to do
+        if completed_artifact(dubbing, 'upload'):
+            dubbing.status = 'COMPLETED'
+            dubbing.error_message = None
             return
         
-        # Translate transcript to target language
-        print(f"Translating transcript from {dubbing.source_language} to {dubbing.target_language}")
-        translated_transcript = translate_transcript_with_timestamps(
-            transcriptions, 
-            source_language=dubbing.source_language,
-            target_language=dubbing.target_language
-        )
-        
-        if not translated_transcript:
-            dubbing.error_message = "Failed to translate transcript"
-            dubbing.status = 'FAILED'
-            dubbing.save()
-            return
+        # Stages an earlier attempt finished are reused as long as their files remain
+        merged = completed_artifact(dubbing, 'merge', valid=file_exists('path'))
+        vid = None
+        ingested = False
         
-        # Generate speech from translated transcript
-        dubbed_audio_path = f"media/dubbed/audio_{dubbing_id}.wav"
-        print(f"Generating speech from translated transcript using voice: {dubbing.voice}")
-        audio_result = transcript_to_speech(
-            translated_transcript,
-            dubbed_audio_path,
-            voice=dubbing.voice
-        )
+        if not merged or dubbing.transcript is None:
+            # Download (from YouTube or Cloudinary), extract audio and transcribe,
+            # or join another job that is already doing so for the same source
+            progress.stage_started('ingest')
+            try:
+                with measure() as usage:
+                    ingest = attach_ingest(dubbing.video_url)
+            except IngestError as e:
+                record_stage_metric(dubbing, 'ingest', 0, 'FAILED', usage)
+                if e.ingest:
+                    e.ingest.record_metrics(dubbing)
+                fail_stage(dubbing, e.stage or 'download', e)
+                dubbing.error_message = str(e)
+                dubbing.status = 'FAILED'
+                return
+            record_stage_metric(dubbing, 'ingest', 0, 'COMPLETED', usage)
+            ingest.checkpoint(dubbing)
+            ingest.record_metrics(dubbing)
+            vid = ingest.vid
+            
+            update_job(dubbing, original_video_path=vid, transcript=ingest.transcript)
+            ingested = True
         
-        if not audio_result:
-            dubbing.error_message = "Failed to generate speech from translated transcript"
-            dubbing.status = 'FAILED'
-            dubbing.save()
-            return
+        def on_complete(stage, outputs, error):
+            # Runs on this thread, so only this thread writes the job's rows
+            workspace.check_quota()
+            name, k = stage_key(stage.name)
+            record_stage_metric(dubbing, name, k, 'FAILED' if error else 'COMPLETED', stage.usage)
+            if error:
+                fail_stage(dubbing, name, error, k)
+            elif name in ('translate', 'tts'):
+                complete_stage(dubbing, name, {'segments': outputs[stage.name]}, k)
+            elif name == 'merge':
+                update_job(dubbing, dubbed_video_path=outputs['merge'])
+                complete_stage(dubbing, 'merge', {'path': outputs['merge']})
+            elif name == 'speech':
+                complete_stage(dubbing, 'speech', {'path': outputs['speech']})
+            elif name == 'captions' and outputs['captions'] != dubbing.dubbed_video_path:
+                # Only a captioned file is worth keeping; a fallback to the
+                # merged video gets another captioning attempt on retry
+                complete_stage(dubbing, 'captions', {'path': outputs['captions']})
+            elif name == 'upload':
+                upload_result = outputs['upload']
+                # Add this URL
+                dubbing.add_cloudinary_url(upload_result['url'], upload_result['public_id'])
+                complete_stage(dubbing, 'upload', upload_result)
+                print(f"Uploaded dubbed video to Cloudinary: {upload_result['url']}")
+            progress.stage_finished(stage)
         
-        # Merge speech with original video
-        dubbed_video_path = f"media/dubbed/video_{dubbing_id}.mp4"
-        print("Merging translated audio with original video")
-        merge_success = merge_audio_with_video(
-            vid,
-            dubbed_audio_path,
-            dubbed_video_path
-        )
+        print(f"Dubbing from {dubbing.source_language} to {dubbing.target_language} using voice: {dubbing.voice}")
+        # Scratch files only live as long as this run
+        workspace = JobWorkspace('dubbing', dubbing_id)
+        pipeline, initial = build_dubbing_pipeline(dubbing, transcript_rows(dubbing.transcript), vid, workspace)
+        progress.expect(pipeline.stages + (['ingest'] if ingested else []))
+        if ingested:
+            progress.stage_finished('ingest')
+        result = pipeline.run(initial, on_complete, on_start=progress.stage_started)
         
-        if not merge_success:
-            dubbing.error_message = "Failed to merge audio with video"
+        if result.failed:
+            # Report the stage that broke the chain
+            dubbing.error_message = str(next(iter(result.failed.values())))
             dubbing.status = 'FAILED'
-            dubbing.save()
             return
         
-        dubbing.dubbed_video_path = dubbed_video_path
-        dubbing.save()
-        
-        # Add captions to the video if enabled
-        final_path = dubbed_video_path
-        if dubbing.add_captions:
-            try:
-                captioned_path = f"media/captioned/dubbed_{dubbing_id}_captioned.mp4"
-                
-                # Extract text from translated transcript for captions
-                translated_text = []
-                for text, start, end in translated_transcript:
-                    translated_text.append({
-                        "start": start,
-                        "end": end,
-                        "text": text
-                    })
-                
-                # Generate captions
-                add_captions(
-                    dubbed_video_path,
-                    captioned_path,
-                    font="PoetsenOne-Regular.ttf",
-                    font_size=100,
-                    font_color="white",
-                    stroke_width=2,
-                    stroke_color="black",
-                    highlight_current_word=True,
-                    word_highlight_color="#29BFFF",
-                    line_count=2,
-                    padding=40,
-                    shadow_strength=1.0,
-                    shadow_blur=0.1,
-                    use_local_whisper=False,  # Use provided segments instead
-                    segments=translated_text,
-                    print_info=True
-                )
-                
-                # Use the captioned video if it was created successfully
-                if os.path.exists(captioned_path):
-                    final_path = captioned_path
-                    print("Successfully added captions to dubbed video")
-                else:
-                    print("Failed to add captions to dubbed video, using non-captioned version")
-            except Exception as e:
-                print(f"Error adding captions to dubbed video: {str(e)}, using non-captioned version")
-        else:
-            print("Captions disabled for this dubbing task, skipping caption generation")
-        
-        # Upload to Cloudinary
-        upload_result = upload_to_cloudinary(final_path, f"dubbed_{dubbing.username}_{dubbing.target_language}")
-        if upload_result:
-            # Add this URL
-            dubbing.add_cloudinary_url(upload_result['url'], upload_result['public_id'])
-            print(f"Uploaded dubbed video to Cloudinary: {upload_result['url']}")
-            
-            # Mark as completed
-            dubbing.status = 'COMPLETED'
-            dubbing.save()
-            return
-        else:
-            dubbing.error_message = "Failed to upload dubbed video to Cloudinary"
-            dubbing.status = 'FAILED'
-            dubbing.save()
+        # Mark as completed
+        dubbing.status = 'COMPLETED'
+        dubbing.error_message = None
     
     except Exception as e:
         dubbing.status = 'FAILED'
         dubbing.error_message = str(e)
-        dubbing.save()
+    finally:
+        # Free the shared audio and source once no attached job needs them
+        detach_ingest(ingest)
+        if workspace:
+            workspace.cleanup()
+        if dubbing.status == 'COMPLETED':
+            # Only a retry needs the speech; a completed job has none left
+            shutil.rmtree(dubbing_parts_dir(dubbing_id), ignore_errors=True)
+        # Saves the status set above
+        progress.finish()
 
 def start_dubbing_process(dubbing_id):
     """
     Start a background thread to process the language dubbing
     """
-    thread = threading.Thread(target=process_dubbing_task, args=(dubbing_id,))
-    thread.daemon = True
-    thread.start()
-    return thread 
\ No newline at end of file
+    return _start_job('dubbing', dubbing_id, process_dubbing_task) 
\ No newline at end of file
@@ -1,3 +1,2148 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+
+HAS_FFMPEG = shutil.which("ffmpeg") is not None
+
+
+class StubServer:
+    """
+    Run a BaseHTTPRequestHandler subclass on a free localhost port for the
+    duration of a test, so components can be exercised against real HTTP
+    """
+
+    def __init__(self, handler_class):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def make_video(path, seconds=2.0, size="320x180", audio=True, extra_args=()):
+    """Write a small test-pattern video, with a tone track unless audio is False"""
+    command = ["ffmpeg", "-y", "-f", "lavfi", "-i", f"testsrc=duration={seconds}:size={size}:rate=30"]
+    if audio:
+        command += ["-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}", "-ac", "2", "-ar", "44100"]
+    command += ["-pix_fmt", "yuv420p", *extra_args, "-shortest", path]
+    subprocess.run(command, capture_output=True, check=True)
+    return path
+
+
+def make_tone(path, seconds=0.2, extra_args=()):
+    """Write a short sine tone with ffmpeg"""
+    subprocess.run(
+        ["ffmpeg", "-y", "-f", "lavfi", "-i", f"sine=frequency=440:duration={seconds}",
+         *extra_args, path],
+        capture_output=True,
+        check=True,
+    )
+    return path
+
+
+class StubTTSHandler(BaseHTTPRequestHandler):
+    """
+    Minimal stand-in for POST /v1/audio/speech. The first request for every
+    distinct input is rejected with a 429 to exercise the retry path.
+    """
+
+    audio = b""
+    lock = threading.Lock()
+    seen = set()
+    requests = []
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.requests.append(body["input"])
+            first_attempt = body["input"] not in cls.seen
+            cls.seen.add(body["input"])
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            # Hold the request open briefly so overlapping requests are visible
+            time.sleep(0.05)
+            if first_attempt:
+                self.send_response(429)
+                self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                payload = json.dumps({"error": {"message": "rate limited"}}).encode()
+            else:
+                self.send_response(200)
+                self.send_header("Content-Type", "audio/mpeg")
+                payload = cls.audio or body["input"].encode()
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class RangeFileHandler(BaseHTTPRequestHandler):
+    """Serve files from `root` with HTTP Range support, recording each requested range"""
+
+    root = None
+    ranges = []
+
+    def do_GET(self):
+        path = os.path.join(self.root, os.path.basename(self.path))
+        if not os.path.exists(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        first, last = 0, size - 1
+        range_header = self.headers.get("Range")
+        if range_header:
+            first_text, _, last_text = range_header.split("=", 1)[1].partition("-")
+            first = int(first_text)
+            last = int(last_text) if last_text else last
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {first}-{last}/{size}")
+        else:
+            self.send_response(200)
+        type(self).ranges.append((first, last))
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Type", "video/mp4")
+        self.send_header("Content-Length", str(last - first + 1))
+        self.end_headers()
+        with open(path, "rb") as f:
+            f.seek(first)
+            remaining = last - first + 1
+            try:
+                while remaining > 0:
+                    chunk = f.read(min(64 * 1024, remaining))
+                    self.wfile.write(chunk)
+                    remaining -= len(chunk)
+            except (BrokenPipeError, ConnectionResetError):
+                # ffmpeg hangs up as soon as it has what it needs
+                pass
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeCloudinaryHandler(BaseHTTPRequestHandler):
+    """
+    Minimal Cloudinary upload API: records every chunk, fails the first
+    attempt at any Content-Range listed in `fail_ranges` and refuses (400)
+    every attempt at one listed in `reject_ranges`
+    """
+
+    requests = []
+    fail_ranges = set()
+    reject_ranges = set()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        content_range = self.headers.get("Content-Range")
+        cls = type(self)
+        cls.requests.append({
+            "path": self.path,
+            "range": content_range,
+            "upload_id": self.headers.get("X-Unique-Upload-Id"),
+            "body": body,
+        })
+        if content_range in cls.fail_ranges:
+            cls.fail_ranges.discard(content_range)
+            self.respond(500, {"error": {"message": "Temporary failure"}})
+            return
+        if content_range in cls.reject_ranges:
+            self.respond(400, {"error": {"message": "Invalid upload"}})
+            return
+
+        first_last, _, total = content_range.split(" ", 1)[1].partition("/")
+        last = int(first_last.split("-")[1])
+        payload = {"public_id": "shorts/user_1/final_1_0"}
+        if last + 1 == int(total):
+            payload["secure_url"] = "https://res.cloudinary.com/demo/video/upload/shorts/user_1/final_1_0.mp4"
+        self.respond(200, payload)
+
+    def respond(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakePostgRESTHandler(BaseHTTPRequestHandler):
+    """
+    Minimal PostgREST insert endpoint: records every bulk insert, answers
+    the next `failures` requests with 503, and refuses (400, like a bad
+    value would) any insert containing a row whose short_url is "bad"
+    """
+
+    inserts = []
+    failures = 0
+
+    def do_POST(self):
+        cls = type(self)
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if cls.failures:
+            cls.failures -= 1
+            data = json.dumps({"message": "Service unavailable", "code": "503"}).encode()
+            self.send_response(503)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if any(row.get("short_url") == "bad" for row in body):
+            data = json.dumps({"message": 'invalid input syntax for type uuid: "bad"', "code": "22P02",
+                               "hint": None, "details": None}).encode()
+            self.send_response(400)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        cls.inserts.append({"path": self.path.split("?")[0], "apikey": self.headers.get("apikey"), "rows": body})
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TextToSpeechTests(SimpleTestCase):
+    def setUp(self):
+        from Components import TextToSpeech
+
+        self.tts = TextToSpeech
+        StubTTSHandler.seen = set()
+        StubTTSHandler.requests = []
+        StubTTSHandler.max_in_flight = 0
+        self.server = StubServer(StubTTSHandler).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        env = mock.patch.dict(os.environ, {
+            "OPENAI_BASE_URL": f"{self.server.url}/v1",
+            "OPENAI_API_KEY": "test-key",
+        })
+        env.start()
+        self.addCleanup(env.stop)
+        # Force a fresh shared client pointed at the stub server
+        self.tts._client = None
+        self.addCleanup(setattr, self.tts, "_client", None)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        cache_dir = mock.patch.object(self.tts, "TTS_CACHE_DIR", os.path.join(self.temp_dir, "cache"))
+        cache_dir.start()
+        self.addCleanup(cache_dir.stop)
+
+    def test_segments_are_synthesised_concurrently_and_kept_in_order(self):
+        transcript = [(f"line {i}", float(i), i + 0.5) for i in range(8)]
+        transcript.insert(3, ("   ", 2.5, 2.6))
+
+        segment_files = self.tts.synthesize_segments(transcript, self.temp_dir, max_workers=4)
+
+        self.assertEqual(
+            [(start, end) for _, start, end in segment_files],
+            [(start, end) for text, start, end in transcript if text.strip()],
+        )
+        for (path, _, _), text in zip(segment_files, [t for t, _, _ in transcript if t.strip()]):
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), text.encode())
+        # Every segment was rate limited once and retried once
+        self.assertEqual(len(StubTTSHandler.requests), 16)
+        self.assertGreater(StubTTSHandler.max_in_flight, 1)
+        self.assertLessEqual(StubTTSHandler.max_in_flight, 4)
+
+    def test_gives_up_after_max_retries(self):
+        with mock.patch.object(self.tts, "TTS_MAX_RETRIES", 0):
+            self.assertFalse(
+                self.tts.text_to_speech("only once", os.path.join(self.temp_dir, "x.mp3"))
+            )
+        self.assertEqual(StubTTSHandler.requests, ["only once"])
+
+    def test_cached_segments_are_not_synthesised_again(self):
+        transcript = [("hello", 0.0, 0.5), ("again", 1.0, 1.5), ("hello", 2.0, 2.5)]
+        first_dir = os.path.join(self.temp_dir, "first")
+        second_dir = os.path.join(self.temp_dir, "second")
+        os.makedirs(first_dir)
+        os.makedirs(second_dir)
+
+        self.tts.synthesize_segments(transcript, first_dir)
+        # The repeated line is requested once (plus its rate-limited attempt)
+        self.assertEqual(sorted(StubTTSHandler.requests), ["again", "again", "hello", "hello"])
+
+        StubTTSHandler.requests = []
+        segment_files = self.tts.synthesize_segments(transcript, second_dir)
+
+        self.assertEqual(StubTTSHandler.requests, [])
+        self.assertEqual(len(segment_files), 3)
+        with open(segment_files[2][0], "rb") as f:
+            self.assertEqual(f.read(), b"hello")
+
+    def test_cache_key_includes_voice(self):
+        self.tts.text_to_speech("hi", os.path.join(self.temp_dir, "a.mp3"), voice="alloy")
+        StubTTSHandler.requests = []
+        self.tts.text_to_speech("hi", os.path.join(self.temp_dir, "b.mp3"), voice="nova")
+        self.assertEqual(StubTTSHandler.requests, ["hi"])
+
+    def test_prune_evicts_least_recently_used_first(self):
+        paths = []
+        for i, text in enumerate(["one", "two", "three"]):
+            path = self.tts._cache_path(text, "alloy", "tts-1", "mp3")
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(b"x" * 100)
+            os.utime(path, (1000 + i, 1000 + i))
+            paths.append(path)
+        # A hit on the oldest entry makes it the most recently used
+        self.assertTrue(self.tts._cache_fetch(paths[0], os.path.join(self.temp_dir, "hit.mp3")))
+
+        self.tts.prune_tts_cache(max_bytes=200)
+
+        self.assertEqual([os.path.exists(p) for p in paths], [True, False, True])
+
+    def test_mix_into_adds_in_place_and_clips_at_the_end(self):
+        import numpy as np
+
+        buffer = np.zeros(10, dtype=np.float32)
+        self.tts.mix_into(buffer, np.full(4, 0.25, dtype=np.float32), 2)
+        self.tts.mix_into(buffer, np.full(4, 0.5, dtype=np.float32), 4)
+        self.tts.mix_into(buffer, np.ones(4, dtype=np.float32), 8)
+        self.tts.mix_into(buffer, np.ones(4, dtype=np.float32), 20)
+
+        np.testing.assert_allclose(buffer, [0, 0, 0.25, 0.25, 0.75, 0.75, 0.5, 0.5, 1, 1])
+
+    @skipUnless(HAS_FFMPEG, "ffmpeg is required to decode synthesised audio")
+    def test_transcript_to_speech_writes_the_mixed_track(self):
+        import wave
+        import numpy as np
+
+        with open(make_tone(os.path.join(self.temp_dir, "tone.mp3"), seconds=1.0), "rb") as f:
+            StubTTSHandler.audio = f.read()
+        self.addCleanup(setattr, StubTTSHandler, "audio", b"")
+        output_path = os.path.join(self.temp_dir, "dubbed.wav")
+
+        result = self.tts.transcript_to_speech(
+            [("hello", 0.0, 0.5), ("world", 2.0, 2.5)], output_path, fit_to_slot=True
+        )
+
+        self.assertEqual(result, output_path)
+        with wave.open(output_path, "rb") as wf:
+            rate = wf.getframerate()
+            self.assertEqual(wf.getnchannels(), 1)
+            self.assertEqual(wf.getnframes(), int(3.5 * rate))
+            samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype="<i2")
+        # Each 1s segment is sped up by at most MAX_FIT_TEMPO, so it ends before 0.7s
+        self.assertTrue(samples[int(0.1 * rate):int(0.6 * rate)].any())
+        self.assertFalse(samples[int(0.75 * rate):int(1.9 * rate)].any())
+        self.assertTrue(samples[int(2.1 * rate):int(2.6 * rate)].any())
+
+
+@skipUnless(HAS_FFMPEG, "ffmpeg is required to extract audio")
+class ExtractAudioTests(SimpleTestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+
+    def test_decodes_to_16khz_mono_float32_without_writing_files(self):
+        from Components.Edit import extractAudio
+
+        video = make_video(os.path.join(self.temp_dir, "in.mp4"), seconds=2.0)
+
+        audio = extractAudio(video)
+
+        self.assertEqual(audio.dtype.name, "float32")
+        self.assertEqual(audio.ndim, 1)
+        self.assertAlmostEqual(len(audio) / 16000, 2.0, delta=0.1)
+        self.assertLessEqual(abs(audio).max(), 1.0)
+        self.assertEqual(os.listdir(self.temp_dir), ["in.mp4"])
+
+    def test_returns_none_for_a_video_without_audio(self):
+        from Components.Edit import extractAudio
+
+        video = make_video(os.path.join(self.temp_dir, "silent.mp4"), audio=False)
+
+        self.assertIsNone(extractAudio(video))
+
+
+class AudioArtifactTests(SimpleTestCase):
+    def setUp(self):
+        import numpy as np
+        from Components import AudioArtifacts
+
+        self.artifacts = AudioArtifacts
+        self.samples = np.linspace(-1, 1, 16000 * 4, dtype=np.float32)
+        patcher = mock.patch.object(AudioArtifacts, "extractAudio", return_value=self.samples)
+        self.extract = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_source_is_decoded_once_per_key(self):
+        first = self.artifacts.acquire_audio("job-1", "video.mp4")
+        second = self.artifacts.acquire_audio("job-1", "video.mp4")
+
+        self.assertIs(first, second)
+        self.extract.assert_called_once_with("video.mp4")
+        self.artifacts.release_audio("job-1")
+        self.artifacts.release_audio("job-1")
+
+    def test_windows_are_views_into_the_shared_buffer(self):
+        import numpy as np
+
+        with self.artifacts.job_audio("job-2", "video.mp4") as audio:
+            window = audio.window(1.0, 2.5)
+
+            self.assertEqual(len(window), 24000)
+            self.assertTrue(np.shares_memory(window, audio.samples))
+            self.assertEqual(window[0], self.samples[16000])
+            self.assertEqual(len(audio.window(3.5)), 8000)
+
+    def test_buffer_is_freed_when_the_last_reference_is_released(self):
+        self.artifacts.acquire_audio("job-3", "video.mp4")
+        self.artifacts.acquire_audio("job-3", "video.mp4")
+
+        self.artifacts.release_audio("job-3")
+        self.assertIn("job-3", self.artifacts._entries)
+        self.artifacts.release_audio("job-3")
+        self.assertNotIn("job-3", self.artifacts._entries)
+
+        # The next job decodes again
+        with self.artifacts.job_audio("job-3", "video.mp4"):
+            pass
+        self.assertEqual(self.extract.call_count, 2)
+
+    def test_wav_bytes_round_trip(self):
+        import io
+        import wave
+
+        data = self.artifacts.to_wav_bytes(self.samples[:1600])
+
+        with wave.open(io.BytesIO(data)) as wf:
+            self.assertEqual((wf.getnchannels(), wf.getframerate(), wf.getnframes()), (1, 16000, 1600))
+
+
+def fake_stream(resolution=None, subtype="mp4", size_mb=10, progressive=False, abr=None, url=None, download=None):
+    from types import SimpleNamespace
+
+    return SimpleNamespace(
+        resolution=resolution,
+        subtype=subtype,
+        filesize=size_mb * 1024 * 1024,
+        is_progressive=progressive,
+        abr=abr,
+        url=url,
+        download=download,
+    )
+
+
+def fake_youtube(video_streams, audio_streams, title="Same Title"):
+    """A pytubefix YouTube class whose videos all have these streams"""
+    from types import SimpleNamespace
+
+    def filter_streams(type=None, only_audio=False):
+        return audio_streams if only_audio else video_streams
+
+    return mock.Mock(return_value=SimpleNamespace(title=title, streams=SimpleNamespace(filter=filter_streams)))
+
+
+class YoutubeStreamSelectionTests(SimpleTestCase):
+    def setUp(self):
+        from Components import YoutubeDownloader
+
+        self.downloader = YoutubeDownloader
+
+    def test_picks_the_smallest_stream_reaching_the_target(self):
+        streams = [
+            fake_stream("2160p", "webm", 300),
+            fake_stream("1440p", "webm", 150),
+            fake_stream("1080p", "webm", 60),
+            fake_stream("1080p", "mp4", 80),
+            fake_stream("720p", "mp4", 30),
+        ]
+
+        selected = self.downloader.select_video_stream(streams, target_height=1080)
+
+        # mp4 is preferred at equal height because it can be stream-copied
+        self.assertIs(selected, streams[3])
+
+    def test_falls_back_to_the_tallest_stream_below_the_target(self):
+        streams = [fake_stream("360p", size_mb=5), fake_stream("720p", size_mb=20)]
+
+        self.assertIs(self.downloader.select_video_stream(streams, target_height=1080), streams[1])
+
+    def test_oversized_streams_are_a_last_resort(self):
+        streams = [fake_stream("1080p", size_mb=900), fake_stream("720p", size_mb=100)]
+
+        self.assertIs(self.downloader.select_video_stream(streams, target_height=1080), streams[1])
+        self.assertIs(self.downloader.select_video_stream(streams[:1], target_height=1080), streams[0])
+
+    def test_audio_matches_the_video_container(self):
+        streams = [
+            fake_stream(subtype="webm", abr="160kbps"),
+            fake_stream(subtype="mp4", abr="128kbps"),
+            fake_stream(subtype="mp4", abr="48kbps"),
+        ]
+
+        self.assertIs(self.downloader.select_audio_stream(streams, "mp4"), streams[1])
+        self.assertIs(self.downloader.select_audio_stream(streams, "webm"), streams[0])
+
+    def test_audio_first_downloads_only_the_audio_into_the_given_directory(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        downloads = []
+
+        def download(output_path, filename_prefix):
+            path = os.path.join(output_path, f"{filename_prefix}Same Title.m4a")
+            open(path, "wb").close()
+            downloads.append(path)
+            return path
+
+        video = fake_stream("1080p", "mp4", url="https://cdn/video")
+        audio = fake_stream(subtype="mp4", abr="128kbps", url="https://cdn/audio", download=download)
+        with mock.patch.object(self.downloader, "YouTube", fake_youtube([video], [audio])):
+            audio_file, source = self.downloader.download_youtube_audio("https://youtu.be/abc123",
+                                                                        output_path=temp_dir)
+            urls = self.downloader.youtube_stream_urls("https://youtu.be/abc123")
+
+        self.assertEqual(audio_file, os.path.join(temp_dir, "audio_Same Title.m4a"))
+        self.assertEqual(source, {"video_url": "https://cdn/video", "audio_url": "https://cdn/audio"})
+        # Looking up the streams again downloads nothing
+        self.assertEqual(urls, source)
+        self.assertEqual(downloads, [audio_file])
+
+        video.is_progressive = True
+        with mock.patch.object(self.downloader, "YouTube", fake_youtube([video], [audio])):
+            self.assertIsNone(self.downloader.youtube_stream_urls("https://youtu.be/abc123")["audio_url"])
+        with mock.patch.object(self.downloader, "YouTube", fake_youtube([video], [])):
+            self.assertEqual(self.downloader.download_youtube_audio("https://youtu.be/abc123", output_path=temp_dir),
+                             (None, None))
+
+    @skipUnless(HAS_FFMPEG, "ffmpeg is required to mux streams")
+    def test_merge_copies_compatible_streams_and_reencodes_otherwise(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir, True)
+        audio = make_tone(os.path.join(temp_dir, "audio.m4a"), seconds=1.0, extra_args=("-c:a", "aac"))
+        h264 = make_video(os.path.join(temp_dir, "h264.mp4"), seconds=1.0, audio=False)
+        raw = os.path.join(temp_dir, "raw.avi")
+        subprocess.run(
+            ["ffmpeg", "-y", "-f", "lavfi", "-i", "testsrc=duration=1:size=160x90",
+             "-c:v", "rawvideo", "-pix_fmt", "yuv420p", raw],
+            capture_output=True, check=True,
+        )
+
+        with mock.patch.object(self.downloader.ffmpeg, "run", wraps=self.downloader.ffmpeg.run) as run:
+            self.downloader.merge_streams(h264, audio, os.path.join(temp_dir, "copied.mp4"))
+            self.assertEqual(run.call_count, 1)
+            self.assertIn("copy", run.call_args.args[0].get_args())
+
+            run.reset_mock()
+            output = self.downloader.merge_streams(raw, audio, os.path.join(temp_dir, "encoded.mp4"))
+            self.assertEqual(run.call_count, 2)
+            self.assertIn("libx264", run.call_args.args[0].get_args())
+        self.assertGreater(os.path.getsize(output), 0)
+
+
+@skipUnless(HAS_FFMPEG, "ffmpeg is required to fetch video ranges")
+class VideoRangeFetchTests(SimpleTestCase):
+    def setUp(self):
+        from Components import YoutubeDownloader
+
+        self.downloader = YoutubeDownloader
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        RangeFileHandler.root = self.temp_dir
+        RangeFileHandler.ranges = []
+        self.server = StubServer(RangeFileHandler).__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+
+    def test_fetches_only_the_window_around_a_highlight(self):
+        from Components.Edit import extractAudio
+
+        source = make_video(
+            os.path.join(self.temp_dir, "source.mp4"),
+            seconds=60,
+            size="640x360",
+            extra_args=("-c:v", "libx264", "-b:v", "1M", "-g", "60", "-movflags", "+faststart"),
+        )
+        output = os.path.join(self.temp_dir, "clip.mp4")
+
+        clip, offset = self.downloader.download_video_range(
+            f"{self.server.url}/source.mp4", output, 45.0, 50.0, padding=1.0
+        )
+
+        self.assertEqual((clip, offset), (output, 44.0))
+        # ffmpeg read the index at the front, then jumped straight to the window
+        self.assertGreater(max(first for first, _ in RangeFileHandler.ranges), os.path.getsize(source) // 2)
+        self.assertLess(os.path.getsize(clip), os.path.getsize(source) // 5)
+        self.assertAlmostEqual(len(extractAudio(clip)) / 16000, 7.0, delta=0.5)
+
+    def test_returns_none_when_the_source_is_unavailable(self):
+        clip, offset = self.downloader.download_video_range(
+            f"{self.server.url}/missing.mp4", os.path.join(self.temp_dir, "clip.mp4"), 1.0, 2.0
+        )
+
+        self.assertEqual((clip, offset), (None, None))
+
+
+class SourceCacheTests(TestCase):
+    def setUp(self):
+        from shorts_api import source_cache
+
+        self.cache = source_cache
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, True)
+        overrides = override_settings(
+            SOURCE_CACHE_DIR=os.path.join(self.temp_dir, "sources"),
+            SOURCE_CACHE_MAX_BYTES=10 ** 9,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.downloads = []
+
+    def downloader(self, content=b"video-bytes", name="video.mp4"):
+        def download(directory):
+            self.downloads.append(directory)
+            path = os.path.join(directory, name)
+            with open(path, "wb") as f:
+                f.write(content)
+            return path
+        return download
+
+    def test_youtube_video_id(self):
+        for url in [
+            "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=42",
+            "https://youtu.be/dQw4w9WgXcQ?si=abc",
+            "https://m.youtube.com/shorts/dQw4w9WgXcQ",
+            "https://www.youtube.com/embed/dQw4w9WgXcQ",
+        ]:
+            self.assertEqual(self.cache.youtube_video_id(url), "dQw4w9WgXcQ")
+        self.assertIsNone(self.cache.youtube_video_id("https://res.cloudinary.com/demo/video/upload/a.mp4"))
+
+    def test_same_youtube_video_is_downloaded_once(self):
+        first = self.cache.acquire_source("https://youtu.be/abc123", self.downloader())
+        second = self.cache.acquire_source("https://www.youtube.com/watch?v=abc123", self.downloader())
+
+        self.assertEqual(len(self.downloads), 1)
+        self.assertEqual(first.pk, second.pk)
+        self.assertEqual(second.source_key, "youtube:abc123")
+        self.assertEqual(second.ref_count, 2)
+        self.assertEqual(os.stat(second.file_path).st_mode & 0o222, 0)
+        self.assertFalse(os.path.exists(self.downloads[0]))
+
+    def test_other_urls_are_keyed_by_content(self):
+        a = self.cache.acquire_source("https://res.cloudinary.com/demo/a.mp4", self.downloader(b"same"))
+        again = self.cache.acquire_source("https://res.cloudinary.com/demo/a.mp4", self.downloader(b"same"))
+        b = self.cache.acquire_source("https://res.cloudinary.com/demo/b.mp4", self.downloader(b"same"))
+
+        # The repeat URL is not downloaded again; the second URL is, but shares the file
+        self.assertEqual(len(self.downloads), 2)
+        self.assertEqual({a.pk, again.pk, b.pk}, {a.pk})
+        self.assertTrue(a.source_key.startswith("sha256:"))
+
+    def test_failed_download_returns_none(self):
+        self.assertIsNone(self.cache.acquire_source("https://youtu.be/nope", lambda directory: None))
+
+    def test_variants_are_cached_apart_from_the_full_video(self):
+        video = self.cache.acquire_source("https://youtu.be/abc123", self.downloader(b"video"))
+        audio = self.cache.acquire_source("https://youtu.be/abc123", self.downloader(b"audio", "a.m4a"), variant="audio")
+        again = self.cache.acquire_source("https://www.youtube.com/watch?v=abc123", self.downloader(), variant="audio")
+        other = self.cache.acquire_source("https://example.com/a.mp4", self.downloader(b"video"))
+        other_audio = self.cache.acquire_source("https://example.com/a.mp4", self.downloader(b"video"), variant="audio")
+
+        self.assertEqual(len(self.downloads), 4)
+        self.assertEqual(again.pk, audio.pk)
+        self.assertNotEqual(audio.pk, video.pk)
+        self.assertEqual(audio.source_key, "youtube-audio:abc123")
+        self.assertTrue(audio.file_path.endswith("youtube-audio_abc123.m4a"))
+        self.assertNotEqual(other_audio.source_key, other.source_key)
+        self.assertTrue(other_audio.source_key.startswith("sha256-audio:"))
+
+    def test_eviction_is_lru_and_skips_referenced_sources(self):
+        from shorts_api.models import SourceMedia
+
+        old = self.cache.acquire_source("https://youtu.be/old", self.downloader(b"x" * 100))
+        in_use = self.cache.acquire_source("https://youtu.be/inuse", self.downloader(b"x" * 100))
+        recent = self.cache.acquire_source("https://youtu.be/recent", self.downloader(b"x" * 100))
+        self.cache.release_source(old)
+        self.cache.release_source(recent)
+        SourceMedia.objects.filter(pk=in_use.pk).update(last_used_at=SourceMedia.objects.get(pk=old.pk).last_used_at)
+
+        self.cache.evict_sources(max_bytes=150)
+
+        remaining = set(SourceMedia.objects.values_list("source_key", flat=True))
+        self.assertEqual(remaining, {"youtube:inuse"})
+        self.assertFalse(os.path.exists(old.file_path))
+        self.assertTrue(os.path.exists(in_use.file_path))
+
+    def test_references_left_by_an_earlier_process_are_released_at_startup(self):
+        from shorts_api import tasks
+        from shorts_api.models import SourceMedia
+
+        # Held by jobs of a process that died before releasing them
+        stranded = self.cache.acquire_source("https://youtu.be/old", self.downloader(b"x" * 100))
+        self.cache.acquire_source("https://youtu.be/recent", self.downloader(b"x" * 100))
+
+        with override_settings(SOURCE_CACHE_MAX_BYTES=150):
+            tasks.recover_after_restart()
+
+        self.assertEqual(list(SourceMedia.objects.values_list("source_key", "ref_count")), [("youtube:recent", 0)])
+        self.assertFalse(os.path.exists(stranded.file_path))
+
+
+class TranscriptStoreTests(TestCase):
+    SEGMENTS = [{
+        "text": " Hello there.",
+        "start": 0.0,
+        "end": 1.23456,
+        "words": [
+            {"word": " Hello", "start": 0.0, "end": 0.51234},
+            {"word": " there.", "start": 0.6, "end": 1.23456},
+        ],
+    }]
+
+    def setUp(self):
+        import numpy as np
+        from Components.AudioArtifacts import AudioArtifact
+        from shorts_api import transcripts
+
+        self.transcripts = transcripts
+        self.audio = AudioArtifact(np.zeros(16000 * 2, dtype=np.float32))
+        patcher = mock.patch.object(transcripts, "transcribeSegments", return_value=self.SEGMENTS)
+        self.transcribe = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_known_audio_skips_transcription(self):
+        first = self.transcripts.get_or_transcribe(self.audio)
+        second = self.transcripts.get_or_transcribe(self.audio)
+
+        self.assertEqual(first.pk, second.pk)
+        self.transcribe.assert_called_once_with(self.audio.samples)
+        self.assertEqual(self.transcripts.transcript_rows(second), [[" Hello there.", 0.0, 1.235]])
+        self.assertEqual(second.segments[0]["words"][0], {"word": " Hello", "start": 0.0, "end": 0.512})
+        self.assertEqual(second.duration, 2.0)
+
+    def test_different_decode_settings_are_stored_separately(self):
+        self.transcripts.get_or_transcribe(self.audio)
+        with mock.patch.object(self.transcripts, "params_hash", return_value="other-settings"):
+            self.transcripts.get_or_transcribe(self.audio)
+
+        self.assertEqual(self.transcribe.call_count, 2)
+
+    def test_empty_transcription_is_not_stored(self):
+        from shorts_api.models import Transcript
+
+        self.transcribe.return_value = []
+
+        self.assertIsNone(self.transcripts.get_or_transcribe(self.audio))
+        self.assertFalse(Transcript.objects.exists())
+
+
+def fake_render(index, delay=0.0, fail=False):
+    """Stand-in for render_short; lives at module level so workers can import it"""
+    started = time.time()
+    time.sleep(delay)
+    if fail:
+        raise RuntimeError(f"short {index} broke")
+    return f"final_{index}.mp4", os.getpid(), started, time.time()
+
+
+def spinning_render(index, seconds):
+    """Burns CPU in the worker for about seconds"""
+    deadline = time.process_time() + seconds
+    while time.process_time() < deadline:
+        pass
+    return f"final_{index}.mp4"
+
+
+def crashing_render(index, marker):
+    """Kills its worker the first time it runs, like an out-of-memory render"""
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        os._exit(1)
+    return f"final_{index}.mp4", os.getpid()
+
+
+class RenderPoolTests(SimpleTestCase):
+    def setUp(self):
+        from shorts_api import render
+
+        self.render = render
+        overrides = override_settings(RENDER_MAX_WORKERS=3, RENDER_START_METHOD="spawn")
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        render.shutdown_render_pool()
+        self.addCleanup(render.shutdown_render_pool)
+
+    def test_render_errors_reach_the_caller(self):
+        self.assertEqual(self.render.render_in_pool({"index": 0}, render=fake_render)[0], "final_0.mp4")
+        with self.assertRaisesMessage(RuntimeError, "short 1 broke"):
+            self.render.render_in_pool({"index": 1, "fail": True}, render=fake_render)
+
+    def test_shorts_render_in_separate_processes(self):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            results = list(executor.map(
+                lambda i: self.render.render_in_pool({"index": i, "delay": 1.0}, render=fake_render), range(3)
+            ))
+        pids = {result[1] for result in results}
+
+        self.assertEqual(len(pids), 3)
+        self.assertNotIn(os.getpid(), pids)
+        # All three renders were running at the same time
+        self.assertLess(max(result[2] for result in results), min(result[3] for result in results))
+
+    def test_short_is_retried_once_when_its_worker_dies(self):
+        marker = os.path.join(tempfile.mkdtemp(), "crashed")
+        self.addCleanup(shutil.rmtree, os.path.dirname(marker), True)
+
+        result = self.render.render_in_pool({"index": 0, "marker": marker}, render=crashing_render)
+
+        self.assertEqual(result[0], "final_0.mp4")
+
+    def test_worker_cpu_time_counts_towards_the_callers_stage(self):
+        from shorts_api.metrics import measure
+
+        with measure() as usage:
+            self.render.render_in_pool({"index": 0, "seconds": 0.3}, render=spinning_render)
+
+        self.assertGreaterEqual(usage.cpu_seconds, 0.25)
+        self.assertGreater(usage.peak_rss_bytes, 0)
+
+    @skipUnless(os.path.exists("/proc/self/statm"), "memory is sampled from /proc")
+    def test_peak_memory_is_the_stages_own_not_the_processes(self):
+        from shorts_api.metrics import measure
+
+        with measure() as big:
+            data = b"x" * (256 * 1024 * 1024)
+            time.sleep(0.3)
+            del data
+        with measure() as small:
+            time.sleep(0.3)
+
+        self.assertGreater(big.peak_rss_bytes - small.peak_rss_bytes, 200 * 1024 * 1024)
+
+
+class PipelineTests(SimpleTestCase):
+    def setUp(self):
+        from shorts_api import pipeline
+
+        self.pipeline = pipeline
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+
+    def stage(self, name, inputs=(), resource="cpu", delay=0.2, fail=False):
+        def run(*values):
+            with self.lock:
+                self.active[resource] = self.active.get(resource, 0) + 1
+                self.peak[resource] = max(self.peak.get(resource, 0), self.active[resource])
+            time.sleep(delay)
+            with self.lock:
+                self.active[resource] -= 1
+            if fail:
+                raise RuntimeError(f"{name} broke")
+            return f"{name}({', '.join(values)})"
+        return self.pipeline.Stage(name, run, inputs=inputs, outputs=[name], resource=resource)
+
+    def test_stages_run_concurrently_within_each_class_limit(self):
+        stages = [self.stage(f"render_{i}") for i in range(4)] + [self.stage(f"upload_{i}", resource="api")
+                                                                  for i in range(4)]
+        result = self.pipeline.Pipeline(stages, limits={"cpu": 2, "api": 3}).run()
+
+        self.assertTrue(result.ok)
+        self.assertEqual(self.peak, {"cpu": 2, "api": 3})
+
+    def test_failure_only_skips_stages_that_depend_on_it(self):
+        stages = [
+            self.stage("ingest", delay=0),
+            self.stage("render_0", ["ingest"], fail=True),
+            self.stage("upload_0", ["render_0"]),
+            self.stage("render_1", ["ingest"]),
+            self.stage("upload_1", ["render_1"]),
+        ]
+        result = self.pipeline.Pipeline(stages).run()
+
+        self.assertEqual(list(result.failed), ["render_0"])
+        self.assertEqual(result.skipped, {"upload_0"})
+        self.assertEqual(result.values["upload_1"], "upload_1(render_1(ingest()))")
+
+    def test_callbacks_run_on_the_calling_thread(self):
+        seen = []
+        stages = [self.stage("a", delay=0), self.stage("b", ["a"], delay=0, fail=True)]
+        self.pipeline.Pipeline(stages).run(on_complete=lambda stage, outputs, error: seen.append(
+            (stage.name, outputs, type(error), threading.current_thread())
+        ))
+
+        self.assertEqual(seen, [
+            ("a", {"a": "a()"}, type(None), threading.current_thread()),
+            ("b", None, RuntimeError, threading.current_thread()),
+        ])
+
+    def test_missing_inputs_and_cycles_are_rejected(self):
+        with self.assertRaisesMessage(ValueError, "needs 'source'"):
+            self.pipeline.Pipeline([self.stage("a", ["source"])]).run()
+        with self.assertRaisesMessage(ValueError, "cycle"):
+            self.pipeline.Pipeline([self.stage("a", ["b"]), self.stage("b", ["a"])]).run()
+        # An initial value satisfies an input
+        result = self.pipeline.Pipeline([self.stage("a", ["source"], delay=0)]).run({"source": "src"})
+        self.assertEqual(result.values["a"], "a(src)")
+
+    def test_each_stage_is_measured(self):
+        path = os.path.join(tempfile.mkdtemp(), "out.bin")
+        self.addCleanup(shutil.rmtree, os.path.dirname(path), True)
+
+        def write():
+            with open(path, "wb") as f:
+                f.write(b"x" * 100000)
+
+        stages = [self.pipeline.Stage("write", write), self.stage("wait", delay=0.3)]
+        self.pipeline.Pipeline(stages).run()
+
+        self.assertGreaterEqual(stages[1].usage.wall_seconds, 0.3)
+        if os.path.exists("/proc/thread-self/io"):
+            self.assertGreaterEqual(stages[0].usage.bytes_out, 100000)
+            self.assertLess(stages[1].usage.bytes_out, 100000)
+
+    def test_prune_leaves_out_stages_whose_outputs_are_known(self):
+        stages = [
+            self.stage("translate"),
+            self.stage("speech", ["translate"]),
+            self.stage("merge", ["speech"]),
+            self.stage("captions", ["merge", "translate"]),
+            self.stage("upload", ["captions"]),
+        ]
+        needed = self.pipeline.prune(stages, {"merge": "video.mp4"}, ["upload"])
+
+        self.assertEqual([stage.name for stage in needed], ["translate", "captions", "upload"])
+
+
+class UploadShortTests(SimpleTestCase):
+    def setUp(self):
+        from shorts_api import uploads
+
+        self.uploads = uploads
+        overrides = override_settings(UPLOAD_MAX_WORKERS=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        for patcher in (mock.patch.object(uploads, "_slots", None),
+                        mock.patch.object(uploads, "upload_to_cloudinary", side_effect=self.slow_upload)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.active = 0
+        self.peak = 0
+        self.counter_lock = threading.Lock()
+
+    def slow_upload(self, file_path, public_id_prefix):
+        with self.counter_lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.2)
+        with self.counter_lock:
+            self.active -= 1
+        return {"url": f"https://cdn/{file_path}", "public_id": public_id_prefix}
+
+    def test_concurrent_uploads_are_capped_by_the_upload_slots(self):
+        results = {}
+
+        def upload(i):
+            results[i] = self.uploads.upload_short(f"short_{i}.mp4", f"user_{i}")
+
+        threads = [threading.Thread(target=upload, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(self.peak, 2)
+        self.assertEqual([results[i]["url"] for i in range(4)], [f"https://cdn/short_{i}.mp4" for i in range(4)])
+
+
+class IngestCoalescingTests(SimpleTestCase):
+    URL = "https://www.youtube.com/watch?v=abc123"
+
+    def setUp(self):
+        from shorts_api import ingest
+
+        self.ingest = ingest
+        self.release = threading.Event()
+        self.media = mock.Mock(file_path="/cache/youtube_abc123.mp4")
+        self.audio = mock.Mock()
+        self.transcript = mock.Mock()
+
+        def slow_acquire_source(url, download):
+            # Hold the leader in the download so followers arrive mid-flight
+            self.release.wait(5)
+            return self.media
+
+        patchers = {
+            "acquire_source": mock.patch.object(ingest, "acquire_source", side_effect=slow_acquire_source),
+            "release_source": mock.patch.object(ingest, "release_source"),
+            "acquire_audio": mock.patch.object(ingest, "acquire_audio", return_value=self.audio),
+            "release_audio": mock.patch.object(ingest, "release_audio"),
+            "get_or_transcribe": mock.patch.object(ingest, "get_or_transcribe", return_value=self.transcript),
+            "transcript_rows": mock.patch.object(ingest, "transcript_rows", return_value=[[" Hi.", 0.0, 1.0]]),
+            "GetHighlight": mock.patch.object(ingest, "GetHighlight", return_value=(1.0, 5.0)),
+        }
+        self.mocks = {name: patcher.start() for name, patcher in patchers.items()}
+        for patcher in patchers.values():
+            self.addCleanup(patcher.stop)
+        self.addCleanup(ingest._inflight.clear)
+
+    def attach_concurrently(self, count, url=URL):
+        results = [None] * count
+
+        def attach(index):
+            try:
+                results[index] = self.ingest.attach_ingest(url)
+            except self.ingest.IngestError as e:
+                results[index] = e
+
+        threads = [threading.Thread(target=attach, args=(index,)) for index in range(count)]
+        for thread in threads:
+            thread.start()
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            key = ("full", "youtube:abc123")
+            if key in self.ingest._inflight and self.ingest._inflight[key].references == count:
+                break
+            time.sleep(0.01)
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def test_concurrent_jobs_share_download_audio_and_transcript(self):
+        jobs = self.attach_concurrently(3)
+
+        self.assertTrue(all(job is jobs[0] for job in jobs))
+        self.mocks["acquire_source"].assert_called_once()
+        self.mocks["acquire_audio"].assert_called_once()
+        self.mocks["get_or_transcribe"].assert_called_once()
+        self.assertEqual(jobs[0].vid, "/cache/youtube_abc123.mp4")
+        self.assertEqual(jobs[0].trans_text, "0.0 - 1.0:  Hi.")
+
+        for job in jobs:
+            self.assertEqual(job.highlight(0), (1.0, 5.0))
+            self.ingest.detach_ingest(job)
+        self.mocks["GetHighlight"].assert_called_once()
+
+    def test_shared_stages_are_measured_separately_and_recorded_once(self):
+        jobs = self.attach_concurrently(2)
+
+        with mock.patch.object(self.ingest, "record_stage_metric") as record:
+            for job in ("first job", "second job"):
+                jobs[0].record_metrics(job)
+        self.assertEqual([call.args[:4] for call in record.call_args_list], [
+            ("first job", "download", 0, "COMPLETED"),
+            ("first job", "audio", 0, "COMPLETED"),
+            ("first job", "transcript", 0, "COMPLETED"),
+        ])
+        # The download waited for the release, the rest did not
+        self.assertGreater(jobs[0].usage["download"].wall_seconds, jobs[0].usage["transcript"].wall_seconds)
+        for job in jobs:
+            self.ingest.detach_ingest(job)
+
+    def test_resources_are_released_after_the_last_job_detaches(self):
+        jobs = self.attach_concurrently(2)
+
+        self.ingest.detach_ingest(jobs[0])
+        self.mocks["release_source"].assert_not_called()
+        self.ingest.detach_ingest(jobs[1])
+
+        self.mocks["release_source"].assert_called_once_with(self.media)
+        self.mocks["release_audio"].assert_called_once()
+        self.assertEqual(self.ingest._inflight, {})
+
+    def test_followers_receive_the_leaders_error(self):
+        self.mocks["get_or_transcribe"].return_value = None
+
+        errors = self.attach_concurrently(2)
+
+        self.assertTrue(all(isinstance(error, self.ingest.IngestError) for error in errors))
+        self.assertEqual([str(error) for error in errors], ["No transcriptions found"] * 2)
+        with mock.patch.object(self.ingest, "record_stage_metric") as record:
+            errors[0].ingest.record_metrics("job")
+        self.assertEqual(record.call_args_list[-1].args[1:4], ("transcript", 0, "FAILED"))
+        self.mocks["acquire_source"].assert_called_once()
+        self.mocks["release_source"].assert_called_once_with(self.media)
+        self.assertEqual(self.ingest._inflight, {})
+
+        # A later request starts a fresh ingest rather than inheriting the failure
+        self.mocks["get_or_transcribe"].return_value = self.transcript
+        job = self.ingest.attach_ingest(self.URL)
+        self.assertIs(job.transcript, self.transcript)
+        self.ingest.detach_ingest(job)
+
+
+class CloudinaryUploadTests(TestCase):
+    def setUp(self):
+        from shorts_api import utils
+
+        self.utils = utils
+        FakeCloudinaryHandler.requests = []
+        FakeCloudinaryHandler.fail_ranges = set()
+        FakeCloudinaryHandler.reject_ranges = set()
+        server = StubServer(FakeCloudinaryHandler)
+        server.__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+
+        overrides = override_settings(
+            CLOUDINARY={"cloud_name": "demo", "api_key": "key", "api_secret": "secret"},
+            CLOUDINARY_UPLOAD_PREFIX=server.url,
+            CLOUDINARY_CHUNK_SIZE=1000,
+            CLOUDINARY_CHUNK_RETRIES=2,
+            CLOUDINARY_RETRY_BACKOFF=0,
+        )
+        overrides.enable()
+        self.addCleanup(utils.configure_cloudinary, True)
+        self.addCleanup(overrides.disable)
+        utils.configure_cloudinary(force=True)
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        self.path = os.path.join(self.tmp, "final_1_0.mp4")
+        self.content = bytes(range(256)) * 10
+        with open(self.path, "wb") as f:
+            f.write(self.content)
+
+    def test_failed_chunk_is_retried_without_restarting_the_file(self):
+        FakeCloudinaryHandler.fail_ranges = {"bytes 1000-1999/2560"}
+
+        result = self.utils.upload_to_cloudinary(self.path, "user_1")
+
+        self.assertEqual(result["public_id"], "shorts/user_1/final_1_0")
+        self.assertTrue(result["url"].endswith("final_1_0.mp4"))
+        requests = FakeCloudinaryHandler.requests
+        self.assertEqual([request["range"] for request in requests], [
+            "bytes 0-999/2560", "bytes 1000-1999/2560", "bytes 1000-1999/2560", "bytes 2000-2559/2560",
+        ])
+        self.assertEqual(len({request["upload_id"] for request in requests}), 1)
+        self.assertTrue(all(request["path"] == "/v1_1/demo/video/upload" for request in requests))
+        self.assertIn(self.content[2000:], requests[-1]["body"])
+
+    def test_identical_content_is_not_uploaded_again(self):
+        first = self.utils.upload_to_cloudinary(self.path, "user_1")
+        sent = len(FakeCloudinaryHandler.requests)
+
+        second = self.utils.upload_to_cloudinary(self.path, "user_1")
+        self.assertEqual(second, first)
+        self.assertEqual(len(FakeCloudinaryHandler.requests), sent)
+
+        with open(self.path, "ab") as f:
+            f.write(b"changed")
+        self.utils.upload_to_cloudinary(self.path, "user_1")
+        self.assertGreater(len(FakeCloudinaryHandler.requests), sent)
+
+    def test_gives_up_after_the_retry_budget(self):
+        with mock.patch.object(self.utils.requests, "post",
+                               side_effect=self.utils.requests.ConnectionError("down")) as post:
+            self.assertIsNone(self.utils.upload_to_cloudinary(self.path, "user_1"))
+
+        self.assertEqual(post.call_count, 3)
+
+    def test_refused_chunk_is_not_retried(self):
+        FakeCloudinaryHandler.reject_ranges = {"bytes 1000-1999/2560"}
+
+        self.assertIsNone(self.utils.upload_to_cloudinary(self.path, "user_1"))
+
+        self.assertEqual([request["range"] for request in FakeCloudinaryHandler.requests],
+                         ["bytes 0-999/2560", "bytes 1000-1999/2560"])
+
+
+class JobWorkspaceTests(SimpleTestCase):
+    def setUp(self):
+        from shorts_api.workspace import JobWorkspace, WorkspaceQuotaExceeded
+
+        self.JobWorkspace = JobWorkspace
+        self.WorkspaceQuotaExceeded = WorkspaceQuotaExceeded
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root, True)
+
+    def test_concurrent_jobs_get_separate_directories(self):
+        first = self.JobWorkspace("shorts", 1, root=self.root)
+        second = self.JobWorkspace("shorts", 2, root=self.root)
+
+        self.assertNotEqual(first.file("Out_0.mp4"), second.file("Out_0.mp4"))
+        with open(first.file("short_0", "Out_0.mp4"), "w") as f:
+            f.write("x")
+        self.assertFalse(os.path.exists(second.file("short_0", "Out_0.mp4")))
+
+    def test_quota_counts_every_file(self):
+        workspace = self.JobWorkspace("shorts", 1, root=self.root, quota_bytes=1000)
+        with open(workspace.file("a.mp4"), "wb") as f:
+            f.write(b"x" * 600)
+        workspace.check_quota()
+        with open(workspace.file("short_1", "b.mp4"), "wb") as f:
+            f.write(b"x" * 600)
+
+        with self.assertRaises(self.WorkspaceQuotaExceeded):
+            workspace.check_quota()
+
+    def test_only_promoted_files_survive_cleanup(self):
+        durable = os.path.join(self.root, "media", "final_1_0.mp4")
+        with self.JobWorkspace("shorts", 1, root=self.root) as workspace:
+            for name in ("Out_0.mp4", "final_1_0.mp4"):
+                open(workspace.file(name), "w").close()
+            workspace.promote(workspace.file("final_1_0.mp4"), durable)
+
+        self.assertFalse(os.path.exists(workspace.path))
+        self.assertTrue(os.path.exists(durable))
+
+    def test_workspaces_of_jobs_that_are_not_running_are_swept(self):
+        from shorts_api.workspace import sweep_workspaces
+
+        crashed = self.JobWorkspace("shorts", 1, root=self.root)
+        running = self.JobWorkspace("dubbing", 2, root=self.root)
+        other = os.path.join(self.root, "notes")
+        os.makedirs(other)
+
+        removed = sweep_workspaces(lambda kind, job_id: (kind, job_id) == ("dubbing", 2), root=self.root)
+
+        self.assertEqual(removed, 1)
+        self.assertFalse(os.path.exists(crashed.path))
+        self.assertTrue(os.path.exists(running.path))
+        self.assertTrue(os.path.exists(other))
+
+    def test_stale_workspace_of_the_same_job_is_removed(self):
+        stale = self.JobWorkspace("dubbing", 3, root=self.root)
+        other = self.JobWorkspace("dubbing", 33, root=self.root)
+        fresh = self.JobWorkspace("dubbing", 3, root=self.root)
+
+        self.assertFalse(os.path.exists(stale.path))
+        self.assertTrue(os.path.exists(other.path))
+        self.assertTrue(os.path.exists(fresh.path))
+
+
+class StageCheckpointTests(TestCase):
+    def setUp(self):
+        import numpy as np
+        from Components.AudioArtifacts import AudioArtifact
+        from shorts_api import tasks
+        from shorts_api.ingest import SourceIngest
+        from shorts_api.models import Transcript, VideoProcessing
+
+        self.tasks = tasks
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        # Finished shorts are promoted to media/ in the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        self.workspaces = os.path.join(self.tmp, "workspaces")
+        overrides = override_settings(JOB_WORKSPACE_ROOT=self.workspaces)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        transcript = Transcript(audio_hash="a" * 64, model_name="base.en", language="en", params_hash="p")
+        transcript.segments = []
+        transcript.save()
+        self.ingest = mock.Mock(vid="source.mp4", source=None, transcript=transcript,
+                                audio=AudioArtifact(np.zeros(16000 * 10, dtype=np.float32)))
+        self.ingest.highlight.side_effect = lambda i: (1.0 + i * 3, 3.0 + i * 3)
+        self.ingest.checkpoint.side_effect = lambda job: SourceIngest.checkpoint(self.ingest, job)
+        self.job = VideoProcessing.objects.create(youtube_url="https://youtu.be/abc123", username="sam",
+                                                  num_shorts=2, add_captions=False)
+
+        self.rendered = []
+        self.fail_renders = set()
+        self.uploaded = []
+        self.fail_uploads = set()
+
+        def fake_render_in_pool(kwargs):
+            i = kwargs["index"]
+            self.rendered.append(i)
+            if i in self.fail_renders:
+                raise RuntimeError("render broke")
+            path = os.path.join(kwargs["workdir"], f"final_{i}.mp4")
+            open(path, "w").close()
+            return path
+
+        def fake_upload_short(file_path, public_id_prefix):
+            self.uploaded.append(file_path)
+            if os.path.basename(file_path) in self.fail_uploads:
+                return None
+            return {"url": f"https://cdn/{os.path.basename(file_path)}", "public_id": public_id_prefix}
+
+        patchers = [
+            mock.patch.object(tasks, "attach_ingest", return_value=self.ingest),
+            mock.patch.object(tasks, "detach_ingest"),
+            mock.patch.object(tasks, "render_in_pool", side_effect=fake_render_in_pool),
+            mock.patch.object(tasks, "upload_short", side_effect=fake_upload_short),
+        ]
+        self.attach = patchers[0].start()
+        for patcher in patchers[1:]:
+            patcher.start()
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+
+    def run_job(self):
+        self.tasks.process_video_task(self.job.id)
+        self.job.refresh_from_db()
+
+    def stage_status(self, name, index=0):
+        return self.job.stages.get(name=name, index=index).status
+
+    def test_retry_only_reruns_unfinished_shorts(self):
+        self.fail_renders = {1}
+        self.run_job()
+
+        self.assertEqual(len(self.job.cloudinary_urls), 1)
+        # Only the finished short outlives the run's workspace
+        self.assertEqual(os.listdir(self.workspaces), [])
+        self.assertEqual([name for name in os.listdir("media") if name.endswith(".mp4")], ["final_0.mp4"])
+        self.assertEqual(self.stage_status("transcript"), "COMPLETED")
+        self.assertEqual(self.stage_status("upload", 0), "COMPLETED")
+        self.assertEqual(self.stage_status("render", 1), "FAILED")
+
+        self.fail_renders = set()
+        self.rendered, self.uploaded = [], []
+        self.ingest.highlight.reset_mock()
+        self.run_job()
+
+        self.assertEqual(self.job.status, "COMPLETED")
+        self.assertEqual(self.rendered, [1])
+        self.assertEqual([os.path.basename(path) for path in self.uploaded], ["final_1.mp4"])
+        # Short 1's highlight was chosen by the first attempt and is reused
+        self.ingest.highlight.assert_not_called()
+        self.assertEqual(len(self.job.cloudinary_urls), 2)
+
+    def test_rendered_shorts_resume_at_upload_without_ingest(self):
+        self.fail_uploads = {"final_0.mp4"}
+        self.run_job()
+        self.assertEqual(self.stage_status("upload", 0), "FAILED")
+
+        self.fail_uploads = set()
+        self.rendered, self.uploaded = [], []
+        self.attach.reset_mock()
+        self.run_job()
+
+        self.attach.assert_not_called()
+        self.assertEqual(self.rendered, [])
+        self.assertEqual([os.path.basename(path) for path in self.uploaded], ["final_0.mp4"])
+        self.assertEqual(len(self.job.cloudinary_urls), 2)
+
+    def test_missing_render_output_is_rendered_again(self):
+        self.fail_uploads = {"final_0.mp4"}
+        self.run_job()
+        os.remove(os.path.join(self.tmp, "media", "final_0.mp4"))
+
+        self.fail_uploads = set()
+        self.rendered = []
+        self.run_job()
+
+        self.assertEqual(self.rendered, [0])
+        self.assertEqual(self.job.status, "COMPLETED")
+
+    def test_stage_metrics_are_saved_served_and_exported(self):
+        self.run_job()
+
+        self.assertEqual(
+            sorted({(metric.name, metric.index) for metric in self.job.stage_metrics.all()}),
+            [("highlight", 0), ("highlight", 1), ("ingest", 0), ("render", 0), ("render", 1),
+             ("upload", 0), ("upload", 1)],
+        )
+        status = self.client.get(f"/api/shorts/status/{self.job.id}/").json()
+        self.assertIn("wall_seconds", status["stage_metrics"][0])
+
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("text/plain", response["Content-Type"])
+        body = response.content.decode()
+        self.assertIn('momentai_stage_duration_seconds_bucket{kind="shorts",stage="render",status="completed",le="+Inf"}',
+                      body)
+        self.assertIn('momentai_stage_io_bytes_total{kind="shorts",stage="upload",direction="out"}', body)
+
+    def test_progress_is_reported_as_stages_finish(self):
+        from shorts_api.progress import broker
+
+        self.run_job()
+
+        self.assertEqual(self.job.progress_percent, 100)
+        self.assertEqual(self.job.shorts_completed, 2)
+        self.assertIsNone(self.job.progress_eta_seconds)
+        latest = broker.latest(("shorts", self.job.id))
+        self.assertEqual((latest["status"], latest["shorts_completed"]), ("COMPLETED", 2))
+
+    def test_uploaded_shorts_are_recorded_as_outputs(self):
+        self.run_job()
+
+        outputs = list(self.job.outputs.all())
+        self.assertEqual([(output.index, output.highlight_start, output.highlight_end, output.duration)
+                          for output in outputs], [(0, 1.0, 3.0, 2.0), (1, 4.0, 6.0, 2.0)])
+        self.assertEqual(outputs[0].size_bytes, 0)
+        self.assertEqual(self.job.shorts_completed, 2)
+        self.assertEqual(self.job.cloudinary_url, "https://cdn/final_0.mp4")
+        status = self.client.get(f"/api/shorts/status/{self.job.id}/").json()
+        self.assertEqual(status["cloudinary_urls"][1], {"url": "https://cdn/final_1.mp4", "public_id": "user_sam_1"})
+        self.assertEqual(status["outputs"][1]["highlight_start"], 4.0)
+
+    def test_upload_run_again_before_its_checkpoint_is_recorded_once(self):
+        self.run_job()
+        # As if the process died between recording short 0 and checkpointing its upload
+        self.job.stages.filter(name="upload", index=0).delete()
+
+        self.uploaded = []
+        self.run_job()
+
+        self.assertEqual([os.path.basename(path) for path in self.uploaded], ["final_0.mp4"])
+        self.assertEqual([output.index for output in self.job.outputs.all()], [0, 1])
+        self.assertEqual(self.job.shorts_completed, 2)
+
+    @override_settings(SUPABASE_URL="http://127.0.0.1:9", SUPABASE_KEY="header.payload.signature")
+    def test_completed_job_queues_its_shorts_for_supabase(self):
+        from shorts_api.models import SupabaseOutbox
+
+        self.run_job()
+
+        self.assertEqual(sorted(row.payload["short_url"] for row in SupabaseOutbox.objects.all()),
+                         ["https://cdn/final_0.mp4", "https://cdn/final_1.mp4"])
+
+    def test_ingest_failure_is_recorded_against_its_stage(self):
+        from shorts_api.ingest import IngestError
+
+        self.attach.side_effect = IngestError("No transcriptions found", "transcript")
+        self.run_job()
+
+        self.assertEqual(self.job.status, "FAILED")
+        self.assertEqual(self.job.stages.get(name="transcript").error_message, "No transcriptions found")
+
+    def test_retry_endpoint_restarts_the_job_unless_it_is_running(self):
+        from shorts_api import views
+
+        self.job.status = "FAILED"
+        self.job.save()
+        with mock.patch.object(views, "start_processing_video") as start:
+            response = self.client.post(f"/api/shorts/retry/{self.job.id}/")
+            self.assertEqual(response.status_code, 202)
+            start.assert_called_once_with(self.job.id)
+            self.job.refresh_from_db()
+            self.assertEqual(self.job.status, "PENDING")
+
+            with mock.patch.object(views, "is_job_running", return_value=True):
+                self.assertEqual(self.client.post(f"/api/shorts/retry/{self.job.id}/").status_code, 409)
+            self.assertEqual(self.client.post("/api/shorts/retry/999/").status_code, 404)
+
+
+@override_settings(PROGRESS_DB_INTERVAL=60, PROGRESS_KEEPALIVE=5)
+@skipUnless(HAS_FFMPEG, "ffmpeg is required to decode audio and fetch video ranges")
+class AudioFirstIngestTests(TransactionTestCase):
+    """The whole shorts job, with only YouTube, whisper, the LLM and Cloudinary faked"""
+
+    SEGMENTS = [{"text": " Hello there.", "start": 0.0, "end": 1.0, "words": []}]
+
+    def setUp(self):
+        from Components import YoutubeDownloader
+        from shorts_api import ingest, tasks, transcripts
+
+        self.tasks = tasks
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        # Finished shorts are promoted to media/ in the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        overrides = override_settings(
+            SHORTS_INGEST_MODE="audio_first",
+            SOURCE_CACHE_DIR=os.path.join(self.tmp, "sources"),
+            JOB_WORKSPACE_ROOT=os.path.join(self.tmp, "workspaces"),
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        served = os.path.join(self.tmp, "served")
+        os.makedirs(served)
+        make_video(os.path.join(served, "source.mp4"), seconds=12,
+                   extra_args=("-c:v", "libx264", "-g", "30", "-movflags", "+faststart"))
+        RangeFileHandler.root = served
+        RangeFileHandler.ranges = []
+        server = StubServer(RangeFileHandler).__enter__()
+        self.addCleanup(server.__exit__, None, None, None)
+
+        self.audio_downloads = []
+
+        def download_audio(output_path, filename_prefix):
+            # Every video has the same title, like two uploads of one clip would
+            path = make_tone(os.path.join(output_path, f"{filename_prefix}Same Title.m4a"), seconds=12,
+                             extra_args=("-c:a", "aac"))
+            self.audio_downloads.append(path)
+            return path
+
+        video = fake_stream("1080p", "mp4", progressive=True, url=f"{server.url}/source.mp4")
+        audio = fake_stream(subtype="mp4", abr="128kbps", url=f"{server.url}/source.mp4", download=download_audio)
+        self.fetched = []
+
+        def render_in_pool(kwargs):
+            # The highlight's video is fetched from the stream, not a local download
+            clip, offset = YoutubeDownloader.download_video_range(
+                kwargs["source"]["video_url"], os.path.join(kwargs["workdir"], "range.mp4"),
+                kwargs["start"], kwargs["stop"], audio_url=kwargs["source"]["audio_url"])
+            self.fetched.append((kwargs["index"], offset))
+            final_path = os.path.join(kwargs["workdir"], f"final_{kwargs['job_id']}_{kwargs['index']}.mp4")
+            shutil.copy(clip, final_path)
+            return final_path
+
+        def upload_short(file_path, public_id_prefix):
+            return {"url": f"https://cdn/{os.path.basename(file_path)}", "public_id": public_id_prefix}
+
+        patchers = [
+            mock.patch.object(YoutubeDownloader, "YouTube", fake_youtube([video], [audio])),
+            mock.patch.object(transcripts, "transcribeSegments", return_value=self.SEGMENTS),
+            mock.patch.object(ingest, "GetHighlight",
+                              side_effect=lambda text: (2.0, 4.0) if "highlight 1," in text else (6.0, 8.0)),
+            mock.patch.object(tasks, "render_in_pool", side_effect=render_in_pool),
+            mock.patch.object(tasks, "upload_short", side_effect=upload_short),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_job(self, url="https://youtu.be/abc123"):
+        from shorts_api.models import VideoProcessing
+
+        job = VideoProcessing.objects.create(youtube_url=url, username="sam", num_shorts=2, add_captions=False)
+        self.tasks.process_video_task(job.id)
+        job.refresh_from_db()
+        return job
+
+    def test_audio_is_cached_per_video_and_released_when_the_job_ends(self):
+        from shorts_api.models import SourceMedia
+
+        job = self.run_job()
+
+        self.assertEqual(job.status, "COMPLETED")
+        self.assertEqual(job.shorts_completed, 2)
+        self.assertEqual(sorted(self.fetched), [(0, 0.0), (1, 4.0)])
+        media = SourceMedia.objects.get()
+        self.assertEqual((media.source_key, media.ref_count), ("youtube-audio:abc123", 0))
+        self.assertEqual(os.path.dirname(media.file_path), os.path.join(self.tmp, "sources"))
+        self.assertEqual(job.original_video_path, media.file_path)
+        # Nothing named after the title is left behind
+        self.assertEqual(os.listdir(os.path.join(self.tmp, "sources")), [os.path.basename(media.file_path)])
+        self.assertFalse([name for name in os.listdir("videos") if name.startswith("audio_")])
+
+        # Another job for the video reuses the audio but still looks up fresh stream URLs
+        self.fetched = []
+        again = self.run_job("https://www.youtube.com/watch?v=abc123")
+        self.assertEqual(again.status, "COMPLETED")
+        self.assertEqual(len(self.audio_downloads), 1)
+        self.assertEqual(len(self.fetched), 2)
+
+        # A different video with the same title gets its own file
+        self.run_job("https://youtu.be/def456")
+        self.assertEqual(len(self.audio_downloads), 2)
+        self.assertEqual(SourceMedia.objects.count(), 2)
+        self.assertEqual(set(SourceMedia.objects.values_list("ref_count", flat=True)), {0})
+
+
+class ProgressTests(TestCase):
+    def setUp(self):
+        from shorts_api import progress, views
+        from shorts_api.models import VideoProcessing
+
+        # Job ids get reused between tests, so each test gets its own broker
+        self.broker = progress.ProgressBroker()
+        for module in (progress, views):
+            patcher = mock.patch.object(module, "broker", self.broker)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.job = VideoProcessing.objects.create(youtube_url="https://youtu.be/abc123", username="sam",
+                                                  num_shorts=1, status="PROCESSING")
+        self.key = ("shorts", self.job.id)
+
+    def saved_percent(self):
+        return type(self.job).objects.get(id=self.job.id).progress_percent
+
+    def test_reporter_publishes_every_change_but_throttles_row_writes(self):
+        from shorts_api.progress import ProgressReporter
+
+        reporter = ProgressReporter(self.job)
+        reporter.expect(["ingest", "render_0", "upload_0"])
+        reporter.stage_started("render_0")
+        reporter.stage_finished("ingest")
+
+        self.assertEqual(self.broker.latest(self.key)["percent"], 30.0)
+        self.assertEqual(self.broker.latest(self.key)["stage"], "render")
+        self.assertEqual(self.saved_percent(), 0)
+
+        self.job.status = "COMPLETED"
+        reporter.finish()
+        self.assertEqual(self.saved_percent(), 100)
+        self.assertEqual(self.broker.latest(self.key)["version"], 4)
+
+    def test_writers_only_touch_their_own_columns(self):
+        from shorts_api.jobstate import update_job
+        from shorts_api.progress import ProgressReporter
+
+        stale = type(self.job).objects.get(id=self.job.id)
+        reporter = ProgressReporter(self.job)
+        reporter.expect(["ingest"])
+        reporter.stage_finished("ingest")
+        update_job(stale, original_video_path="videos/source.mp4")
+
+        self.job.status = "COMPLETED"
+        # Final status, error and progress go out as a single UPDATE
+        with self.assertNumQueries(1):
+            reporter.finish()
+        saved = type(self.job).objects.get(id=self.job.id)
+        self.assertEqual((saved.status, saved.progress_percent, saved.original_video_path),
+                         ("COMPLETED", 100, "videos/source.mp4"))
+
+    async def test_event_stream_follows_the_job_until_it_ends(self):
+        from shorts_api.progress import snapshot_from_job
+
+        response = await self.async_client.get(f"/api/shorts/events/{self.job.id}/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        self.assertIn('"status": "PROCESSING"', (await anext(events)).decode())
+
+        snapshot = snapshot_from_job(self.job)
+        # Jobs publish from their own threads
+        for version, status in ((1, "PROCESSING"), (2, "COMPLETED")):
+            thread = threading.Thread(target=self.broker.publish,
+                                      args=(self.key, {**snapshot, "status": status, "version": version}))
+            thread.start()
+            thread.join()
+
+        rest = [event.decode() async for event in events]
+        self.assertEqual(len(rest), 2)
+        self.assertTrue(rest[1].startswith("id: 2\n"))
+        self.assertIn('"status": "COMPLETED"', rest[1])
+        self.assertEqual(self.broker._subscribers, {})
+
+    @override_settings(PROGRESS_KEEPALIVE=0.05)
+    async def test_event_stream_of_a_job_running_elsewhere_ends_from_its_row(self):
+        from asgiref.sync import sync_to_async
+        from shorts_api.jobstate import update_job
+
+        response = await self.async_client.get(f"/api/shorts/events/{self.job.id}/")
+        events = aiter(response.streaming_content)
+        self.assertIn('"status": "PROCESSING"', (await anext(events)).decode())
+        self.assertEqual(await anext(events), b": keepalive\n\n")
+
+        # Another process finishes the job; nothing reaches this broker
+        await sync_to_async(update_job)(self.job, status="FAILED", error_message="boom")
+        rest = [event.decode() async for event in events]
+        self.assertIn('"status": "FAILED"', rest[-1])
+
+    async def test_event_stream_of_an_unknown_job_is_404(self):
+        response = await self.async_client.get("/api/dubbing/events/999/")
+        self.assertEqual(response.status_code, 404)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        from shorts_api.models import VideoProcessing
+
+        self.job = VideoProcessing.objects.create(youtube_url="https://youtu.be/abc123", username="sam")
+
+    def test_unchanged_status_is_304_from_one_query(self):
+        from shorts_api.checkpoints import complete_stage
+
+        url = f"/api/shorts/status/{self.job.id}/"
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+        self.assertIn("no-cache", response["Cache-Control"])
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        # Whole-second If-Modified-Since would miss changes within a second
+        self.assertFalse(response.has_header("Last-Modified"))
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE="Sun, 01 Jan 2090 00:00:00 GMT").status_code, 200)
+
+        # A stage row changing is a change of the status too
+        complete_stage(self.job, "highlight", {"start": 1, "end": 2})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["stages"][0]["name"], "highlight")
+
+    def test_user_list_changes_with_new_and_updated_jobs(self):
+        from shorts_api.models import LanguageDubbing, VideoProcessing
+
+        url = "/api/shorts/user/sam/"
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        VideoProcessing.objects.create(youtube_url="https://youtu.be/def456", username="sam")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 2)
+
+        etag = self.client.get("/api/dubbing/user/sam/")["ETag"]
+        self.assertEqual(self.client.get("/api/dubbing/user/sam/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        LanguageDubbing.objects.create(video_url="https://youtu.be/abc123", username="sam")
+        self.assertEqual(self.client.get("/api/dubbing/user/sam/", HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_user_history_is_paged_newest_first_with_lean_rows(self):
+        from shorts_api.models import VideoProcessing
+
+        for i in range(4):
+            VideoProcessing.objects.create(youtube_url=f"https://youtu.be/v{i}", username="sam")
+        VideoProcessing.objects.create(youtube_url="https://youtu.be/other", username="alex")
+
+        page = self.client.get("/api/shorts/user/sam/", {"page_size": 3}).json()
+        self.assertEqual([row["youtube_url"] for row in page["results"]],
+                         ["https://youtu.be/v3", "https://youtu.be/v2", "https://youtu.be/v1"])
+        self.assertNotIn("stages", page["results"][0])
+        self.assertEqual(page["results"][0]["cloudinary_urls"], [])
+
+        rest = self.client.get(page["next"]).json()
+        self.assertEqual([row["youtube_url"] for row in rest["results"]],
+                         ["https://youtu.be/v0", "https://youtu.be/abc123"])
+        self.assertIsNone(rest["next"])
+
+    def test_unknown_job_is_404_without_etag(self):
+        response = self.client.get("/api/dubbing/status/999/")
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header("ETag"))
+
+
+class ShortOutputMigrationTests(TransactionTestCase):
+    def migrate(self, target=None):
+        from django.db import connection
+        from django.db.migrations.executor import MigrationExecutor
+
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        # No target: back to the latest migration, for the tests that follow
+        targets = [("shorts_api", target)] if target else executor.loader.graph.leaf_nodes()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def test_url_json_moves_to_output_rows_and_back(self):
+        self.addCleanup(self.migrate)
+        apps = self.migrate("0012_user_history_indexes")
+        VideoProcessing = apps.get_model("shorts_api", "VideoProcessing")
+        urls = [{"url": "https://cdn/a.mp4", "public_id": "a"}, {"url": "https://cdn/b.mp4", "public_id": "b"}]
+        job = VideoProcessing.objects.create(youtube_url="https://youtu.be/abc123", cloudinary_urls_json=json.dumps(urls))
+        VideoProcessing.objects.create(youtube_url="https://youtu.be/def456")
+
+        apps = self.migrate("0014_remove_videoprocessing_cloudinary_urls_json")
+        VideoProcessing = apps.get_model("shorts_api", "VideoProcessing")
+        migrated = VideoProcessing.objects.get(id=job.id)
+        self.assertEqual([(output.index, output.url, output.public_id) for output in migrated.outputs.order_by("index")],
+                         [(0, "https://cdn/a.mp4", "a"), (1, "https://cdn/b.mp4", "b")])
+        self.assertEqual(migrated.shorts_completed, 2)
+
+        apps = self.migrate("0012_user_history_indexes")
+        VideoProcessing = apps.get_model("shorts_api", "VideoProcessing")
+        self.assertEqual(json.loads(VideoProcessing.objects.get(id=job.id).cloudinary_urls_json), urls)
+
+
+SUPABASE_TEST_KEY = "header.payload.signature"
+
+
+class SupabaseSyncTests(TestCase):
+    def setUp(self):
+        from shorts_api.models import VideoProcessing
+
+        FakePostgRESTHandler.inserts = []
+        FakePostgRESTHandler.failures = 0
+        self.server = StubServer(FakePostgRESTHandler)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__)
+        overrides = override_settings(SUPABASE_URL=self.server.url, SUPABASE_KEY=SUPABASE_TEST_KEY,
+                                      SUPABASE_SYNC_BATCH_SIZE=2, SUPABASE_SYNC_MAX_ATTEMPTS=2)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+        self.job = VideoProcessing.objects.create(youtube_url="https://youtu.be/abc123", username="sam", num_shorts=3)
+        for i in range(3):
+            self.job.add_output(i, f"https://cdn/final_{i}.mp4", f"user_sam_{i}")
+
+    def enqueue(self):
+        from django.db import transaction
+        from shorts_api import supabase_sync
+
+        with mock.patch.object(supabase_sync, "wake_sync_worker") as wake:
+            with self.captureOnCommitCallbacks(execute=True):
+                with transaction.atomic():
+                    supabase_sync.enqueue_shorts(self.job)
+        return wake
+
+    def test_rows_are_queued_once_and_sent_in_batches(self):
+        from shorts_api.models import SupabaseOutbox
+        from shorts_api.supabase_sync import SupabaseSyncWorker
+
+        wake = self.enqueue()
+        wake.assert_called_once()
+        self.enqueue()
+        self.assertEqual(SupabaseOutbox.objects.count(), 3)
+
+        worker = SupabaseSyncWorker()
+        self.assertEqual(worker.flush(), 2)
+        self.assertEqual(worker.flush(), 1)
+        self.assertEqual(worker.flush(), 0)
+
+        self.assertEqual([len(insert["rows"]) for insert in FakePostgRESTHandler.inserts], [2, 1])
+        self.assertEqual(FakePostgRESTHandler.inserts[0]["path"], "/rest/v1/shorts")
+        self.assertEqual(FakePostgRESTHandler.inserts[0]["apikey"], SUPABASE_TEST_KEY)
+        self.assertEqual(FakePostgRESTHandler.inserts[0]["rows"][0]["short_url"], "https://cdn/final_0.mp4")
+        self.assertEqual(set(SupabaseOutbox.objects.values_list("status", flat=True)), {"SENT"})
+
+    def test_failed_batches_back_off_then_give_up(self):
+        from django.utils import timezone
+        from shorts_api.models import SupabaseOutbox
+        from shorts_api.supabase_sync import SupabaseSyncWorker
+
+        self.enqueue()
+        FakePostgRESTHandler.failures = 1
+        worker = SupabaseSyncWorker()
+
+        self.assertEqual(worker.flush(), 2)
+        row = SupabaseOutbox.objects.first()
+        self.assertEqual((row.status, row.attempts), ("PENDING", 1))
+        self.assertGreater(row.next_attempt_at, timezone.now())
+        self.assertIn("Service unavailable", row.last_error)
+        # The failed rows wait out their backoff; the third is due
+        self.assertEqual(worker.flush(), 1)
+
+        FakePostgRESTHandler.failures = 1
+        SupabaseOutbox.objects.filter(status="PENDING").update(next_attempt_at=timezone.now())
+        self.assertEqual(worker.flush(), 2)
+        self.assertEqual(SupabaseOutbox.objects.filter(status="FAILED").count(), 2)
+        self.assertEqual(SupabaseOutbox.objects.filter(status="SENT").count(), 1)
+        self.assertEqual(worker.flush(), 0)
+
+    def test_a_refused_row_only_holds_back_itself(self):
+        from shorts_api.models import SupabaseOutbox
+        from shorts_api.supabase_sync import SupabaseSyncWorker
+
+        for i, url in enumerate(["https://cdn/a.mp4", "bad", "https://cdn/b.mp4", "https://cdn/c.mp4"]):
+            SupabaseOutbox.objects.create(table="shorts", dedupe_key=f"row:{i}",
+                                          payload_json=json.dumps({"short_url": url}))
+        with override_settings(SUPABASE_SYNC_BATCH_SIZE=4):
+            self.assertEqual(SupabaseSyncWorker().flush(), 4)
+
+        sent = [row["short_url"] for insert in FakePostgRESTHandler.inserts for row in insert["rows"]]
+        self.assertEqual(sorted(sent), ["https://cdn/a.mp4", "https://cdn/b.mp4", "https://cdn/c.mp4"])
+        bad = SupabaseOutbox.objects.get(dedupe_key="row:1")
+        self.assertEqual((bad.status, bad.attempts), ("PENDING", 1))
+        self.assertIn("22P02", bad.last_error)
+        self.assertEqual(SupabaseOutbox.objects.filter(status="SENT").count(), 3)
+
+    def test_claimed_rows_are_left_to_their_worker_until_the_lease_runs_out(self):
+        from django.utils import timezone
+        from shorts_api.models import SupabaseOutbox
+        from shorts_api.supabase_sync import SupabaseSyncWorker
+
+        self.enqueue()
+        first, second = SupabaseSyncWorker(), SupabaseSyncWorker()
+        claimed = first._claim()
+        self.assertEqual(len(claimed), 2)
+        # The other process only gets the row first did not claim
+        self.assertEqual([row.dedupe_key for row in second._claim()], [f"short:{self.job.outputs.last().id}"])
+        self.assertEqual(second.flush(), 0)
+
+        # first died: once its lease runs out, the rows are due again
+        SupabaseOutbox.objects.filter(status="SENDING").update(next_attempt_at=timezone.now())
+        self.assertEqual(second.flush(), 2)
+        # If first was only stalled, its late outcome leaves second's rows alone
+        first._retry_later(claimed, Exception("timed out"))
+        self.assertEqual(SupabaseOutbox.objects.get(id=claimed[0].id).attempts, 0)
+        self.assertEqual(len(FakePostgRESTHandler.inserts), 1)
+        self.assertEqual(SupabaseOutbox.objects.filter(status="SENT").count(), 2)
+
+    def test_sync_is_off_without_supabase_settings(self):
+        from shorts_api.models import SupabaseOutbox
+
+        with override_settings(SUPABASE_URL=""):
+            self.enqueue().assert_not_called()
+        self.assertFalse(SupabaseOutbox.objects.exists())
+
+    def test_rows_left_queued_are_sent_without_a_new_job(self):
+        from io import StringIO
+        from django.core.management import call_command
+        from shorts_api import supabase_sync
+        from shorts_api.models import SupabaseOutbox
+
+        self.enqueue()
+        # As after a restart: the rows are queued but no job wakes the worker
+        with mock.patch.object(supabase_sync, "get_sync_worker") as get_worker:
+            supabase_sync.start_sync_worker()
+            get_worker.assert_called_once()
+            with override_settings(SUPABASE_KEY=""):
+                supabase_sync.start_sync_worker()
+            get_worker.assert_called_once()
+
+        out = StringIO()
+        call_command("sync_supabase", "--once", stdout=out)
+        self.assertIn("Processed 3 queued rows", out.getvalue())
+        self.assertEqual(set(SupabaseOutbox.objects.values_list("status", flat=True)), {"SENT"})
+
+
+class SupabaseSyncWorkerThreadTests(TransactionTestCase):
+    def test_worker_sends_rows_when_woken(self):
+        from shorts_api.models import SupabaseOutbox
+        from shorts_api.supabase_sync import SupabaseSyncWorker
+
+        FakePostgRESTHandler.inserts = []
+        FakePostgRESTHandler.failures = 0
+        with StubServer(FakePostgRESTHandler) as server, \
+                override_settings(SUPABASE_URL=server.url, SUPABASE_KEY=SUPABASE_TEST_KEY, SUPABASE_SYNC_POLL=30):
+            worker = SupabaseSyncWorker()
+            worker.start()
+            self.addCleanup(worker.stop, 5)
+            for i in range(2):
+                SupabaseOutbox.objects.create(table="shorts", dedupe_key=f"short:{i}",
+                                              payload_json=json.dumps({"short_url": f"https://cdn/{i}.mp4"}))
+                worker.wake()
+                deadline = time.monotonic() + 5
+                while SupabaseOutbox.objects.filter(status="SENT").count() <= i and time.monotonic() < deadline:
+                    time.sleep(0.02)
+
+            self.assertEqual(SupabaseOutbox.objects.filter(status="SENT").count(), 2)
+            client = worker.client
+            worker.stop(5)
+        # Both sends went through the one client
+        self.assertIs(worker.client, client)
+        self.assertEqual(len(FakePostgRESTHandler.inserts), 2)
+
+
+@override_settings(DUBBING_TRANSLATE_CHUNK=2)
+class DubbingPipelineTests(TestCase):
+    def setUp(self):
+        from shorts_api import tasks
+        from shorts_api.models import LanguageDubbing, Transcript
+
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmp, True)
+        # The job writes its media/ files relative to the working directory
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(self.tmp)
+        self.tasks = tasks
+
+        transcript = Transcript(audio_hash="b" * 64, model_name="base.en", language="en", params_hash="p")
+        transcript.segments = [{"text": f"line {i}", "start": i, "end": i + 1} for i in range(5)]
+        transcript.save()
+        ingest = mock.Mock(vid="source.mp4", source=None, transcript=transcript)
+        ingest.checkpoint.side_effect = lambda job: None
+        self.job = LanguageDubbing.objects.create(video_url="https://youtu.be/abc123", username="sam",
+                                                  target_language="Hindi", add_captions=False)
+
+        self.translated = []
+        self.synthesized = []
+        self.fail_translate = set()
+
+        def translate(rows, source_language, target_language):
+            self.translated.append(rows[0][0])
+            if rows[0][0] in self.fail_translate:
+                return []
+            return [[text.upper(), start, end] for text, start, end in rows]
+
+        def synthesize(translated, output_dir, voice):
+            self.synthesized.extend(text for text, _, _ in translated)
+            paths = []
+            for text, start, end in translated:
+                path = os.path.join(output_dir, f"{text}.mp3")
+                open(path, "w").close()
+                paths.append((path, start, end))
+            return paths
+
+        def merge(video, audio, output):
+            open(output, "w").close()
+            return True
+
+        def mix(segments, output):
+            # Segments of earlier runs have to still be there
+            self.assertTrue(all(os.path.exists(path) for path, _, _ in segments))
+            open(output, "w").close()
+            return output
+
+        self.mix = mock.Mock(side_effect=mix)
+        patchers = [
+            mock.patch.object(tasks, "attach_ingest", return_value=ingest),
+            mock.patch.object(tasks, "detach_ingest"),
+            mock.patch.object(tasks, "translate_transcript_with_timestamps", side_effect=translate),
+            mock.patch.object(tasks, "synthesize_segments", side_effect=synthesize),
+            mock.patch.object(tasks, "mix_segments", self.mix),
+            mock.patch.object(tasks, "merge_audio_with_video", side_effect=merge),
+            mock.patch.object(tasks, "upload_to_cloudinary",
+                              return_value={"url": "https://cdn/dubbed.mp4", "public_id": "dubbed"}),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_translation_chunks_resume_and_speech_stays_in_order(self):
+        self.fail_translate = {"line 2"}
+        self.tasks.process_dubbing_task(self.job.id)
+        self.job.refresh_from_db()
+
+        self.assertEqual(self.job.status, "FAILED")
+        self.assertEqual(self.job.error_message, "Failed to translate transcript")
+        self.assertEqual(sorted(self.translated), ["line 0", "line 2", "line 4"])
+        self.mix.assert_not_called()
+
+        self.fail_translate = set()
+        self.translated = []
+        self.synthesized = []
+        self.tasks.process_dubbing_task(self.job.id)
+        self.job.refresh_from_db()
+
+        self.assertEqual(self.job.status, "COMPLETED")
+        # Only the chunk that failed is translated again, and only its speech generated
+        self.assertEqual(self.translated, ["line 2"])
+        self.assertEqual(self.synthesized, ["LINE 2", "LINE 3"])
+        self.assertFalse(os.path.exists(self.tasks.dubbing_parts_dir(self.job.id)))
+        segments = self.mix.call_args[0][0]
+        self.assertEqual([os.path.basename(path) for path, _, _ in segments],
+                         [f"LINE {i}.mp3" for i in range(5)])
+        self.assertEqual(self.job.cloudinary_url, "https://cdn/dubbed.mp4")
+
+
+class BenchmarkCompareTests(SimpleTestCase):
+    def results(self, **medians):
+        return {"results": [
+            {"name": name, "size": "small", "status": "ok", "median": median}
+            for name, median in medians.items()
+        ] + [{"name": "skipped", "size": "small", "status": "skipped", "reason": "not installed"}]}
+
+    def test_only_slowdowns_over_the_threshold_are_regressions(self):
+        from benchmarks.runner import compare
+
+        rows = compare(self.results(crop=1.0, parse=1.0, captions=2.0),
+                       self.results(crop=1.1, parse=1.5, new=9.0), threshold=0.2)
+
+        self.assertEqual([(row["name"], row["regressed"]) for row in rows], [("crop", False), ("parse", True)])
+        self.assertAlmostEqual(rows[1]["change"], 0.5)
+
+
+class FakeInstagramClient:
+    """Stands in for instagrapi's Client: counts full logins, keeps settings"""
+
+    logins = 0
+
+    def __init__(self):
+        self.settings = {}
+
+    def set_settings(self, settings):
+        self.settings = settings
+
+    def get_settings(self):
+        return self.settings
+
+    def login(self, username, password):
+        if password != "right":
+            raise Exception("The password you entered is incorrect")
+        if "authorization_data" not in self.settings:
+            FakeInstagramClient.logins += 1
+            self.settings = {"authorization_data": {"sessionid": f"session-of-{username}"}}
+        return True
+
+
+@override_settings(PASSWORD_HASHERS=["django.contrib.auth.hashers.MD5PasswordHasher"])
+class InstagramSessionTests(TestCase):
+    def setUp(self):
+        FakeInstagramClient.logins = 0
+
+    def pool(self):
+        from shorts_api.instagram import InstagramSessionPool
+
+        return InstagramSessionPool(client_factory=FakeInstagramClient)
+
+    def test_session_is_saved_encrypted_and_reused(self):
+        from shorts_api.instagram import decrypt_settings
+        from shorts_api.models import InstagramSession
+
+        pool = self.pool()
+        with pool.session("sam", "right") as client:
+            first = client
+        with pool.session("sam", "right") as client:
+            self.assertIs(client, first)
+        self.assertEqual(FakeInstagramClient.logins, 1)
+
+        saved = InstagramSession.objects.get(username="sam")
+        self.assertNotIn("session-of-sam", saved.settings_encrypted)
+        self.assertNotIn("right", saved.password_hash)
+        self.assertEqual(decrypt_settings(saved.settings_encrypted)["authorization_data"]["sessionid"],
+                         "session-of-sam")
+
+        # A new process picks the saved session up instead of logging in
+        with self.pool().session("sam", "right") as client:
+            self.assertIsNot(client, first)
+        self.assertEqual(FakeInstagramClient.logins, 1)
+
+    def test_saved_session_needs_the_password(self):
+        from shorts_api.instagram import InstagramLoginError
+
+        pool = self.pool()
+        with pool.session("sam", "right"):
+            pass
+        for other_pool in (pool, self.pool()):
+            with self.assertRaises(InstagramLoginError):
+                with other_pool.session("sam", "wrong"):
+                    self.fail("a session was lent without the password")
+
+    def test_failed_use_drops_the_client(self):
+        pool = self.pool()
+        with self.assertRaises(RuntimeError):
+            with pool.session("sam", "right") as client:
+                failed = client
+                raise RuntimeError("challenge required")
+        with pool.session("sam", "right") as client:
+            self.assertIsNot(client, failed)
+        # The fresh client still reused the saved session
+        self.assertEqual(FakeInstagramClient.logins, 1)
+
+    def test_upload_endpoint_queues_and_reports_status(self):
+        from shorts_api.instagram import run_instagram_upload
+
+        with mock.patch("shorts_api.views.start_instagram_upload") as start:
+            response = self.client.post("/api/instagram/upload/", {
+                "video_path": "https://res.cloudinary.com/demo/short.mp4",
+                "username": "sam",
+                "password": "right",
+                "caption": "hi",
+            }, content_type="application/json")
+        self.assertEqual(response.status_code, 202)
+        body = response.json()
+        self.assertEqual(body["upload"]["status"], "PENDING")
+        self.assertNotIn("password", json.dumps(body))
+        upload, password = start.call_args.args
+        self.assertEqual(password, "right")
+
+        with mock.patch("shorts_api.instagram.InstagramUploader.upload_reel", return_value={"code": "C0de"}) as upload_reel:
+            run_instagram_upload(upload.id, password, session_pool=self.pool())
+        upload_reel.assert_called_once_with("https://res.cloudinary.com/demo/short.mp4", "hi")
+
+        status = self.client.get(body["status_url"]).json()
+        self.assertEqual((status["status"], status["media_code"]), ("COMPLETED", "C0de"))
+
+        self.assertEqual(self.client.post("/api/instagram/upload/", {"username": "sam"},
+                                          content_type="application/json").status_code, 400)
+
+    def test_failed_login_fails_the_upload(self):
+        from shorts_api.instagram import run_instagram_upload
+        from shorts_api.models import InstagramUpload
+
+        upload = InstagramUpload.objects.create(username="sam", video_url="https://res.cloudinary.com/demo/short.mp4")
+        run_instagram_upload(upload.id, "wrong", session_pool=self.pool())
+        upload.refresh_from_db()
+        self.assertEqual((upload.status, upload.error_message), ("FAILED", "Instagram login failed"))
@@ -0,0 +1,63 @@
+import json
+import hashlib
+import logging
+from django.db import IntegrityError
+from .models import Transcript
+from Components.Transcription import transcribeSegments, WHISPER_MODEL, WHISPER_LANGUAGE, TRANSCRIBE_OPTIONS
+
+logger = logging.getLogger(__name__)
+
+def params_hash(options=None):
+    """Stable hash of the decode settings that affect a transcript"""
+    options = TRANSCRIBE_OPTIONS if options is None else options
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode('utf-8')).hexdigest()
+
+def _compact(segments):
+    """Round timings to milliseconds so stored transcripts stay small"""
+    return [{
+        'text': segment['text'],
+        'start': round(segment['start'], 3),
+        'end': round(segment['end'], 3),
+        'words': [
+            {'word': word['word'], 'start': round(word['start'], 3), 'end': round(word['end'], 3)}
+            for word in segment['words']
+        ],
+    } for segment in segments]
+
+def get_or_transcribe(audio):
+    """
+    Return the stored Transcript for this audio, running whisper only on a miss.
+
+    Args:
+        audio: The job's AudioArtifact
+
+    Returns:
+        A Transcript, or None if transcription produced no segments
+    """
+    key = {
+        'audio_hash': audio.content_hash,
+        'model_name': WHISPER_MODEL,
+        'language': WHISPER_LANGUAGE,
+        'params_hash': params_hash(),
+    }
+    transcript = Transcript.objects.filter(**key).first()
+    if transcript:
+        logger.info(f"Reusing stored transcript {transcript.id} for audio {audio.content_hash[:12]}")
+        return transcript
+
+    segments = transcribeSegments(audio.samples)
+    if not segments:
+        return None
+
+    transcript = Transcript(duration=audio.duration, **key)
+    transcript.segments = _compact(segments)
+    try:
+        transcript.save()
+    except IntegrityError:
+        # Another job stored the same transcript first
+        return Transcript.objects.get(**key)
+    return transcript
+
+def transcript_rows(transcript):
+    """The [text, start, end] rows the rest of the pipeline works with"""
+    return [[segment['text'], segment['start'], segment['end']] for segment in transcript.segments]
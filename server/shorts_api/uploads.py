@@ -0,0 +1,29 @@
+import threading
+from django.conf import settings
+from .utils import upload_to_cloudinary
+
+_slots = None
+_slots_lock = threading.Lock()
+
+def _upload_slots():
+    """Machine-wide upload slots, settings.UPLOAD_MAX_WORKERS of them"""
+    global _slots
+    with _slots_lock:
+        if _slots is None:
+            _slots = threading.BoundedSemaphore(settings.UPLOAD_MAX_WORKERS)
+        return _slots
+
+def upload_short(file_path, public_id_prefix):
+    """
+    Upload a finished short to Cloudinary on the calling thread, waiting
+    for a free upload slot first.
+
+    Upload stages of different shorts and jobs run concurrently; the slots
+    keep them from saturating the uplink. Rendering overlaps with uploads
+    because they are separate pipeline stages.
+
+    Returns:
+        The upload_to_cloudinary result, None if the upload failed
+    """
+    with _upload_slots():
+        return upload_to_cloudinary(file_path, public_id_prefix)
@@ -1,15 +1,22 @@
 from django.urls import path
-from .views import ShortsGeneratorView, VideoProcessingStatusView, UserVideosView, LanguageDubbingView, DubbingStatusView, UserDubbingsView
+from .views import ShortsGeneratorView, VideoProcessingStatusView, VideoProcessingRetryView, VideoTranscriptView, UserVideosView, LanguageDubbingView, DubbingStatusView, DubbingRetryView, DubbingTranscriptView, UserDubbingsView
 from . import views
 
 urlpatterns = [
     path('shorts/', ShortsGeneratorView.as_view(), name='generate-shorts'),
     path('shorts/status/<int:processing_id>/', VideoProcessingStatusView.as_view(), name='processing-status'),
+    path('shorts/retry/<int:processing_id>/', VideoProcessingRetryView.as_view(), name='processing-retry'),
+    path('shorts/transcript/<int:processing_id>/', VideoTranscriptView.as_view(), name='processing-transcript'),
     path('shorts/user/<str:username>/', UserVideosView.as_view(), name='user-videos'),
+    path('shorts/events/<int:processing_id>/', views.shorts_events, name='processing-events'),
     
     # Language dubbing endpoints
     path('dubbing/', LanguageDubbingView.as_view(), name='dub-video'),
     path('dubbing/status/<int:dubbing_id>/', DubbingStatusView.as_view(), name='dubbing-status'),
+    path('dubbing/retry/<int:dubbing_id>/', DubbingRetryView.as_view(), name='dubbing-retry'),
+    path('dubbing/transcript/<int:dubbing_id>/', DubbingTranscriptView.as_view(), name='dubbing-transcript'),
     path('dubbing/user/<str:username>/', UserDubbingsView.as_view(), name='user-dubbings'),
+    path('dubbing/events/<int:dubbing_id>/', views.dubbing_events, name='dubbing-events'),
     path('instagram/upload/', views.upload_to_instagram, name='instagram-upload'),
+    path('instagram/upload/status/<int:upload_id>/', views.InstagramUploadStatusView.as_view(), name='instagram-upload-status'),
 ] 
\ No newline at end of file
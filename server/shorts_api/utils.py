@@ -1,30 +1,140 @@
 import os
+import time
+import hashlib
+import threading
+import requests
+from urllib.parse import urlparse
 import cloudinary
+import cloudinary.exceptions
 import cloudinary.uploader
-from supabase import create_client
+import cloudinary.utils
 from django.conf import settings
+from .models import CloudinaryUpload
 import logging
 
 logger = logging.getLogger(__name__)
 
+_configured = False
+_configure_lock = threading.Lock()
+
+def configure_cloudinary(force=False):
+    """Configure the Cloudinary SDK from settings once per process"""
+    global _configured
+    with _configure_lock:
+        if _configured and not force:
+            return
+        options = dict(settings.CLOUDINARY, secure=True)
+        if settings.CLOUDINARY_UPLOAD_PREFIX:
+            options['upload_prefix'] = settings.CLOUDINARY_UPLOAD_PREFIX
+        cloudinary.config(**options)
+        _configured = True
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Chunk answers worth sending again: timeouts, Cloudinary's rate limits
+# (420, 429) and server errors. Any other 4xx fails the same way every time.
+RETRY_STATUSES = {408, 420, 429}
+
+class ChunkUploadError(cloudinary.exceptions.Error):
+    """Cloudinary answered a chunk with an error"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+    @property
+    def transient(self):
+        return self.status in RETRY_STATUSES or self.status >= 500
+
+def _post_chunk(chunk, http_headers, options):
+    """
+    Send one chunk, like cloudinary.uploader.upload_large_part, but raise
+    errors with their HTTP status, which the SDK's errors don't carry.
+
+    Raises:
+        ChunkUploadError: Cloudinary answered with an error
+        requests.RequestException: No answer came back
+    """
+    params = cloudinary.utils.sign_request(cloudinary.utils.build_upload_params(**options), options)
+    response = requests.post(
+        cloudinary.utils.cloudinary_api_url("upload", **options),
+        data=cloudinary.utils.bracketize_seq(params),
+        files={'file': chunk},
+        headers={"User-Agent": cloudinary.get_user_agent(), **http_headers},
+        timeout=cloudinary.config().timeout,
+    )
+    try:
+        result = response.json()
+    except ValueError:
+        result = {'error': {'message': response.text[:200]}}
+    if response.status_code >= 400 or 'error' in result:
+        message = result.get('error', {}).get('message', response.reason)
+        raise ChunkUploadError(f"HTTP {response.status_code}: {message}", response.status_code)
+    return result
+
+def _upload_chunk(chunk, http_headers, options):
+    """
+    Upload one chunk, retrying it (not the whole file) with exponential
+    backoff while the failure is transient
+    """
+    retries = settings.CLOUDINARY_CHUNK_RETRIES
+    for attempt in range(retries + 1):
+        try:
+            return _post_chunk(chunk, http_headers, options)
+        except (ChunkUploadError, requests.ConnectionError, requests.Timeout) as e:
+            permanent = isinstance(e, ChunkUploadError) and not e.transient
+            if permanent or attempt == retries:
+                raise
+            delay = settings.CLOUDINARY_RETRY_BACKOFF * (2 ** attempt)
+            logger.warning(f"Cloudinary chunk {http_headers['Content-Range']} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def upload_large_resumable(file_path, **options):
+    """
+    Chunked upload of file_path, like cloudinary.uploader.upload_large, but
+    a failed chunk is retried under the same upload ID instead of failing
+    the whole file.
+    """
+    upload_id = cloudinary.utils.random_public_id()
+    chunk_size = settings.CLOUDINARY_CHUNK_SIZE
+    file_size = os.path.getsize(file_path)
+    file_name = os.path.basename(file_path)
+    upload_result = None
+
+    with open(file_path, 'rb') as f:
+        offset = 0
+        chunk = f.read(chunk_size)
+        while chunk:
+            http_headers = {
+                "Content-Range": f"bytes {offset}-{offset + len(chunk) - 1}/{file_size}",
+                "X-Unique-Upload-Id": upload_id,
+            }
+            upload_result = _upload_chunk((file_name, chunk), http_headers, options)
+            # Later chunks must name the asset the first one created
+            options['public_id'] = upload_result.get('public_id')
+            offset += len(chunk)
+            chunk = f.read(chunk_size)
+
+    return upload_result
+
 def upload_to_cloudinary(file_path, public_id_prefix='shorts'):
     """
     Upload a video file to Cloudinary and return the URL
+
+    Files whose content was already uploaded under the same public_id are
+    not sent again.
+
+    Returns:
+        {'url', 'public_id'}, or None if the upload failed
     """
     print("Uploading images in cloudinary.")
     try:
-        # Get environment variables directly
-        cloud_name = os.getenv('CLOUDINARY_CLOUD_NAME')
-        api_key = os.getenv('CLOUDINARY_API_KEY')
-        api_secret = os.getenv('CLOUDINARY_API_SECRET')
-        
-        # Configure cloudinary with direct env vars
-        cloudinary.config(
-            cloud_name=cloud_name,
-            api_key=api_key,
-            api_secret=api_secret,
-            secure=True
-        )
+        configure_cloudinary()
         
         # Generate a unique public_id based on the filename
         filename = os.path.basename(file_path)
@@ -34,9 +144,18 @@ def upload_to_cloudinary(file_path, public_id_prefix='shorts'):
         if not os.path.exists(file_path):
             logger.error(f"File not found: {file_path}")
             return None
+
+        content_hash = file_sha256(file_path)
+        previous = CloudinaryUpload.objects.filter(public_id=public_id, content_hash=content_hash).first()
+        if previous:
+            print("Same content already uploaded, skipping.")
+            return {
+                'url': previous.url,
+                'public_id': previous.asset_public_id
+            }
             
         # Upload the file
-        upload_result = cloudinary.uploader.upload(
+        upload_result = upload_large_resumable(
             file_path,
             resource_type="video",
             public_id=public_id,
@@ -44,6 +163,15 @@ def upload_to_cloudinary(file_path, public_id_prefix='shorts'):
             folder="shorts"
         )
         print("Upload complete.")
+        CloudinaryUpload.objects.update_or_create(
+            public_id=public_id,
+            defaults={
+                'content_hash': content_hash,
+                'url': upload_result['secure_url'],
+                'asset_public_id': upload_result['public_id'],
+                'size_bytes': os.path.getsize(file_path),
+            }
+        )
         return {
             'url': upload_result['secure_url'],
             'public_id': upload_result['public_id']
@@ -53,44 +181,26 @@ def upload_to_cloudinary(file_path, public_id_prefix='shorts'):
         return None
 
 
-## For time being we are not using supabase.
-def update_supabase(username, youtube_url, cloudinary_urls):
+def is_cloudinary_url(url):
+    """
+    Check if a URL is a Cloudinary URL
+    """
+    parsed_url = urlparse(url)
+    return 'cloudinary.com' in parsed_url.netloc or 'res.cloudinary.com' in parsed_url.netloc
+
+def download_from_cloudinary(url, output_path):
     """
-    Update the Supabase database with the video information
-    
-    Args:
-        username: The username of the user
-        youtube_url: The YouTube URL of the original video
-        cloudinary_urls: A single URL string or a list of URL strings
+    Download a video file from Cloudinary
     """
     try:
-        # Get environment variables directly
-        supabase_url = os.getenv('SUPABASE_URL')
-        supabase_key = os.getenv('SUPABASE_KEY')
-        supabase_table = os.getenv('SUPABASE_TABLE', 'shorts')
+        response = requests.get(url, stream=True)
+        response.raise_for_status()
         
-        # Create Supabase client with direct env vars
-        supabase = create_client(supabase_url, supabase_key)
+        with open(output_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=8192):
+                f.write(chunk)
         
-        # Convert to list if it's a single URL
-        if isinstance(cloudinary_urls, str):
-            cloudinary_urls = [cloudinary_urls]
-            
-        # Insert records for each URL
-        data_to_insert = []
-        for url in cloudinary_urls:
-            data_to_insert.append({
-                "username": username,
-                "youtube_url": youtube_url,
-                "short_url": url,
-                "created_at": "now()"
-            })
-        
-        if data_to_insert:
-            response = supabase.table(supabase_table).insert(data_to_insert).execute()
-            if response.data:
-                return response.data
-        return None
+        return output_path
     except Exception as e:
-        logger.error(f"Supabase update error: {str(e)}")
-        return None 
\ No newline at end of file
+        print(f"Error downloading from Cloudinary: {e}")
+        return None
@@ -1,15 +1,79 @@
+import json
+import asyncio
+from functools import wraps
+from django.conf import settings
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.shortcuts import render
+from django.urls import reverse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import VideoProcessing, LanguageDubbing
-from .serializers import VideoProcessingSerializer, VideoRequestSerializer, LanguageDubbingSerializer, DubbingRequestSerializer
-from .tasks import start_processing_video, start_dubbing_process
-from Components.Instagram import InstagramUploader
+from .models import VideoProcessing, LanguageDubbing, InstagramUpload
+from .serializers import VideoProcessingSerializer, VideoRequestSerializer, LanguageDubbingSerializer, DubbingRequestSerializer, TranscriptSerializer
+from .serializers import VideoProcessingListSerializer, LanguageDubbingListSerializer, InstagramUploadSerializer
+from .pagination import UserJobsPagination
+from .jobstate import update_job
+from .tasks import start_processing_video, start_dubbing_process, is_job_running
+from .metrics import render_metrics, PROMETHEUS_CONTENT_TYPE
+from .progress import broker, snapshot_from_job, TERMINAL_STATUSES
+from .instagram import start_instagram_upload
 from rest_framework.decorators import api_view
 
 # Create your views here.
 
+def conditional_get(version):
+    """
+    Answer a GET with 304 Not Modified when the client's If-None-Match
+    still matches, without loading or serialising the records.
+
+    Only the ETag is validated: it carries updated_at to the microsecond,
+    while Last-Modified has whole seconds, so two changes within a second
+    would look unchanged to If-Modified-Since.
+
+    Args:
+        version: Called with the view's URL kwargs; returns the etag from a
+            cheap query, or None if there is nothing to version (the view
+            then answers, e.g. 404)
+    """
+    def decorator(get):
+        @wraps(get)
+        def wrapper(self, request, *args, **kwargs):
+            etag = version(**kwargs)
+            if etag is None:
+                return get(self, request, *args, **kwargs)
+            etag = quote_etag(etag)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = get(self, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response['ETag'] = etag
+                # Browsers revalidate every poll instead of reusing a stale copy
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+def job_version(model, id_kwarg):
+    """conditional_get version of one job, from its updated_at"""
+    def version(**kwargs):
+        job_id = kwargs[id_kwarg]
+        updated_at = model.objects.filter(id=job_id).values_list('updated_at', flat=True).first()
+        if updated_at is None:
+            return None
+        return f"{job_id}-{updated_at.timestamp():.6f}"
+    return version
+
+def user_jobs_version(model):
+    """conditional_get version of a user's jobs: how many there are and the latest change"""
+    def version(username):
+        jobs = model.objects.filter(username=username).aggregate(count=Count('id'), latest=Max('updated_at'))
+        latest = jobs['latest'].timestamp() if jobs['latest'] else 0
+        return f"{jobs['count']}-{latest:.6f}"
+    return version
+
 class ShortsGeneratorView(APIView):
     """
     API endpoint to generate short videos from YouTube URLs
@@ -53,9 +117,11 @@ class VideoProcessingStatusView(APIView):
     API endpoint to check the status of a video processing task
     """
     
+    @conditional_get(job_version(VideoProcessing, 'processing_id'))
     def get(self, request, processing_id, format=None):
         try:
-            video_processing = VideoProcessing.objects.get(id=processing_id)
+            video_processing = VideoProcessing.objects.prefetch_related('outputs', 'stages', 'stage_metrics').get(
+                id=processing_id)
             serializer = VideoProcessingSerializer(video_processing)
             return Response(serializer.data)
         except VideoProcessing.DoesNotExist:
@@ -64,15 +130,74 @@ class VideoProcessingStatusView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+class VideoProcessingRetryView(APIView):
+    """
+    API endpoint to retry a video processing task, resuming from its first
+    unfinished stage
+    """
+    
+    def post(self, request, processing_id, format=None):
+        try:
+            video_processing = VideoProcessing.objects.get(id=processing_id)
+        except VideoProcessing.DoesNotExist:
+            return Response(
+                {'error': 'Processing task not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if is_job_running('shorts', video_processing.id):
+            return Response(
+                {'error': 'Processing task is still running'}, 
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        update_job(video_processing, status='PENDING', error_message=None)
+        start_processing_video(video_processing.id)
+        
+        serializer = VideoProcessingSerializer(video_processing)
+        return Response(
+            {
+                'message': 'Video processing resumed',
+                'processing': serializer.data
+            }, 
+            status=status.HTTP_202_ACCEPTED
+        )
+
+class VideoTranscriptView(APIView):
+    """
+    API endpoint to get the stored transcript of a video processing task
+    """
+    
+    def get(self, request, processing_id, format=None):
+        try:
+            video_processing = VideoProcessing.objects.select_related('transcript').get(id=processing_id)
+        except VideoProcessing.DoesNotExist:
+            return Response(
+                {'error': 'Processing task not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if not video_processing.transcript:
+            return Response(
+                {'error': 'Transcript not available yet'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = TranscriptSerializer(video_processing.transcript)
+        return Response(serializer.data)
+
 class UserVideosView(APIView):
     """
-    API endpoint to get all videos for a specific user
+    API endpoint to get a user's videos, newest first, a page at a time
+    (?cursor=..., ?page_size=...)
     """
     
+    @conditional_get(user_jobs_version(VideoProcessing))
     def get(self, request, username, format=None):
-        videos = VideoProcessing.objects.filter(username=username)
-        serializer = VideoProcessingSerializer(videos, many=True)
-        return Response(serializer.data)
+        videos = VideoProcessing.objects.filter(username=username).only(
+            'id', 'username', 'youtube_url', 'status', 'error_message', 'cloudinary_url',
+            'num_shorts', 'created_at', 'updated_at').prefetch_related('outputs')
+        paginator = UserJobsPagination()
+        page = paginator.paginate_queryset(videos, request, view=self)
+        serializer = VideoProcessingListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 class LanguageDubbingView(APIView):
     """
@@ -121,6 +246,7 @@ class DubbingStatusView(APIView):
     API endpoint to check the status of a language dubbing task
     """
     
+    @conditional_get(job_version(LanguageDubbing, 'dubbing_id'))
     def get(self, request, dubbing_id, format=None):
         try:
             dubbing = LanguageDubbing.objects.get(id=dubbing_id)
@@ -132,18 +258,81 @@ class DubbingStatusView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
+class DubbingRetryView(APIView):
+    """
+    API endpoint to retry a language dubbing task, resuming from its first
+    unfinished stage
+    """
+    
+    def post(self, request, dubbing_id, format=None):
+        try:
+            dubbing = LanguageDubbing.objects.get(id=dubbing_id)
+        except LanguageDubbing.DoesNotExist:
+            return Response(
+                {'error': 'Dubbing task not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if is_job_running('dubbing', dubbing.id):
+            return Response(
+                {'error': 'Dubbing task is still running'}, 
+                status=status.HTTP_409_CONFLICT
+            )
+        
+        update_job(dubbing, status='PENDING', error_message=None)
+        start_dubbing_process(dubbing.id)
+        
+        serializer = LanguageDubbingSerializer(dubbing)
+        return Response(
+            {
+                'message': 'Language dubbing resumed',
+                'processing': serializer.data
+            }, 
+            status=status.HTTP_202_ACCEPTED
+        )
+
+class DubbingTranscriptView(APIView):
+    """
+    API endpoint to get the stored source transcript of a language dubbing task
+    """
+    
+    def get(self, request, dubbing_id, format=None):
+        try:
+            dubbing = LanguageDubbing.objects.select_related('transcript').get(id=dubbing_id)
+        except LanguageDubbing.DoesNotExist:
+            return Response(
+                {'error': 'Dubbing task not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        if not dubbing.transcript:
+            return Response(
+                {'error': 'Transcript not available yet'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        serializer = TranscriptSerializer(dubbing.transcript)
+        return Response(serializer.data)
+
 class UserDubbingsView(APIView):
     """
-    API endpoint to get all language dubbing tasks for a specific user
+    API endpoint to get a user's language dubbing tasks, newest first, a
+    page at a time (?cursor=..., ?page_size=...)
     """
     
+    @conditional_get(user_jobs_version(LanguageDubbing))
     def get(self, request, username, format=None):
-        dubbings = LanguageDubbing.objects.filter(username=username)
-        serializer = LanguageDubbingSerializer(dubbings, many=True)
-        return Response(serializer.data)
+        dubbings = LanguageDubbing.objects.filter(username=username).only(
+            'id', 'username', 'video_url', 'source_language', 'target_language', 'voice', 'status',
+            'error_message', 'cloudinary_url', 'cloudinary_urls_json', 'created_at', 'updated_at')
+        paginator = UserJobsPagination()
+        page = paginator.paginate_queryset(dubbings, request, view=self)
+        serializer = LanguageDubbingListSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 @api_view(['POST'])
 def upload_to_instagram(request):
+    """
+    Queue a reel upload to Instagram. The login and upload run in the
+    background, reusing the account's saved session; poll status_url
+    """
     try:
         video_url = request.data.get('video_path')  # This is now a Cloudinary URL
         caption = request.data.get('caption', '')
@@ -154,29 +343,107 @@ def upload_to_instagram(request):
             return Response({
                 'error': 'Missing required fields'
             }, status=status.HTTP_400_BAD_REQUEST)
-            
-        uploader = InstagramUploader()
         
-        # Login to Instagram
-        if not uploader.login(username, password):
-            return Response({
-                'error': 'Instagram login failed'
-            }, status=status.HTTP_401_UNAUTHORIZED)
-            
-        # Upload the reel (now handles Cloudinary URL internally)
-        result = uploader.upload_reel(video_url, caption)
+        upload = InstagramUpload.objects.create(
+            username=username,
+            video_url=video_url,
+            caption=caption,
+            status='PENDING'
+        )
+        start_instagram_upload(upload, password)
         
-        if result:
-            return Response({
-                'message': 'Reel uploaded successfully',
-                'data': "Video uploaded to Instagram successfully!"
-            }, status=status.HTTP_200_OK)
-        else:
-            return Response({
-                'error': 'Failed to upload reel'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({
+            'message': 'Reel upload started',
+            'upload': InstagramUploadSerializer(upload).data,
+            'status_url': request.build_absolute_uri(reverse('instagram-upload-status', args=[upload.id]))
+        }, status=status.HTTP_202_ACCEPTED)
             
     except Exception as e:
         return Response({
             'error': str(e)
-        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+class InstagramUploadStatusView(APIView):
+    """
+    API endpoint to check the status of an Instagram reel upload
+    """
+    
+    @conditional_get(job_version(InstagramUpload, 'upload_id'))
+    def get(self, request, upload_id, format=None):
+        try:
+            upload = InstagramUpload.objects.get(id=upload_id)
+            serializer = InstagramUploadSerializer(upload)
+            return Response(serializer.data)
+        except InstagramUpload.DoesNotExist:
+            return Response(
+                {'error': 'Instagram upload not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+def prometheus_metrics(request):
+    """
+    Stage timing and resource histograms in the Prometheus text format.
+
+    Counts cover the stages run by this process since it started.
+    """
+    return HttpResponse(render_metrics(), content_type=PROMETHEUS_CONTENT_TYPE)
+
+def _sse(snapshot):
+    return f"id: {snapshot['version']}\ndata: {json.dumps(snapshot)}\n\n"
+
+async def _progress_events(model, key, snapshot):
+    queue = broker.subscribe(key)
+    try:
+        # Whatever was published before we subscribed is in latest()
+        snapshot = broker.latest(key) or snapshot
+        while True:
+            yield _sse(snapshot)
+            if snapshot['status'] in TERMINAL_STATUSES:
+                return
+            try:
+                latest = await asyncio.wait_for(queue.get(), settings.PROGRESS_KEEPALIVE)
+                while latest is snapshot:
+                    latest = await asyncio.wait_for(queue.get(), settings.PROGRESS_KEEPALIVE)
+                snapshot = latest
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield ": keepalive\n\n"
+                latest = broker.latest(key)
+                if latest is None:
+                    # Not running here (another worker, a restart, or never
+                    # picked up): only the row can tell whether it ended
+                    job = await model.objects.filter(id=key[1]).afirst()
+                    if job is None:
+                        return
+                    latest = snapshot_from_job(job)
+                snapshot = latest
+    finally:
+        broker.unsubscribe(key, queue)
+
+async def _progress_response(model, kind, job_id, not_found):
+    snapshot = broker.latest((kind, job_id))
+    if snapshot is None:
+        job = await model.objects.filter(id=job_id).afirst()
+        if job is None:
+            return JsonResponse({'error': not_found}, status=404)
+        snapshot = snapshot_from_job(job)
+    response = StreamingHttpResponse(_progress_events(model, (kind, job_id), snapshot),
+                                     content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+async def shorts_events(request, processing_id):
+    """
+    Server-sent events with the progress of a shorts job: status, current
+    stage, percent, ETA and shorts finished so far. The stream ends once the
+    job is COMPLETED or FAILED. Needs the ASGI server to stream.
+    """
+    return await _progress_response(VideoProcessing, 'shorts', processing_id, 'Processing task not found')
+
+async def dubbing_events(request, dubbing_id):
+    """
+    Server-sent events with the progress of a dubbing job; see shorts_events
+    """
+    return await _progress_response(LanguageDubbing, 'dubbing', dubbing_id, 'Dubbing task not found')
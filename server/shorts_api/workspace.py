@@ -0,0 +1,133 @@
+import os
+import re
+import glob
+import shutil
+import logging
+import tempfile
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# {kind}_{job_id}_{random}, as made by JobWorkspace
+WORKSPACE_NAME = re.compile(r'^([a-z]+)_(\d+)_')
+
+class WorkspaceQuotaExceeded(Exception):
+    """Raised when a job's scratch files outgrow settings.JOB_WORKSPACE_QUOTA_BYTES"""
+
+def sweep_workspaces(is_running, root=None):
+    """
+    Remove the workspaces of jobs that aren't running, e.g. left behind by
+    a crash of a job that is never retried. With a tmpfs root they would
+    otherwise hold on to memory.
+
+    Args:
+        is_running: Called with a workspace's kind and job ID
+        root: The scratch root, settings.JOB_WORKSPACE_ROOT by default
+
+    Returns:
+        How many workspaces were removed
+    """
+    root = root or settings.JOB_WORKSPACE_ROOT
+    try:
+        names = os.listdir(root)
+    except FileNotFoundError:
+        return 0
+    removed = 0
+    for name in names:
+        match = WORKSPACE_NAME.match(name)
+        path = os.path.join(root, name)
+        # Anything else under the root isn't ours to remove
+        if not match or not os.path.isdir(path) or is_running(match[1], int(match[2])):
+            continue
+        logger.info(f"Removing stale workspace {path}")
+        shutil.rmtree(path, ignore_errors=True)
+        removed += 1
+    return removed
+
+class JobWorkspace:
+    """
+    Private scratch directory of one job run.
+
+    Intermediates (clips, cropped frames, speech segments) are written here
+    under names that only have to be unique within the job, so concurrent
+    jobs never share a file. Finished artifacts are promoted to durable
+    storage; everything else goes when the workspace is cleaned up, which
+    happens however the job ends.
+
+    Use as a context manager, or call cleanup() when the job is done.
+    """
+
+    def __init__(self, kind, job_id, root=None, quota_bytes=None):
+        self.root = root or settings.JOB_WORKSPACE_ROOT
+        self.quota_bytes = settings.JOB_WORKSPACE_QUOTA_BYTES if quota_bytes is None else quota_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+        prefix = f"{kind}_{job_id}_"
+        # A crashed earlier attempt of this job may have left its workspace behind
+        for stale in glob.glob(os.path.join(self.root, prefix + '*')):
+            logger.info(f"Removing stale workspace {stale}")
+            shutil.rmtree(stale, ignore_errors=True)
+        self.path = tempfile.mkdtemp(dir=self.root, prefix=prefix)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.cleanup()
+
+    def file(self, *parts):
+        """Path of a scratch file, creating its directory"""
+        path = os.path.join(self.path, *parts)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def dir(self, *parts):
+        """Path of a scratch directory, creating it"""
+        path = os.path.join(self.path, *parts)
+        os.makedirs(path, exist_ok=True)
+        return path
+
+    def usage(self):
+        """Bytes currently used by the workspace"""
+        total = 0
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(directory, name))
+                except OSError:
+                    # Removed while we were walking
+                    pass
+        return total
+
+    def check_quota(self):
+        """
+        Raises:
+            WorkspaceQuotaExceeded: If the workspace uses more than its quota
+        """
+        if not self.quota_bytes:
+            return
+        used = self.usage()
+        if used > self.quota_bytes:
+            raise WorkspaceQuotaExceeded(
+                f"Job workspace uses {used // (1024 * 1024)} MB, over its "
+                f"{self.quota_bytes // (1024 * 1024)} MB quota"
+            )
+
+    def promote(self, path, destination):
+        """
+        Move a finished artifact out of the workspace to durable storage.
+
+        Args:
+            path: The file in the workspace
+            destination: Where it should live once the job is done
+
+        Returns:
+            destination
+        """
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        # A rename on the same filesystem, a copy from tmpfs
+        shutil.move(path, destination)
+        return destination
+
+    def cleanup(self):
+        shutil.rmtree(self.path, ignore_errors=True)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -91,6 +92,14 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # WAL lets status requests read while job threads write, and
+            # writers queue for the lock instead of failing with
+            # "database is locked"
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL',
+            'timeout': int(os.getenv('SQLITE_TIMEOUT', '20')),
+            'transaction_mode': 'IMMEDIATE',
+        },
     }
 }
 
@@ -146,11 +155,89 @@ CLOUDINARY = {
     'api_key': os.getenv('CLOUDINARY_API_KEY', ''),
     'api_secret': os.getenv('CLOUDINARY_API_SECRET', ''),
 }
+# Only needed to point uploads somewhere other than api.cloudinary.com
+CLOUDINARY_UPLOAD_PREFIX = os.getenv('CLOUDINARY_UPLOAD_PREFIX', '')
+# Videos are uploaded in chunks (Cloudinary needs at least 5 MB per chunk except
+# the last); a chunk that failed transiently (no answer, 408, 420, 429, 5xx) is
+# retried with exponential backoff from CLOUDINARY_RETRY_BACKOFF seconds, up
+# to CLOUDINARY_CHUNK_RETRIES times; other errors fail the upload at once
+CLOUDINARY_CHUNK_SIZE = int(os.getenv('CLOUDINARY_CHUNK_SIZE_MB', '20')) * 1024 * 1024
+CLOUDINARY_CHUNK_RETRIES = int(os.getenv('CLOUDINARY_CHUNK_RETRIES', '5'))
+CLOUDINARY_RETRY_BACKOFF = float(os.getenv('CLOUDINARY_RETRY_BACKOFF', '1'))
 
 # Supabase configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL', '')
 SUPABASE_KEY = os.getenv('SUPABASE_KEY', '')
 SUPABASE_TABLE = os.getenv('SUPABASE_TABLE', 'shorts')
+# Rows for Supabase are queued in the SupabaseOutbox table when a job
+# completes and sent in bulk inserts of up to SUPABASE_SYNC_BATCH_SIZE by a
+# background worker. Failed batches are retried after SUPABASE_SYNC_BACKOFF
+# seconds, doubling up to SUPABASE_SYNC_MAX_BACKOFF, and given up on after
+# SUPABASE_SYNC_MAX_ATTEMPTS
+SUPABASE_SYNC_BATCH_SIZE = int(os.getenv('SUPABASE_SYNC_BATCH_SIZE', '100'))
+SUPABASE_SYNC_BACKOFF = float(os.getenv('SUPABASE_SYNC_BACKOFF', '2'))
+SUPABASE_SYNC_MAX_BACKOFF = float(os.getenv('SUPABASE_SYNC_MAX_BACKOFF', '600'))
+SUPABASE_SYNC_MAX_ATTEMPTS = int(os.getenv('SUPABASE_SYNC_MAX_ATTEMPTS', '12'))
+# A worker claims the rows it sends for SUPABASE_SYNC_LEASE seconds, so other
+# processes leave them alone; rows of a worker that died are sent once it runs out
+SUPABASE_SYNC_LEASE = float(os.getenv('SUPABASE_SYNC_LEASE', '300'))
+# How often an idle worker checks for rows queued by other processes
+SUPABASE_SYNC_POLL = float(os.getenv('SUPABASE_SYNC_POLL', '60'))
+
+# Shorts ingest: 'full' downloads the whole video up front, 'audio_first'
+# downloads only the audio, picks highlights from it and then fetches just
+# the video ranges that become shorts
+SHORTS_INGEST_MODE = os.getenv('SHORTS_INGEST_MODE', 'full')
+
+# Downloaded source videos (and the audio of audio-first ingest) are shared
+# between jobs from here and evicted least-recently-used first once they
+# exceed the disk budget
+SOURCE_CACHE_DIR = os.getenv('SOURCE_CACHE_DIR', os.path.join('videos', 'sources'))
+SOURCE_CACHE_MAX_BYTES = int(os.getenv('SOURCE_CACHE_MAX_MB', '20480')) * 1024 * 1024
+
+# Shorts are rendered in a machine-wide process pool. RENDER_MAX_WORKERS caps
+# the processes on this machine, RENDER_JOB_WORKERS how many of them one job
+# may use at once, RENDER_THREADS_PER_WORKER the OpenCV threads per process
+RENDER_MAX_WORKERS = int(os.getenv('RENDER_MAX_WORKERS', str(os.cpu_count() or 1)))
+RENDER_JOB_WORKERS = int(os.getenv('RENDER_JOB_WORKERS', str(RENDER_MAX_WORKERS)))
+RENDER_THREADS_PER_WORKER = int(os.getenv('RENDER_THREADS_PER_WORKER', '1'))
+# 'spawn' keeps workers independent of the server's threads and open connections
+RENDER_START_METHOD = os.getenv('RENDER_START_METHOD', 'spawn')
+
+# Finished shorts upload to Cloudinary while the next ones render; this caps
+# concurrent uploads across all jobs
+UPLOAD_MAX_WORKERS = int(os.getenv('UPLOAD_MAX_WORKERS', '3'))
+
+# Instagram uploads run in the background, at most INSTAGRAM_UPLOAD_MAX_WORKERS
+# at once. Logged-in sessions are saved per account, encrypted with
+# INSTAGRAM_SESSION_KEY (a Fernet key; derived from SECRET_KEY if unset)
+INSTAGRAM_UPLOAD_MAX_WORKERS = int(os.getenv('INSTAGRAM_UPLOAD_MAX_WORKERS', '2'))
+INSTAGRAM_SESSION_KEY = os.getenv('INSTAGRAM_SESSION_KEY')
+
+# Every job run gets its own scratch directory under JOB_WORKSPACE_ROOT for
+# intermediate files, removed when the job ends (and at server startup, for
+# jobs that crashed). Point it at tmpfs (e.g.
+# /dev/shm/momentai) to keep intermediates off the disk; the quota caps how
+# much one job may put there
+JOB_WORKSPACE_ROOT = os.getenv('JOB_WORKSPACE_ROOT', os.path.join(tempfile.gettempdir(), 'momentai-jobs'))
+JOB_WORKSPACE_QUOTA_BYTES = int(os.getenv('JOB_WORKSPACE_QUOTA_MB', '4096')) * 1024 * 1024
+
+# How many stages of one job may run at once per resource class: CPU-bound
+# rendering, local disk/ffmpeg I/O, and network APIs (OpenAI, Cloudinary)
+PIPELINE_LIMITS = {
+    'cpu': RENDER_JOB_WORKERS,
+    'io': int(os.getenv('PIPELINE_IO_LIMIT', '4')),
+    'api': int(os.getenv('PIPELINE_API_LIMIT', '4')),
+}
+# Dubbing translates this many transcript segments per request, so speech
+# for early segments is generated while later ones are still translating
+DUBBING_TRANSLATE_CHUNK = int(os.getenv('DUBBING_TRANSLATE_CHUNK', '40'))
+
+# Job progress is pushed to /api/*/events/<id>/ streams as it changes, but
+# only written to the job's row this often (seconds). Streams send a
+# keepalive comment after PROGRESS_KEEPALIVE seconds without news
+PROGRESS_DB_INTERVAL = float(os.getenv('PROGRESS_DB_INTERVAL', '5'))
+PROGRESS_KEEPALIVE = float(os.getenv('PROGRESS_KEEPALIVE', '15'))
 
 # Logging Configuration
 LOGGING = {
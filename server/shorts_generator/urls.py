@@ -18,10 +18,12 @@ from django.contrib import admin
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
+from shorts_api.views import prometheus_metrics
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('shorts_api.urls')),
+    path('metrics', prometheus_metrics, name='metrics'),
 ]
 
 # Serve media files during development
@@ -14,3 +14,10 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'shorts_generator.settings')
 
 application = get_wsgi_application()
+
+# Clean up after jobs the previous process was running, and send Supabase
+# rows still queued from before this process started
+from shorts_api.tasks import recover_after_restart  # noqa: E402
+from shorts_api.supabase_sync import start_sync_worker  # noqa: E402
+recover_after_restart()
+start_sync_worker()